@@ -0,0 +1,339 @@
+"""
+離線效能基準：以合成資料量測每個步驟的延遲、吞吐量與峰值記憶體，
+並與 benchmarks/baseline.json 比對，超過容忍度即標記為退化 (exit code 1)。
+資料量分兩個方向放大：時間軸 (1x / 100x，指數日線與宏觀序列) 與標的數 (50 / 500 檔成分股)。
+
+    python benchmarks/run_benchmarks.py                          # 1x, 100x + 50, 500 檔
+    python benchmarks/run_benchmarks.py --scales 1 100 10000     # 加上 10000x (需數十 GB 記憶體)
+    python benchmarks/run_benchmarks.py --universes 500 2000     # 只改標的數
+    python benchmarks/run_benchmarks.py --update-baseline        # 以本次結果覆寫基準
+
+每個倍率 / 標的數在獨立子行程中執行 (EMR_DATA_DIR 指向暫存目錄)，不會碰到 repo 的 data/。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_JSON = BENCH_DIR / "baseline.json"
+RESULTS_JSON = BENCH_DIR / "results.json"
+
+# 10000x 超出一般機器的記憶體，只在 --scales 明確指定時執行
+SCALES = (1, 100)
+LARGE_SCALE = 100  # 超過此倍率只量測一次
+UNIVERSES = (50, 500)  # 標的池檔數 (500 約等於 S&P 500)
+
+# 延遲 / 記憶體超過基準的比例，且超過絕對門檻時才算退化 (避免小數字的雜訊)
+TOLERANCE = 0.50
+MIN_LATENCY_DELTA = 0.05  # 秒
+MIN_MEMORY_DELTA = 1 << 20  # 1 MiB
+
+
+def run_scale(scale, repeat):
+    """
+    子行程入口：產生該倍率的合成資料並量測各步驟，回傳 {步驟: 指標}。
+    """
+    import pandas as pd
+
+    import synthetic
+    from config.path import PathConfig
+    from config.runtime import RuntimeConfig
+    from utils import price_cache
+    from utils.telemetry import Telemetry
+
+    # 量測計算本身：關閉進度條 / 展示停頓，價格只讀預熱好的快取
+    RuntimeConfig.HEADLESS = True
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    from breadth import cap_vs_equal
+    from decision import backtest, signal_calc
+    from macro import macro_factor_calc
+    from market import market_return_calc
+    from utils import fred_loader, future_mock, macro_preprocess, render
+
+    end = pd.Timestamp.today().normalize()
+    target_date = (end + pd.DateOffset(months=12)).strftime("%Y-%m-%d")
+
+    raw_paths = {
+        "m2": PathConfig.M2_CSV,
+        "gdp": PathConfig.GDP_CSV,
+        "yield_10y": PathConfig.YIELD_10Y_CSV,
+        "yield_2y": PathConfig.YIELD_2Y_CSV,
+    }
+    macro_rows = synthetic.write_fred_raw(raw_paths, scale, end)
+    prices = synthetic.daily_prices(scale, end)
+    synthetic.install_yfinance_stub(prices)
+    for ticker in prices:
+        price_cache.sync_daily(ticker, offline=False)
+    RuntimeConfig.OFFLINE = True
+
+    macro_frames = synthetic.macro_series(scale, end)
+    fred_frames = {code: macro_frames[spec[0]] for code, spec in synthetic.FRED_SPECS.items()}
+    fred_series = {code: spec[0] for code, spec in synthetic.FRED_SPECS.items()}
+
+    n_macro = synthetic.rows("macro", scale)
+    n_daily = synthetic.rows("daily", scale)
+    n_breadth = synthetic.rows("breadth", scale)
+
+    # (步驟名稱, 函式, 輸入筆數)；依管線順序執行，後面的步驟讀前面的輸出
+    stages = [
+        (
+            "macro_preprocess",
+            lambda: macro_preprocess.load_macro_data(**{f"{k}_csv": v for k, v in raw_paths.items()}),
+            sum(macro_rows.values()),
+        ),
+        (
+            "macro_factor",
+            lambda: macro_factor_calc.calc_macro_factor_pipeline(
+                PathConfig.MACRO_CSV, PathConfig.MACRO_FACTOR_CSV
+            ),
+            n_macro,
+        ),
+        (
+            "market_return",
+            lambda: market_return_calc.calc_market_return_pipeline(PathConfig.MARKET_RETURN_CSV),
+            n_daily,
+        ),
+        ("cap_vs_equal", cap_vs_equal.calc_breadth_pipeline, n_daily + n_breadth),
+        ("future_mock", lambda: future_mock.mock_future_data(target_date), n_macro),
+        ("signal_calc", signal_calc.calc_final_signal_pipeline, n_macro),
+        # 圖表在背景行程渲染 (不計入 backtest)，每輪結束後才等待
+        ("backtest", lambda: backtest.run_backtest(PathConfig.FINAL_SIGNAL_CSV), n_macro),
+    ]
+
+    samples = {name: [] for name, _, _ in stages}
+    samples["fred_loader"] = []
+
+    with synthetic.FredStandIn(fred_frames) as fred:
+        for _ in range(repeat):
+            shutil.rmtree(PathConfig.PROCESSED_DATA_DIR, ignore_errors=True)
+            telemetry = Telemetry(trace_memory=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                # FRED 以本機替身伺服器量測 (離線模式只限 yfinance 快取)
+                RuntimeConfig.OFFLINE = False
+                with telemetry.measure("fred_loader"):
+                    fred_loader.update_all_fred(
+                        PathConfig.RAW_DATA_DIR,
+                        series=fred_series,
+                        cache_dir=None,
+                        base_url=fred.url,
+                        retries=0,
+                    )
+                RuntimeConfig.OFFLINE = True
+                for name, func, _ in stages:
+                    with telemetry.measure(name):
+                        func()
+                render.wait()
+            telemetry.close()
+            for metrics in telemetry.stages:
+                samples[metrics.stage].append(metrics)
+
+    input_rows = {name: n for name, _, n in stages}
+    input_rows["fred_loader"] = n_macro * len(fred_series)
+    return _summarize(samples, input_rows)
+
+
+def run_universe(n_tickers, repeat):
+    """
+    子行程入口：固定時間軸、放大標的數，量測成分股批次同步、成分股廣度與多標的訊號面板。
+    """
+    import numpy as np
+    import pandas as pd
+
+    import synthetic
+    from config.path import PathConfig
+    from config.runtime import RuntimeConfig
+    from utils import storage
+    from utils.telemetry import Telemetry
+
+    RuntimeConfig.HEADLESS = True
+
+    from breadth import constituents
+    from decision import signal_panel
+    from utils import price_cache
+
+    end = pd.Timestamp.today().normalize()
+    prices = synthetic.universe_prices(n_tickers, end)
+    synthetic.install_yfinance_stub(prices)
+    tickers = list(prices)
+
+    PathConfig.CONSTITUENTS_CSV.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"ticker": tickers}).to_csv(PathConfig.CONSTITUENTS_CSV, index=False)
+    # 訊號面板的宏觀係數只是輸入，以隨機月資料代替 (不計時)
+    months = pd.date_range(end - pd.DateOffset(years=7), end, freq="MS", name="date")
+    macro = pd.DataFrame(
+        {"date": months, "macro_factor": np.random.default_rng(0).normal(1.0, 0.05, len(months))}
+    )
+    storage.write_frame(macro, PathConfig.MACRO_FACTOR_CSV)
+
+    n_rows = sum(len(df) for df in prices.values())
+    stages = [
+        # 快取每輪清空，量測完整下載 + 寫入；後兩步只讀快取
+        ("price_sync", lambda: price_cache.sync_many(tickers, offline=False), n_rows),
+        ("constituent_breadth", constituents.calc_constituent_breadth_pipeline, n_rows),
+        ("signal_panel", lambda: signal_panel.calc_signal_panel_pipeline(tickers=tickers), n_rows),
+    ]
+
+    samples = {name: [] for name, _, _ in stages}
+    for _ in range(repeat):
+        shutil.rmtree(PathConfig.PRICE_CACHE_DIR, ignore_errors=True)
+        telemetry = Telemetry(trace_memory=True)
+        RuntimeConfig.OFFLINE = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, func, _ in stages:
+                with telemetry.measure(name):
+                    func()
+        telemetry.close()
+        for metrics in telemetry.stages:
+            samples[metrics.stage].append(metrics)
+
+    return _summarize(samples, {name: n for name, _, n in stages})
+
+
+def _summarize(samples, input_rows):
+    """
+    {步驟: [每輪指標]} -> {步驟: 指標}。
+    """
+    results = {}
+    for name, runs in samples.items():
+        # 取最小值：雜訊 (排程、冷快取) 只會讓時間變長
+        latency = min(m.wall_seconds for m in runs)
+        results[name] = {
+            "rows": input_rows[name],
+            "latency_seconds": latency,
+            "cpu_seconds": min(m.cpu_seconds for m in runs),
+            "throughput_rows_per_second": input_rows[name] / latency if latency else None,
+            "peak_memory_bytes": max(m.peak_memory_bytes for m in runs),
+            "bytes_read": runs[-1].bytes_read,
+            "bytes_written": runs[-1].bytes_written,
+        }
+    return results
+
+
+def spawn_worker(label, worker_args, repeat):
+    """
+    在乾淨的子行程與暫存資料目錄中執行單一倍率 / 標的數。
+    """
+    with tempfile.TemporaryDirectory(prefix=f"emr_bench_{label}_") as data_dir:
+        env = {
+            **os.environ,
+            "EMR_DATA_DIR": data_dir,
+            "EMR_STORAGE_FORMAT": os.getenv("EMR_STORAGE_FORMAT", "csv"),
+            "MPLBACKEND": "Agg",
+            "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), str(BENCH_DIR)]),
+        }
+        proc = subprocess.run(
+            [sys.executable, __file__, *worker_args, "--repeat", str(repeat)],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{label} 執行失敗 (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    回傳退化清單 [(key, 指標, 基準值, 本次值)]。
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        checks = (
+            ("latency_seconds", MIN_LATENCY_DELTA),
+            ("peak_memory_bytes", MIN_MEMORY_DELTA),
+        )
+        for metric, min_delta in checks:
+            old, new = base[metric], current[metric]
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def print_table(results, regressions):
+    flagged = {(key, metric) for key, metric, _, _ in regressions}
+    header = f"{'stage @ scale':<28} {'rows':>12} {'latency(s)':>11} {'rows/s':>14} {'peak MiB':>9}"
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        mark = " <-- 退化" if any((key, m) in flagged for m in ("latency_seconds", "peak_memory_bytes")) else ""
+        print(
+            f"{key:<28} {r['rows']:>12,} {r['latency_seconds']:>11.4f} "
+            f"{r['throughput_rows_per_second'] or 0:>14,.0f} {r['peak_memory_bytes'] / 2**20:>9.1f}{mark}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--scales", type=int, nargs="*", default=list(SCALES))
+    parser.add_argument("--universes", type=int, nargs="*", default=list(UNIVERSES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_JSON)
+    parser.add_argument("--output", type=Path, default=RESULTS_JSON)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-universe", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None or args.worker_universe is not None:
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.worker is not None:
+                results = run_scale(args.worker, args.repeat)
+            else:
+                results = run_universe(args.worker_universe, args.repeat)
+        print(json.dumps(results))
+        return 0
+
+    # (結果鍵的後綴, 子行程參數, 重複次數)；大倍率單次執行就要數分鐘，只跑一次
+    jobs = [
+        (f"{scale}x", ["--worker", str(scale)], args.repeat if scale <= LARGE_SCALE else 1)
+        for scale in args.scales
+    ] + [(f"{n}t", ["--worker-universe", str(n)], args.repeat) for n in args.universes]
+
+    results = {}
+    failed = []
+    for label, worker_args, repeat in jobs:
+        print(f"[Bench] {label} (repeat={repeat}) ...", flush=True)
+        try:
+            for stage, metrics in spawn_worker(label, worker_args, repeat).items():
+                results[f"{stage}@{label}"] = metrics
+        except RuntimeError as e:
+            # 例如記憶體不足被 OOM 終止；其他倍率照常量測
+            print(f"[Bench] {e}", file=sys.stderr)
+            failed.append(label)
+
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline, args.tolerance)
+    print_table(results, regressions)
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2), encoding="utf-8")
+        print(f"\n[Bench] 基準已更新: {args.baseline}")
+        return 0
+
+    for key, metric, old, new in regressions:
+        print(f"[Bench] 退化: {key} {metric} {old:.4g} -> {new:.4g} (+{new / old - 1:.0%})")
+    if failed:
+        print(f"[Bench] 執行失敗的倍率 / 標的數: {failed}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
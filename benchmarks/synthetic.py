@@ -0,0 +1,193 @@
+"""
+合成資料產生器與外部資料源替身 (FRED / yfinance)，供 benchmarks/run_benchmarks.py 使用。
+
+1x 對應目前 data/ 下的資料量；scale 倍時把時間軸切得更細 (而不是拉得更長)，
+讓日期仍落在 pandas 可表示的範圍內，且 breadth 的「近 5 年」視窗仍涵蓋全部資料。
+標的池 (universe) 則固定時間軸、放大標的數。
+"""
+
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+# 1x 的資料量 (約等於目前 data/processed 與 ^GSPC 日線的筆數)
+BASE_ROWS = {
+    "macro": 140,  # macro.csv (季資料)
+    "daily": 10_000,  # ^GSPC 日線
+    "breadth": 1_250,  # RSP 日線 (近 5 年)
+    "universe": 1_600,  # 每檔成分股日線 (近 5 年 + 1 年暖身)
+}
+
+# 1x 的取樣間隔
+BASE_FREQ = {
+    "macro": pd.Timedelta(days=91),
+    "daily": pd.Timedelta(days=1),
+}
+
+# FRED 代碼 -> (raw 檔欄位名稱, 起始值, 每期漂移, 每期波動)
+FRED_SPECS = {
+    "M2SL": ("m2", 300.0, 0.015, 0.01),
+    "GDP": ("gdp", 250.0, 0.015, 0.008),
+    "DGS10": ("yield_10y", 4.0, 0.0, 0.15),
+    "DGS2": ("yield_2y", 3.5, 0.0, 0.15),
+}
+
+
+def rows(kind, scale):
+    return BASE_ROWS[kind] * scale
+
+
+def time_grid(kind, scale, end):
+    """
+    以 end 為終點、間隔為 1x 間隔 / scale 的時間軸。
+    """
+    freq = BASE_FREQ[kind] / scale
+    n = rows(kind, scale)
+    return pd.DatetimeIndex(end - freq * np.arange(n)[::-1], name="date")
+
+
+def macro_series(scale, end, seed=0):
+    """
+    產生 m2 / gdp / yield_10y / yield_2y 四條共用時間軸的序列 {raw 欄位名稱: DataFrame}。
+    """
+    rng = np.random.default_rng(seed)
+    dates = time_grid("macro", scale, end)
+    frames = {}
+    for name, start, drift, vol in FRED_SPECS.values():
+        steps = rng.normal(drift / scale, vol / np.sqrt(scale), len(dates))
+        if drift:
+            values = start * np.exp(np.cumsum(steps))
+        else:
+            values = np.clip(start + np.cumsum(steps), 0.05, None)
+        frames[name] = pd.DataFrame({"date": dates, name: values})
+    return frames
+
+
+def write_fred_raw(paths, scale, end, seed=0):
+    """
+    把合成的宏觀序列寫成 data/raw/fred/*.csv (格式同 repo 內的檔案)。
+    paths: {raw 欄位名稱: 路徑}
+    """
+    frames = macro_series(scale, end, seed)
+    for name, path in paths.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frames[name].to_csv(path, index=False)
+    return {name: len(df) for name, df in frames.items()}
+
+
+def daily_prices(scale, end, seed=0):
+    """
+    產生 ^GSPC (長歷史) 與 RSP (只有最後 breadth 筆) 的收盤價，兩者共用時間軸。
+    """
+    rng = np.random.default_rng(seed)
+    dates = time_grid("daily", scale, end)
+    n = len(dates)
+    cap = 100 * np.exp(np.cumsum(rng.normal(0.0003 / scale, 0.01 / np.sqrt(scale), n)))
+    equal = cap * np.exp(np.cumsum(rng.normal(0, 0.004 / np.sqrt(scale), n))) * 0.3
+
+    n_equal = rows("breadth", scale)
+    return {
+        "^GSPC": pd.DataFrame({"Close": cap}, index=dates),
+        "RSP": pd.DataFrame({"Close": equal[-n_equal:]}, index=dates[-n_equal:]),
+    }
+
+
+def universe_prices(n_tickers, end, seed=0):
+    """
+    產生 n_tickers 檔成分股日線 {T0000: DataFrame(Close)}，共用營業日時間軸；
+    約一成標的在期間內才上市 (之前沒有資料)。
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=BASE_ROWS["universe"], name="date")
+    n = len(dates)
+    returns = rng.normal(0.0003, 0.015, (n, n_tickers))
+    values = 50 * np.exp(np.cumsum(returns, axis=0))
+    listed = np.where(rng.random(n_tickers) < 0.1, rng.integers(0, n // 2, n_tickers), 0)
+    return {
+        f"T{i:04d}": pd.DataFrame({"Close": values[listed[i] :, i]}, index=dates[listed[i] :])
+        for i in range(n_tickers)
+    }
+
+
+def install_yfinance_stub(prices):
+    """
+    以記憶體中的價格替換 yfinance 模組 (只實作 price_cache 用到的 download)。
+    ticker 為清單時回傳 (欄位, 代號) 兩層欄位，同 yfinance 的 group_by="column"。
+    """
+
+    def download(ticker, interval="1d", progress=False, period=None, start=None, **kwargs):
+        if isinstance(ticker, str):
+            df = prices.get(ticker)
+            if df is None:
+                return pd.DataFrame()
+        else:
+            close = {t: prices[t]["Close"] for t in ticker if t in prices}
+            if not close:
+                return pd.DataFrame()
+            df = pd.concat(close, axis=1, sort=True)
+            df.columns = pd.MultiIndex.from_product([["Close"], df.columns])
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        return df.copy()
+
+    module = types.ModuleType("yfinance")
+    module.download = download
+    sys.modules["yfinance"] = module
+    return module
+
+
+class FredStandIn:
+    """
+    本機 HTTP 替身，回應 fredgraph.csv?id=<code>[&cosd=YYYY-MM-DD] 請求。
+    """
+
+    def __init__(self, frames):
+        # frames: {FRED 代碼: DataFrame(date, value)}
+        self.payloads = {}
+        for code, df in frames.items():
+            out = df.rename(columns={df.columns[1]: code})
+            out = out.rename(columns={"date": "observation_date"})
+            self.payloads[code] = out
+
+        payloads = self.payloads
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                df = payloads.get(query.get("id", [""])[0])
+                if df is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if "cosd" in query:
+                    df = df[df["observation_date"] >= query["cosd"][0]]
+                body = df.to_csv(index=False).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/fredgraph.csv"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,33 +1,63 @@
-import os
 import logging
+
+import numpy as np
 import pandas as pd
-import yfinance as yf
+
+from config.path import PathConfig
+from utils import price_cache
+from utils.incremental import update_frame
+from utils.schema import BREADTH
+
+RETURN_WINDOW = 20  # 約一個月的交易日
 
 
 def breadth_signal_logic(cap_ret, equal_ret):
+    """
+    逐列廣度訊號 (整欄向量化)，回傳 BREADTH 的 int8 代碼。
+    """
     threshold = -0.01  # 容忍度，跌超過 1% 才算跌
+    cap_ret = np.asarray(cap_ret, dtype=float)
+    equal_ret = np.asarray(equal_ret, dtype=float)
+
+    return np.select(
+        [
+            (cap_ret > 0) & (equal_ret > threshold),  # 健康
+            (cap_ret > 0) & (equal_ret <= threshold),  # 脆弱 (背離警示!)
+        ],
+        [BREADTH.code("HEALTHY"), BREADTH.code("FRAGILE")],
+        default=BREADTH.code("WEAK"),  # 疲弱
+    ).astype(np.int8)
 
-    if cap_ret > 0 and equal_ret > threshold:
-        return "HEALTHY"  # 健康
-    elif cap_ret > 0 and equal_ret <= threshold:
-        return "FRAGILE"  # 脆弱 (背離警示!)
-    else:
-        return "WEAK"  # 疲弱
+
+def calc_breadth_frame(prices):
+    """
+    (date, cap_price, equal_price) -> 加上一個月報酬與廣度訊號。
+    """
+    df = prices.copy()
+    df["cap_ret_1m"] = df["cap_price"].pct_change(RETURN_WINDOW)
+    df["equal_ret_1m"] = df["equal_price"].pct_change(RETURN_WINDOW)
+
+    #  產生信號
+    df["breadth_signal"] = BREADTH.categorical(
+        breadth_signal_logic(df["cap_ret_1m"], df["equal_ret_1m"])
+    )
+    return df
 
 
-def calc_breadth_pipeline():
+def calc_breadth_pipeline(output_path=PathConfig.BREADTH_CSV, incremental=None):
+    """
+    incremental 時只重算新增的交易日；近 5 年區間的起點前移時另補算開頭 20 列。
+    """
     logging.info("   [Breadth] Fetching Cap-Weighted vs Equal-Weighted data...")
 
     try:
-        df_cap = yf.download("^GSPC", period="5y", interval="1d", progress=False)[
-            "Close"
-        ]
-        df_equal = yf.download("RSP", period="5y", interval="1d", progress=False)[
-            "Close"
-        ]
+        # 與 market 共用 ^GSPC 日線快取，只補抓缺少的區間
+        start = pd.DateOffset(years=5)
+        df_cap = price_cache.load_prices("^GSPC", start=start)["Close"]
+        df_equal = price_cache.load_prices("RSP", start=start)["Close"]
     except Exception as e:
         logging.error(f" Breadth download failed: {e}")
-        return
+        return False
 
     # 整理數據
     df = pd.DataFrame()
@@ -35,28 +65,24 @@ def calc_breadth_pipeline():
     df["equal_price"] = df_equal
     df = df.dropna()
 
-    df["cap_ret_1m"] = df["cap_price"].pct_change(20)
-    df["equal_ret_1m"] = df["equal_price"].pct_change(20)
-
-    #  產生信號
-    df["breadth_signal"] = df.apply(
-        lambda row: breadth_signal_logic(row["cap_ret_1m"], row["equal_ret_1m"]), axis=1
-    )
-
     # 重置索引以便存檔
     df.index.name = "date"
     df = df.reset_index()
 
-    # 存檔
-    output_path = "data/processed/breadth.csv"
-    # 確保目錄存在
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    df.to_csv(output_path, index=False)
+    # 計算並存檔 (報酬只依賴前 20 列，與絕對位置無關)
+    update_frame(
+        output_path,
+        df,
+        lambda frame, offset: calc_breadth_frame(frame),
+        inputs=["date", "cap_price", "equal_price"],
+        lookback=RETURN_WINDOW,
+        shift_invariant=True,
+        enabled=incremental,
+    )
     logging.info(f"   [Breadth] Signal generated. Saved to {output_path}")
 
     # 顯示最新的狀態
-    latest = df.iloc[-1]
+    latest = calc_breadth_frame(df.iloc[-(RETURN_WINDOW + 1) :]).iloc[-1]
     logging.info(f"      Running Status ({latest['date'].strftime('%Y-%m-%d')}):")
     logging.info(
         f"      Cap Return: {latest['cap_ret_1m']:.2%} | Equal Return: {latest['equal_ret_1m']:.2%}"
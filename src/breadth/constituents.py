@@ -0,0 +1,146 @@
+import io
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from config.path import PathConfig
+from config.runtime import RuntimeConfig
+from utils import price_cache, storage
+
+# S&P 500 成分股清單 (欄位 Symbol)；PathConfig.CONSTITUENTS_CSV 不存在時下載一次
+CONSTITUENTS_URL = (
+    "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv"
+)
+
+SHORT_MA = 50  # 日均線
+LONG_MA = 200
+HIGH_LOW_WINDOW = 252  # 52 週新高 / 新低
+OUTPUT_YEARS = 5  # 輸出區間同 cap_vs_equal
+
+
+def load_constituents(path=PathConfig.CONSTITUENTS_CSV, offline=None):
+    """
+    讀取成分股清單 (欄位: ticker)；檔案不存在時自 CONSTITUENTS_URL 下載並存檔。
+    代號換成 yfinance 格式 (BRK.B -> BRK-B)。
+    """
+    offline = RuntimeConfig.OFFLINE if offline is None else offline
+    if not os.path.exists(path):
+        if offline:
+            raise FileNotFoundError(f"離線模式下找不到成分股清單: {path}")
+        import requests
+
+        logging.info(f"   [Breadth] 下載成分股清單: {CONSTITUENTS_URL}")
+        response = requests.get(CONSTITUENTS_URL, timeout=30)
+        response.raise_for_status()
+        symbols = pd.read_csv(io.StringIO(response.text), dtype=str)["Symbol"]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        symbols.rename("ticker").to_frame().to_csv(path, index=False)
+
+    tickers = pd.read_csv(path, dtype=str)["ticker"].dropna().str.strip()
+    return tickers.str.replace(".", "-", regex=False).drop_duplicates().tolist()
+
+
+def load_constituent_prices(tickers, start=None, offline=None):
+    """
+    成分股日線 (批次併發同步到 price_cache) -> date x ticker 收盤價矩陣；上市前 / 下市後為 NaN。
+    """
+    series = price_cache.sync_many(tickers, offline=offline)
+    if not series:
+        raise ValueError("所有成分股皆讀取失敗")
+
+    prices = pd.concat({t: df["Close"] for t, df in series.items()}, axis=1, sort=True)
+    if start is not None:
+        prices = prices[prices.index >= pd.Timestamp(start)]
+    prices.index.name = "date"
+    prices.columns.name = "ticker"
+    return prices
+
+
+# =========================================================
+#  廣度指標 (整個矩陣一次計算)
+# =========================================================
+
+
+def _share(hits, valid):
+    # 比例的分母只算當天有足夠資料的成分股
+    count = valid.sum(axis=1)
+    return np.divide(
+        hits.sum(axis=1), count, out=np.full(len(count), np.nan), where=count > 0
+    )
+
+
+def calc_breadth_measures(
+    prices, start=None, short_ma=SHORT_MA, long_ma=LONG_MA, high_low_window=HIGH_LOW_WINDOW
+):
+    """
+    date x ticker 收盤價 -> 每日廣度指標：
+    上漲 / 下跌家數與騰落線 (A/D line，自 start 起累計淨上漲家數)、站上 50 / 200 日均線的比例、
+    52 週新高 / 新低家數。均線與高低點皆需完整視窗 (start 之前的價格只用於暖身)，
+    前一天或當天沒有價格的成分股不列入漲跌。
+    """
+    values = prices.to_numpy(float)
+    change = np.full_like(values, np.nan)
+    change[1:] = values[1:] - values[:-1]
+    advances = (change > 0).sum(axis=1)
+    declines = (change < 0).sum(axis=1)
+
+    short_avg = prices.rolling(short_ma).mean().to_numpy()
+    long_avg = prices.rolling(long_ma).mean().to_numpy()
+    high = prices.rolling(high_low_window).max().to_numpy()
+    low = prices.rolling(high_low_window).min().to_numpy()
+
+    df = pd.DataFrame(
+        {
+            "date": prices.index,
+            "members": np.isfinite(values).sum(axis=1),
+            "advances": advances,
+            "declines": declines,
+            "ad_line": advances - declines,
+            "pct_above_50dma": _share(values > short_avg, np.isfinite(short_avg)),
+            "pct_above_200dma": _share(values > long_avg, np.isfinite(long_avg)),
+            "new_highs": (values >= high).sum(axis=1),
+            "new_lows": (values <= low).sum(axis=1),
+        }
+    )
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)].reset_index(drop=True)
+    df["ad_line"] = df["ad_line"].cumsum()
+    return df
+
+
+def calc_constituent_breadth_pipeline(
+    output_path=PathConfig.CONSTITUENT_BREADTH_CSV,
+    constituents_path=PathConfig.CONSTITUENTS_CSV,
+    years=OUTPUT_YEARS,
+):
+    """
+    近 years 年的成分股廣度指標；均線與 52 週高低點多讀一年的價格暖身，騰落線自輸出起點累計。
+    """
+    logging.info("   [Breadth] Fetching S&P 500 constituent prices...")
+    try:
+        tickers = load_constituents(constituents_path)
+        start = pd.Timestamp.now().normalize() - pd.DateOffset(years=years)
+        prices = load_constituent_prices(tickers, start=start - pd.DateOffset(years=1))
+    except Exception as e:
+        logging.error(f" Constituent breadth download failed: {e}")
+        return False
+
+    df = calc_breadth_measures(prices, start=start)
+
+    storage.write_frame(df, output_path)
+    latest = df.iloc[-1]
+    logging.info(
+        f"   [Breadth] {prices.shape[1]}/{len(tickers)} 檔成分股、{len(df)} 個交易日已儲存至 {output_path}"
+    )
+    logging.info(
+        f"      {latest['date']:%Y-%m-%d} | 漲 {latest['advances']} / 跌 {latest['declines']} | "
+        f"站上 50 日線 {latest['pct_above_50dma']:.0%} / 200 日線 {latest['pct_above_200dma']:.0%} | "
+        f"新高 {latest['new_highs']} / 新低 {latest['new_lows']}"
+    )
+    return df
+
+
+if __name__ == "__main__":
+    calc_constituent_breadth_pipeline()
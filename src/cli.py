@@ -0,0 +1,204 @@
+"""
+命令列入口：python cli.py <子命令>。
+
+各子命令只在執行時載入自己需要的模組：signal / report / nowcast 直接讀取既有的處理後資料，
+不載入 matplotlib、yfinance、requests，也不跑整個管線 (適合排程每分鐘查詢最新訊號)，
+且一律以 headless 執行 (沒有展示停頓)。
+完整管線仍可用 python cli.py run 或 python main.py。
+"""
+
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+
+from config.path import PathConfig
+from config.runtime import RuntimeConfig
+
+# 只讀既有資料的子命令：一律 headless，不需加 --headless
+READ_ONLY_COMMANDS = ("signal", "report", "nowcast")
+
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+# =========================================================
+#  子命令
+# =========================================================
+
+
+def cmd_run(args):
+    from main import run_pipeline
+
+    run_pipeline(
+        force=args.force,
+        frequency=args.frequency,
+        incremental=args.incremental or None,
+        point_in_time=args.point_in_time or None,
+        constituent_breadth=args.constituents or None,
+    )
+
+
+def cmd_fetch(args):
+    from main import run_pipeline
+
+    run_pipeline(force=args.force, only=("fred", "prices"))
+    if args.constituents:
+        from breadth.constituents import load_constituents
+        from utils import price_cache
+
+        price_cache.sync_many(load_constituents())
+    if args.vintages:
+        from utils import fred_loader
+
+        fred_loader.update_vintages()
+
+
+def cmd_compute(args):
+    from main import COMPUTE_STAGES, run_pipeline
+
+    run_pipeline(
+        force=args.force,
+        frequency=args.frequency,
+        incremental=args.incremental or None,
+        only=COMPUTE_STAGES,
+        point_in_time=args.point_in_time or None,
+        constituent_breadth=args.constituents or None,
+    )
+
+
+def cmd_signal(args):
+    from decision.rules import SIGNAL_RULES
+    from utils import storage
+
+    # 只讀 final_signal 的最後一列 (CSV 不載入 pandas)
+    path = PathConfig.FINAL_SIGNAL_CSV
+    rows = storage.read_tail(path) if storage.exists(path) else []
+    if not rows:
+        logging.error(f" 錯誤：找不到訊號數據 {path}，請先執行 compute。")
+        return 1
+    row = rows[-1]
+
+    latest = {
+        "date": row["date"][:10],
+        "signal": row["signal"],
+        "leverage": SIGNAL_RULES.leverage_of(row["signal"]),
+        "action": SIGNAL_RULES.action(row["signal"]).label,
+        "macro_factor": float(row["macro_factor"]),
+        "final_return": float(row["final_return"]),
+    }
+    if args.json:
+        print(json.dumps(latest, ensure_ascii=False))
+    else:
+        print(
+            f"{latest['date']} | {latest['signal']} | {latest['leverage']:.1f}x {latest['action']} | "
+            f"宏觀 {latest['macro_factor']:.2f} | 預期回報 {latest['final_return']:.2%}"
+        )
+    return 0
+
+
+def cmd_report(args):
+    from decision import report
+
+    report.generate_market_report(PathConfig.FINAL_SIGNAL_CSV)
+
+
+def cmd_backtest(args):
+    from decision import backtest
+    from utils import render
+
+    backtest.run_backtest(PathConfig.FINAL_SIGNAL_CSV, frequency=args.frequency)
+    render.wait()
+
+
+def cmd_nowcast(args):
+    from decision.nowcast import nowcast
+
+    nowcast(args.date or _today())
+
+
+def cmd_plot(args):
+    from decision.dashboard import visualize
+    from utils import render
+
+    visualize()
+    render.wait()
+
+
+def cmd_serve(args):
+    from decision.service import run_service
+
+    run_service(args.host, args.port, args.interval)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--headless", action="store_true", help="關閉進度條與展示停頓")
+    common.add_argument("-v", "--verbose", action="store_true", help="輸出 INFO 日誌")
+
+    pipeline = argparse.ArgumentParser(add_help=False)
+    pipeline.add_argument("--force", action="store_true", help="忽略快取指紋，步驟重跑")
+
+    frequency = argparse.ArgumentParser(add_help=False)
+    # 頻率名稱與 config/frequency.py 的 FREQUENCIES 一致 (不在這裡載入 pandas)
+    frequency.add_argument("--frequency", choices=("daily", "monthly"), help="管線頻率 (預設 monthly)")
+
+    incremental = argparse.ArgumentParser(add_help=False)
+    incremental.add_argument("--incremental", action="store_true", help="只重算新增的資料列並附加寫入")
+
+    analysis = argparse.ArgumentParser(add_help=False)
+    analysis.add_argument(
+        "--point-in-time", action="store_true", help="訊號改用每月當時已發布的宏觀數據 (無前視)"
+    )
+    analysis.add_argument(
+        "--constituents", action="store_true", help="另計算 S&P 500 成分股廣度 (騰落線、均線、新高新低)"
+    )
+
+    parser = argparse.ArgumentParser(description="Expected Market Return CLI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    commands = [
+        ("run", cmd_run, "執行完整管線 (同 main.py)", (pipeline, frequency, incremental, analysis)),
+        ("fetch", cmd_fetch, "下載 FRED 數據並同步價格快取", (pipeline,)),
+        ("compute", cmd_compute, "由既有原始數據計算到最終訊號", (pipeline, frequency, incremental, analysis)),
+        ("signal", cmd_signal, "顯示最新訊號 (只讀 final_signal)", ()),
+        ("report", cmd_report, "市場診斷報告", ()),
+        ("backtest", cmd_backtest, "動態槓桿回測", (frequency,)),
+        ("nowcast", cmd_nowcast, "即時操作建議", ()),
+        ("plot", cmd_plot, "近五年儀表板圖表 (輸出 PNG / SVG)", ()),
+        ("serve", cmd_serve, "常駐 HTTP 訊號服務 (檔案更新時自動重新載入)", ()),
+    ]
+    for name, func, help_text, parents in commands:
+        cmd = sub.add_parser(name, help=help_text, parents=[common, *parents])
+        cmd.set_defaults(func=func)
+
+    fetch = sub.choices["fetch"]
+    fetch.add_argument(
+        "--vintages", action="store_true", help="另下載 M2 / GDP 的歷次發布值 (需 FRED_API_KEY)"
+    )
+    fetch.add_argument("--constituents", action="store_true", help="另同步 S&P 500 成分股日線快取")
+    sub.choices["signal"].add_argument("--json", action="store_true", help="以 JSON 輸出")
+    sub.choices["nowcast"].add_argument("--date", help="報告基準日 (預設今天)")
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="127.0.0.1", help="監聽位址")
+    serve.add_argument("--port", type=int, default=8750, help="監聽埠")
+    serve.add_argument("--interval", type=float, default=1.0, help="檢查資料更新的間隔 (秒)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s.%(msecs)03d | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.headless or args.command in READ_ONLY_COMMANDS:
+        RuntimeConfig.HEADLESS = True
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
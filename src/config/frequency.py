@@ -0,0 +1,65 @@
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Frequency:
+    """
+    管線頻率：價格週期、年化期數、推算步長，以及以「月」定義的視窗換算。
+    periods_per_year 為價格週期的期數；訊號主軸 (回測、自助法、績效) 的期數見 on_axis。
+    """
+
+    name: str
+    interval: str  # price_cache.load_prices 的週期
+    periods_per_year: int  # 年化 (夏普、成本) 用的期數
+    step: pd.DateOffset  # future_mock 每次推進的步長
+    calendar: str  # 訊號主軸："macro" (宏觀發布日，原本的月 / 季節奏) 或 "market" (每個交易日)
+
+    def periods(self, months):
+        """
+        把以月為單位的視窗 (例如 24 個月乖離率) 換算成本頻率的期數。
+        """
+        return max(1, round(months * self.periods_per_year / 12))
+
+    def per_period(self, monthly_rate):
+        """
+        每月的收斂比例 (0~1) 換算成每期：(1 - r) ** (12 / periods_per_year) 的補數。
+        """
+        if self.periods_per_year == 12:
+            return monthly_rate
+        return 1 - (1 - monthly_rate) ** (12 / self.periods_per_year)
+
+    def on_axis(self, dates):
+        """
+        訊號主軸的實際頻率：calendar="macro" 時主軸為宏觀發布日 (目前為季)，而不是月線，
+        年化期數改由 dates 的列數 / 涵蓋年數推算；"market" 主軸即價格週期，直接回傳自己。
+        """
+        if self.calendar != "macro":
+            return self
+        dates = pd.DatetimeIndex(dates)
+        years = (dates.max() - dates.min()).days / 365.25 if len(dates) > 1 else 0
+        if years <= 0:
+            return self
+        return replace(self, periods_per_year=max(1, round((len(dates) - 1) / years)))
+
+
+MONTHLY = Frequency("monthly", "1mo", 12, pd.DateOffset(months=1), "macro")
+DAILY = Frequency("daily", "1d", 252, pd.offsets.BDay(1), "market")
+
+FREQUENCIES = {f.name: f for f in (MONTHLY, DAILY)}
+
+
+def get_frequency(frequency=None):
+    """
+    名稱或 Frequency -> Frequency；None 時使用 RuntimeConfig.FREQUENCY。
+    """
+    if isinstance(frequency, Frequency):
+        return frequency
+    if frequency is None:
+        from config.runtime import RuntimeConfig
+
+        frequency = RuntimeConfig.FREQUENCY
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"不支援的頻率: {frequency} (可用: {list(FREQUENCIES)})")
+    return FREQUENCIES[frequency]
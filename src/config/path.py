@@ -1,30 +1,71 @@
+import os
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
 
 
-### data / processed : breadth.csv , final_signal.csv , macro.csv , macro_factor.csv , market_return.csv
+### data / processed : breadth.csv , final_signal.csv , macro.csv , macro_factor.csv , market_return.csv , signal_panel.csv , sweep_results.csv , bootstrap_ci.csv
+### data / processed : walk_forward.csv , walk_forward_equity.csv , macro_factor_pit.csv , constituent_breadth.csv
+### data / processed : analytics.csv , drawdown_episodes.csv , rolling_metrics.csv
+### data / processed : macro_factor_projection.csv , market_return_projection.csv , projection_bands.csv
+### data / charts : backtest.png/.svg , dashboard.png/.svg
 ### data / raw / fred : gdp.csv , m2.csv , yield_2y.csv , yield_10y.csv
-### data / raw : fred_raw.csv
+### data / raw / vintages : gdp.csv , m2.csv (optional, ALFRED)
+### data / raw : fred_raw.csv , fred_catalog.csv (optional) , universe.csv (optional) , constituents.csv
 
 class PathConfig:
 
-    DATA_DIR = ROOT_DIR / "data"  # data
+    DATA_DIR = Path(os.getenv("EMR_DATA_DIR", ROOT_DIR / "data"))  # data (可用 EMR_DATA_DIR 指到其他目錄)
     RAW_DATA_DIR = DATA_DIR / "raw" # data/raw
     PROCESSED_DATA_DIR = DATA_DIR / "processed" # data/processed
     DATA_RAW_FRED = RAW_DATA_DIR / "fred" # data/raw/fred
+    FRED_CACHE_DIR = RAW_DATA_DIR / "fred_cache" # data/raw/fred_cache (每序列增量快取)
+    PRICE_CACHE_DIR = RAW_DATA_DIR / "prices" # data/raw/prices (yfinance 日線快取)
+    ALIGNED_CACHE_DIR = RAW_DATA_DIR / "aligned" # data/raw/aligned (對齊到宏觀日曆的序列快取)
+    VINTAGE_DIR = RAW_DATA_DIR / "vintages" # data/raw/vintages (ALFRED 各序列的歷次發布值)
 
     SRC_DIR = ROOT_DIR / "src" # src
 
+    # 處理後資料的儲存格式："csv" 或 "parquet" (需安裝 pyarrow: pip install ".[parquet]")，見 utils/storage.py
+    STORAGE_FORMAT = os.getenv("EMR_STORAGE_FORMAT", "csv")
+
     ### data / processed
     BREADTH_CSV = PROCESSED_DATA_DIR / "breadth.csv"
+    CONSTITUENT_BREADTH_CSV = PROCESSED_DATA_DIR / "constituent_breadth.csv"  # S&P 500 成分股廣度指標
     FINAL_SIGNAL_CSV = PROCESSED_DATA_DIR / "final_signal.csv"
     MACRO_CSV = PROCESSED_DATA_DIR / "macro.csv"
     MACRO_FACTOR_CSV = PROCESSED_DATA_DIR / "macro_factor.csv"
+    MACRO_FACTOR_PIT_CSV = PROCESSED_DATA_DIR / "macro_factor_pit.csv"  # 每月當時可得數據算出的宏觀係數
     MARKET_RETURN_CSV = PROCESSED_DATA_DIR / "market_return.csv"
+    SWEEP_RESULTS_CSV = PROCESSED_DATA_DIR / "sweep_results.csv"
+    BOOTSTRAP_CSV = PROCESSED_DATA_DIR / "bootstrap_ci.csv"  # 回測指標的自助法信賴區間
+    WALK_FORWARD_CSV = PROCESSED_DATA_DIR / "walk_forward.csv"  # 各視窗選出的參數與樣本外績效
+    WALK_FORWARD_EQUITY_CSV = PROCESSED_DATA_DIR / "walk_forward_equity.csv"  # 串接的樣本外淨值
+    ANALYTICS_CSV = PROCESSED_DATA_DIR / "analytics.csv"  # 策略 / 大盤績效摘要
+    DRAWDOWN_EPISODES_CSV = PROCESSED_DATA_DIR / "drawdown_episodes.csv"
+    ROLLING_METRICS_CSV = PROCESSED_DATA_DIR / "rolling_metrics.csv"  # 滾動夏普 / Sortino
+    SIGNAL_PANEL_CSV = PROCESSED_DATA_DIR / "signal_panel.csv"  # 多標的訊號面板 (長表)
+    # future_mock 的推算疊加層 (原始數據之後的日期) 與蒙地卡羅分位數帶
+    MACRO_FACTOR_PROJECTION_CSV = PROCESSED_DATA_DIR / "macro_factor_projection.csv"
+    MARKET_RETURN_PROJECTION_CSV = PROCESSED_DATA_DIR / "market_return_projection.csv"
+    PROJECTION_BANDS_CSV = PROCESSED_DATA_DIR / "projection_bands.csv"
+
+    ### data
+    PIPELINE_STATE_JSON = DATA_DIR / "pipeline_state.json"  # DAG 各步驟上次成功執行的指紋 (utils/dag.py)
+    RUN_REPORT_JSON = DATA_DIR / "run_report.json"  # 最近一次執行的步驟量測 (utils/telemetry.py)
+    RUN_METRICS_PROM = DATA_DIR / "run_metrics.prom"  # 同上，Prometheus textfile 格式
+    INCREMENTAL_STATE_DIR = DATA_DIR / "state"  # 增量更新的每列輸入雜湊 (utils/incremental.py)
+
+    ### data / charts (副檔名依輸出格式替換，見 utils/render.py)
+    CHARTS_DIR = DATA_DIR / "charts"
+    BACKTEST_CHART = CHARTS_DIR / "backtest.png"  # 動態槓桿 vs 大盤淨值
+    DASHBOARD_CHART = CHARTS_DIR / "dashboard.png"  # 近五年宏觀因子與預期回報
 
     ### data / raw
     FRED_RAW_CSV = RAW_DATA_DIR / "fred_raw.csv"
+    FRED_CATALOG_CSV = RAW_DATA_DIR / "fred_catalog.csv"  # 選用：自訂 FRED 下載清單 (code,name)
+    UNIVERSE_CSV = RAW_DATA_DIR / "universe.csv"  # 選用：多標的面板的標的清單 (ticker)
+    CONSTITUENTS_CSV = RAW_DATA_DIR / "constituents.csv"  # S&P 500 成分股清單 (ticker)，缺少時自動下載
 
     ### data / raw / fred
     GDP_CSV = DATA_RAW_FRED / "gdp.csv"
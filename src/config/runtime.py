@@ -0,0 +1,30 @@
+import os
+
+
+class RuntimeConfig:
+
+    # 離線模式：只讀本地快取、不連網 (環境變數 EMR_OFFLINE=1)
+    OFFLINE = os.getenv("EMR_OFFLINE", "0") == "1"
+
+    # 無頭模式：關閉進度條與展示用的停頓 (環境變數 EMR_HEADLESS=1 或 main.py --headless)
+    HEADLESS = os.getenv("EMR_HEADLESS", "0") == "1"
+
+    # 管線頻率："monthly" (預設) 或 "daily"，見 config/frequency.py (環境變數 EMR_FREQUENCY)
+    FREQUENCY = os.getenv("EMR_FREQUENCY", "monthly")
+
+    # 增量模式：只重算新增的尾段並附加寫入 (環境變數 EMR_INCREMENTAL=1 或 main.py --incremental)
+    INCREMENTAL = os.getenv("EMR_INCREMENTAL", "0") == "1"
+
+    # 執行報告記錄各步驟的峰值記憶體 (tracemalloc，會拖慢管線；環境變數 EMR_TRACE_MEMORY=1)
+    TRACE_MEMORY = os.getenv("EMR_TRACE_MEMORY", "0") == "1"
+
+    # 圖表渲染的背景行程數；0 = 在目前行程同步渲染 (環境變數 EMR_RENDER_WORKERS)，見 utils/render.py
+    RENDER_WORKERS = int(os.getenv("EMR_RENDER_WORKERS", "2"))
+
+    # Point-in-time：訊號改用每月當時已發布的宏觀數據 (macro_factor_pit.csv)，回測不含修正值的前視
+    # (環境變數 EMR_POINT_IN_TIME=1 或 main.py --point-in-time)，見 utils/vintage.py
+    POINT_IN_TIME = os.getenv("EMR_POINT_IN_TIME", "0") == "1"
+
+    # 成分股廣度：加入 S&P 500 成分股的騰落線、均線之上比例與新高新低步驟 (約 500 檔日線)
+    # (環境變數 EMR_CONSTITUENT_BREADTH=1 或 main.py --constituents)，見 breadth/constituents.py
+    CONSTITUENT_BREADTH = os.getenv("EMR_CONSTITUENT_BREADTH", "0") == "1"
@@ -0,0 +1,230 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.frequency import get_frequency
+from config.path import PathConfig
+from decision.backtest import backtest_engine
+from utils import storage
+from utils.incremental import rolling_sum
+
+# =========================================================
+#  績效分析 (皆沿最後一軸運算，(T,) 單一序列或 (N, T) 批次皆可，
+#  例如 sweep.calc_strategy_returns 的整個輸出矩陣)
+# =========================================================
+
+
+def _equity(returns, base=100.0):
+    # 與 calc_equity 相同，但 NaN 期視為報酬 0 (淨值沿用前值，不留 NaN)
+    return base * np.cumprod(1 + np.nan_to_num(returns), axis=-1)
+
+
+def _ratio(num, den):
+    # 分母為 0 時回傳 NaN (例如沒有虧損期的 Sortino、沒有回撤的 Calmar)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den == 0, np.nan, num / den)
+
+
+def calc_drawdown(returns):
+    """
+    逐期回撤 (負值，創新高時為 0)。
+    """
+    equity = _equity(np.asarray(returns, dtype=float))
+    return equity / np.maximum.accumulate(equity, axis=-1) - 1
+
+
+def rolling_metrics(returns, window, periods_per_year=12):
+    """
+    滾動年化夏普 / Sortino (目標報酬 0)，一次滾動加總共用於兩者；
+    視窗內有 NaN 時為 NaN (與 pandas rolling 預設相同)。回傳 {"sharpe", "sortino"}。
+    """
+    r = np.moveaxis(np.asarray(returns, dtype=float), -1, 0)
+    total = rolling_sum(r, window)
+    sqr = rolling_sum(r**2, window)
+    down = rolling_sum(np.minimum(r, 0) ** 2, window)
+
+    mean = total / window
+    std = np.sqrt(np.maximum(sqr - total * mean, 0) / (window - 1))
+    scale = periods_per_year**0.5
+    return {
+        "sharpe": np.moveaxis(_ratio(mean, std) * scale, 0, -1),
+        "sortino": np.moveaxis(_ratio(mean, np.sqrt(down / window)) * scale, 0, -1),
+    }
+
+
+def drawdown_episodes(returns, dates=None):
+    """
+    每段回撤一列：series (第幾條序列)、peak (前高)、trough (谷底)、recovery (回到前高，
+    未回復為空)、depth、length (前高到回復或序列結尾的期數)。
+    全部序列一起找出入水 / 出水的邊界，不逐條迴圈。
+    """
+    dd = np.atleast_2d(calc_drawdown(returns))
+    n, t = dd.shape
+    under = np.zeros((n, t + 2), dtype=np.int8)
+    under[:, 1:-1] = dd < 0
+    edges = np.diff(under, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    # 各段谷底：以段起點切割攤平的回撤做 reduceat (段與段之間的回撤為 0，不影響最小值)
+    flat = dd.ravel()
+    offsets = rows * t + starts
+    depth = np.minimum.reduceat(flat, offsets) if len(offsets) else np.array([])
+    positions = np.flatnonzero(under[:, 1:-1].ravel())
+    episode = np.searchsorted(offsets, positions, side="right") - 1
+    at_trough = positions[flat[positions] == depth[episode]]
+    first = np.unique(episode[flat[positions] == depth[episode]], return_index=True)[1]
+    troughs = at_trough[first] - rows * t
+
+    episodes = pd.DataFrame(
+        {
+            "series": rows,
+            "peak": starts - 1,
+            "trough": troughs,
+            "recovery": np.where(ends < t, ends, -1),
+            "depth": depth,
+            "length": ends - starts + 1,
+        }
+    )
+    if dates is not None:
+        dates = pd.DatetimeIndex(dates)
+        for col in ("peak", "trough", "recovery"):
+            idx = episodes[col].to_numpy()
+            episodes[col] = dates[idx].where(idx >= 0)
+    else:
+        episodes["recovery"] = episodes["recovery"].where(episodes["recovery"] >= 0)
+    return episodes
+
+
+def calc_turnover(leverage, periods_per_year=12, years=None):
+    """
+    訊號切換造成的換手：回傳 (年化槓桿變動量, 切換次數)；years 未指定時以期數 / periods_per_year 計。
+    """
+    change = np.abs(np.diff(np.asarray(leverage, dtype=float), axis=-1))
+    change = np.nan_to_num(change)
+    if years is None:
+        years = change.shape[-1] / periods_per_year
+    return change.sum(axis=-1) / years, (change > 0).sum(axis=-1)
+
+
+def time_in_market(leverage, levels=None):
+    """
+    各槓桿倍數的持有時間比例 (不計 NaN 期)，回傳 {槓桿: 比例陣列}。
+    """
+    leverage = np.asarray(leverage, dtype=float)
+    if levels is None:
+        levels = np.unique(leverage[~np.isnan(leverage)])
+    counts = (~np.isnan(leverage)).sum(axis=-1)
+    return {
+        float(level): (leverage == level).sum(axis=-1) / counts for level in levels
+    }
+
+
+def calc_summary(returns, leverage=None, periods_per_year=12, dates=None):
+    """
+    一次算出每條序列的總報酬、CAGR、波動度、夏普、Sortino、MDD、Calmar、最長回撤期數，
+    給 leverage 時另加換手與各槓桿的持有時間；淨值與回撤只算一次供各指標共用。
+    給 dates 時 CAGR / Calmar / 換手以首尾日期的實際年數年化 (主軸列距不固定時不能以期數換算)。
+    """
+    returns = np.atleast_2d(np.asarray(returns, dtype=float))
+    mask = np.isnan(returns)
+    count = (~mask).sum(axis=-1)
+    values = np.where(mask, 0.0, returns)
+
+    equity = _equity(values)
+    drawdown = equity / np.maximum.accumulate(equity, axis=-1) - 1
+    total = equity[:, -1] / 100 - 1
+    if dates is not None:
+        dates = pd.DatetimeIndex(dates)
+        years = (dates[-1] - dates[0]).days / 365.25
+    else:
+        years = count / periods_per_year
+    cagr = (1 + total) ** (1 / years) - 1
+    mdd = drawdown.min(axis=-1)
+
+    mean = values.sum(axis=-1) / count
+    sqr = np.where(mask, 0.0, (values - mean[:, None]) ** 2)
+    std = np.sqrt(sqr.sum(axis=-1) / (count - 1))
+    downside = np.sqrt((np.minimum(values, 0) ** 2).sum(axis=-1) / count)
+    scale = periods_per_year**0.5
+
+    # 最長回撤：連續水下期數 (含前高)，以水下旗標的累加計數一次算出
+    under = drawdown < 0
+    run = np.cumsum(under, axis=-1)
+    run -= np.maximum.accumulate(np.where(under, 0, run), axis=-1)
+    longest = np.where(under.any(axis=-1), run.max(axis=-1) + 1, 0)
+
+    summary = pd.DataFrame(
+        {
+            "total_return": total,
+            "cagr": cagr,
+            "volatility": std * scale,
+            "sharpe": np.where(std == 0, 0.0, _ratio(mean, std) * scale),
+            "sortino": _ratio(mean, downside) * scale,
+            "max_drawdown": mdd,
+            "calmar": _ratio(cagr, -mdd),
+            "max_drawdown_periods": longest,
+        }
+    )
+    if leverage is not None:
+        leverage = np.broadcast_to(np.asarray(leverage, dtype=float), returns.shape)
+        summary["turnover"], summary["changes"] = calc_turnover(
+            leverage, periods_per_year, years if dates is not None else None
+        )
+        for level, share in time_in_market(leverage).items():
+            summary[f"time_{level:g}x"] = share
+    return summary
+
+
+# =========================================================
+#  Pipeline 流程
+# =========================================================
+
+
+def run_analytics(
+    path=PathConfig.FINAL_SIGNAL_CSV,
+    output_path=PathConfig.ANALYTICS_CSV,
+    episodes_path=PathConfig.DRAWDOWN_EPISODES_CSV,
+    rolling_path=PathConfig.ROLLING_METRICS_CSV,
+    window=None,
+    params=None,
+    frequency=None,
+):
+    """
+    對回測的策略與大盤輸出績效摘要、回撤區段與滾動夏普 / Sortino (預設一年視窗)。
+    """
+    df = storage.read_frame(path, ["date", "Close", "signal"])
+    df = df.sort_values("date").reset_index(drop=True)
+    freq = get_frequency(frequency).on_axis(df["date"])
+    window = window or freq.periods(12)
+    ppy = freq.periods_per_year
+    result = backtest_engine(df, periods_per_year=ppy, params=params)
+
+    names = ["strategy", "benchmark"]
+    returns = np.stack([result.strategy_return, result.benchmark_return])
+    leverage = np.stack([result.leverage, np.where(np.isnan(result.leverage), np.nan, 1.0)])
+
+    summary = calc_summary(returns, leverage, ppy, dates=result.date)
+    summary.insert(0, "series", names)
+
+    episodes = drawdown_episodes(returns, result.date)
+    episodes["series"] = np.asarray(names)[episodes["series"]]
+
+    rolling = pd.DataFrame({"date": result.date})
+    for metric, values in rolling_metrics(returns, window, ppy).items():
+        for name, series in zip(names, values):
+            rolling[f"{name}_{metric}"] = series
+
+    for label, out, frame in (
+        ("績效摘要", output_path, summary),
+        ("回撤區段", episodes_path, episodes),
+        ("滾動指標", rolling_path, rolling),
+    ):
+        target = storage.write_frame(frame, out)
+        logging.info(f"   [Analytics] {label}已儲存至 {target}")
+    return summary, episodes, rolling
+
+
+if __name__ == "__main__":
+    print(run_analytics()[0].to_string(index=False))
@@ -1,120 +1,224 @@
 import logging
-import os
-import time
+from dataclasses import dataclass
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
+from config.frequency import get_frequency
 from config.path import PathConfig
-
-
-def run_backtest(path: str | None = None):
-    if not os.path.exists(path):
+from decision.rules import SIGNAL_RULES
+from utils import render, storage
+from utils.progress import progress
+from utils.schema import SIGNAL
+
+
+# =========================================================
+#  向量化回測核心 (皆沿最後一軸運算，1-D 單一策略或 2-D 批次皆可)
+# =========================================================
+
+
+def calc_pct_change(close):
+    """
+    與 Series.pct_change() 相同：close / close.shift(1) - 1。
+    """
+    close = np.asarray(close, dtype=float)
+    ret = np.full(close.shape, np.nan)
+    ret[..., 1:] = close[..., 1:] / close[..., :-1] - 1
+    return ret
+
+
+def calc_strategy_return(leverage, market_ret, rf, borrow_cost):
+    """
+    槓桿 -> 單期策略報酬；rf / borrow_cost 為單期利率。
+    """
+    lev = np.asarray(leverage, dtype=float)
+    ret = np.asarray(market_ret, dtype=float)
+    return np.select(
+        [np.isnan(lev), lev > 1, lev == 1, lev == 0],
+        [
+            0.0,
+            # 公式: Leverage * Return - (Leverage - 1) * Cost
+            (ret * lev) - ((lev - 1) * borrow_cost),
+            ret,
+            # 空手：持有現金賺無風險利息
+            rf,
+        ],
+        # 部分持倉，其餘現金賺無風險利息
+        default=(ret * lev) + ((1 - lev) * rf),
+    )
+
+
+def calc_equity(returns, base=100.0):
+    """
+    淨值曲線：與 (1 + r).cumprod() * base 相同 (NaN 跳過)，首筆固定為 base。
+    """
+    growth = 1 + np.asarray(returns, dtype=float)
+    mask = np.isnan(growth)
+    equity = np.cumprod(np.where(mask, 1.0, growth), axis=-1)
+    equity[mask] = np.nan
+    equity *= base
+    equity[..., 0] = base
+    return equity
+
+
+def calc_max_drawdown(equity):
+    """
+    最大回撤 (負值)。
+    """
+    equity = np.asarray(equity, dtype=float)
+    peak = np.maximum.accumulate(np.where(np.isnan(equity), -np.inf, equity), axis=-1)
+    drawdown = (equity - peak) / peak
+    return np.nanmin(drawdown, axis=-1)
+
+
+def calc_sharpe(returns, periods_per_year=12):
+    """
+    簡單年化夏普：mean / std(ddof=1) * sqrt(periods)，與 pandas 的 NaN 處理一致。
+    """
+    returns = np.asarray(returns, dtype=float)
+    mask = np.isnan(returns)
+    count = (~mask).sum(axis=-1)
+    values = np.where(mask, 0.0, returns)
+    mean = values.sum(axis=-1) / count
+    sqr = (np.expand_dims(mean, -1) - values) ** 2
+    sqr[mask] = 0
+    std = np.sqrt(sqr.sum(axis=-1) / (count - 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (mean / std) * (periods_per_year**0.5)
+    return np.where(std == 0, 0.0, sharpe)
+
+
+@dataclass
+class BacktestResult:
+    """
+    單次回測結果：逐期陣列 + 績效指標。
+    """
+
+    date: np.ndarray
+    signal: np.ndarray  # int8 代碼 (utils/schema.py 的 SIGNAL)
+    leverage: np.ndarray
+    benchmark_return: np.ndarray
+    strategy_return: np.ndarray
+    benchmark_equity: np.ndarray
+    strategy_equity: np.ndarray
+    total_ret_bench: float
+    total_ret_strat: float
+    mdd_bench: float
+    mdd_strat: float
+    sharpe_bench: float
+    sharpe_strat: float
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {
+                "date": self.date,
+                "signal": SIGNAL.categorical(self.signal),
+                "leverage": self.leverage,
+                "pct_change": self.benchmark_return,
+                "strategy_return": self.strategy_return,
+                "benchmark_equity": self.benchmark_equity,
+                "strategy_equity": self.strategy_equity,
+            }
+        )
+
+
+def backtest_engine(
+    df,
+    risk_free_rate_annual=0.03,  # 無風險利率 (持有現金時賺的，年化 3%)
+    borrowing_cost_annual=0.05,  # 借貸成本 (開槓桿要付的利息 + 耗損，年化 5%)
+    periods_per_year=12,
+    rules=SIGNAL_RULES,
+    params=None,
+):
+    """
+    欄位式回測：df 需含 date / Close / signal，依日期排序。
+    """
+    signal = SIGNAL.encode(df["signal"])
+
+    #  計算大盤回報 (Benchmark Return)
+    bench_ret = calc_pct_change(df["Close"])
+
+    # Shift 1: 用上一期的信號操作這一期
+    leverage = np.full(len(signal), np.nan)
+    leverage[1:] = rules.leverage(signal, params)[:-1]
+
+    strat_ret = calc_strategy_return(
+        leverage,
+        bench_ret,
+        risk_free_rate_annual / periods_per_year,
+        borrowing_cost_annual / periods_per_year,
+    )
+
+    # 假設初始資金 100
+    bench_equity = calc_equity(bench_ret)
+    strat_equity = calc_equity(strat_ret)
+
+    return BacktestResult(
+        date=np.asarray(df["date"]),
+        signal=signal,
+        leverage=leverage,
+        benchmark_return=bench_ret,
+        strategy_return=strat_ret,
+        benchmark_equity=bench_equity,
+        strategy_equity=strat_equity,
+        total_ret_bench=float(bench_equity[-1] / 100 - 1),
+        total_ret_strat=float(strat_equity[-1] / 100 - 1),
+        mdd_bench=float(calc_max_drawdown(bench_equity)),
+        mdd_strat=float(calc_max_drawdown(strat_equity)),
+        sharpe_bench=float(calc_sharpe(bench_ret, periods_per_year)),
+        sharpe_strat=float(calc_sharpe(strat_ret, periods_per_year)),
+    )
+
+
+def plot_equity(fig, date, benchmark_equity, strategy_equity):
+    """
+    大盤與策略淨值 (對數座標)；長序列依圖寬降採樣，保留每個像素的高低點。
+    """
+    width = render.pixel_width(fig)
+    ax = fig.subplots()
+    ax.plot(*render.decimate(date, benchmark_equity, width), label="S&P 500 (1x)", color="gray", linestyle="--", alpha=0.6)
+    ax.plot(*render.decimate(date, strategy_equity, width), label="MVP Dynamic (0x-2x)", color="red", linewidth=2)
+
+    ax.set_title(" Dynamic Leverage vs S&P 500", fontsize=14)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Equity (Log Scale)")
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    ax.set_yscale("log")  # 開啟對數座標
+
+
+def run_backtest(path: str | None = None, params=None, frequency=None, chart_path=PathConfig.BACKTEST_CHART):
+    if not storage.exists(path):
         logging.error(" 錯誤：找不到數據文件，請先執行 main.py。")
-        return
+        return False
 
     logging.info(" 正在進行 Phase 4 回測：動態槓桿 (Dynamic Leverage)...")
 
-    # 定義最大回撤計算函數
-    def calc_max_drawdown(equity_series):
-        peak = equity_series.cummax()
-        drawdown = (equity_series - peak) / peak
-        return drawdown.min()
-
-    with tqdm(total=5, desc="全流程回測執行中", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}, {postfix}]") as pbar:
+    with progress(total=3, desc="全流程回測執行中", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}, {postfix}]") as pbar:
 
         # 加載數據
-        pbar.set_postfix_str("讀取數據 CSV...")
-        df = pd.read_csv(path, parse_dates=["date"])
+        pbar.set_postfix_str("讀取數據...")
+        df = storage.read_frame(path, ["date", "Close", "signal"])
         df = df.sort_values("date").reset_index(drop=True)
-        time.sleep(0.3)
-        pbar.update(1)
-
-        # 基礎指標計算
-        pbar.set_postfix_str("計算市場回報與信號平移...")
-        #  計算大盤回報 (Benchmark Return)
-        # 用 Close 價格計算
-        df["pct_change"] = df["Close"].pct_change()
-
-        # 定義策略邏輯
-        # Shift 1: 用上個月的信號操作這個月
-        df["signal_shifted"] = df["signal"].shift(1)
-
-        risk_free_rate_annual = 0.03  # 無風險利率 (持有現金時賺的，年化 3%)
-        borrowing_cost_annual = 0.05  # 借貸成本 (開槓桿要付的利息 + 耗損，年化 5%)
-
-        rf_monthly = risk_free_rate_annual / 12
-        borrow_cost_monthly = borrowing_cost_annual / 12
-
-        def calculate_strategy_return(row):
-            sig = row["signal_shifted"]
-            market_ret = row["pct_change"]
-            if pd.isna(sig): return 0  # noqa: E701
-
-            #  動態槓桿邏輯
-            if sig == "BULL":
-                #  兩倍槓桿
-                leverage = 2.0
-                # 回報 = (市場漲跌 * 2) - (借那一半錢的利息成本)
-                # 公式: Leverage * Return - (Leverage - 1) * Cost
-                strat_ret = (market_ret * leverage) - ((leverage - 1) * borrow_cost_monthly)
-                return strat_ret
-            elif sig == "NEUTRAL":
-                # 一倍槓桿
-                return market_ret
-            else:  # BEAR
-                # 空手
-                # 持有現金賺無風險利息
-                return rf_monthly
-
-        time.sleep(0.3)
         pbar.update(1)
 
         # 策略回測執行
         pbar.set_postfix_str("執行動態槓桿回測...")
-        df["strategy_return"] = [calculate_strategy_return(row) for _, row in df.iterrows()]
-        pbar.update(1)
-
-        # 績效指標分析
-        pbar.set_postfix_str("計算淨值曲線與風險指標...")
-        # 計算淨值曲線
-        # 假設初始資金 100
-        df["benchmark_equity"] = (1 + df["pct_change"]).cumprod() * 100
-        df["strategy_equity"] = (1 + df["strategy_return"]).cumprod() * 100
-
-        # 填補第一筆 NaN 為 100
-        df.loc[0, "benchmark_equity"] = 100
-        df.loc[0, "strategy_equity"] = 100
-
-        #  計算績效指標
-        total_ret_bench = (df["benchmark_equity"].iloc[-1] / 100) - 1
-        total_ret_strat = (df["strategy_equity"].iloc[-1] / 100) - 1
-
-        # 最大回撤
-        mdd_bench = calc_max_drawdown(df["benchmark_equity"])
-        mdd_strat = calc_max_drawdown(df["strategy_equity"])
-
-        # 夏普比率
-        # 簡單年化處理
-        if df["pct_change"].std() == 0:
-            sharpe_bench = 0
-        else:
-            sharpe_bench = (df["pct_change"].mean() / df["pct_change"].std()) * (12**0.5)
-
-        if df["strategy_return"].std() == 0:
-            sharpe_strat = 0
-        else:
-            sharpe_strat = (df["strategy_return"].mean() / df["strategy_return"].std()) * (12**0.5)
-
-        time.sleep(0.3)
+        result = backtest_engine(
+            df,
+            periods_per_year=get_frequency(frequency).on_axis(df["date"]).periods_per_year,
+            params=params,
+        )
         pbar.update(1)
 
         # 準備圖表與報告
         pbar.set_postfix_str("渲染回測報告...")
-        time.sleep(0.3)
         pbar.update(1)
 
+    total_ret_bench, total_ret_strat = result.total_ret_bench, result.total_ret_strat
+    mdd_bench, mdd_strat = result.mdd_bench, result.mdd_strat
+    sharpe_bench, sharpe_strat = result.sharpe_bench, result.sharpe_strat
+
     #  生成回測報告
     print("\n" + "=" * 50)
     print(" 【回測：動態槓桿】")
@@ -134,19 +238,20 @@ def run_backtest(path: str | None = None):
     print("-" * 60)
     print("=" * 50 + "\n")
 
-    # 7. 畫圖
-    plt.figure(figsize=(12, 6))
-    plt.plot(df["date"], df["benchmark_equity"], label="S&P 500 (1x)", color="gray", linestyle="--", alpha=0.6)
-    plt.plot(df["date"], df["strategy_equity"], label="MVP Dynamic (0x-2x)", color="red", linewidth=2)
+    # 7. 畫圖 (背景行程輸出 PNG / SVG，不阻塞後續步驟；chart_path=None 不畫)
+    if chart_path is not None:
+        render.submit(
+            plot_equity,
+            chart_path,
+            result.date,
+            result.benchmark_equity,
+            result.strategy_equity,
+            figsize=(12, 6),
+        )
 
-    plt.title(" Dynamic Leverage vs S&P 500", fontsize=14)
-    plt.xlabel("Date")
-    plt.ylabel("Equity (Log Scale)")
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.yscale("log")  # 開啟對數座標
-    plt.show()
+    return result
 
 
 if __name__ == "__main__":
-    run_backtest(PathConfig.FINAL_SIGNAL_CSV)
\ No newline at end of file
+    run_backtest(PathConfig.FINAL_SIGNAL_CSV)
+    render.wait()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config.frequency import get_frequency
+from config.path import PathConfig
+from decision.backtest import backtest_engine, calc_equity, calc_max_drawdown, calc_sharpe
+from utils import storage
+from utils.progress import progress
+
+METRICS = ("total_return", "max_drawdown", "sharpe")
+METHODS = ("stationary", "block")
+
+
+# =========================================================
+#  重抽樣索引 (S 組 x T 期，一次產生)
+# =========================================================
+
+
+def stationary_indices(n, n_samples, block, rng):
+    """
+    Politis-Romano 平穩自助法：每期以 1 / block 的機率跳到隨機位置，否則接續下一期 (環狀)。
+    區塊長度為幾何分配，平均為 block。
+    """
+    jump = rng.random((n_samples, n)) < 1 / block
+    jump[:, 0] = True
+    starts = rng.integers(0, n, (n_samples, n))
+
+    # 每一格所屬區塊的起點欄位 -> 起點的隨機位置 + 區塊內位移
+    col = np.arange(n)
+    block_start = np.maximum.accumulate(np.where(jump, col, 0), axis=1)
+    origin = np.take_along_axis(starts, block_start, axis=1)
+    return (origin + col - block_start) % n
+
+
+def block_indices(n, n_samples, block, rng):
+    """
+    環狀區塊自助法：固定長度 block 的區塊隨機起點串接，截斷為 n 期。
+    """
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, (n_samples, n_blocks, 1))
+    return ((starts + np.arange(block)) % n).reshape(n_samples, -1)[:, :n]
+
+
+def resample_indices(method, n, n_samples, block, rng):
+    if method == "stationary":
+        return stationary_indices(n, n_samples, block, rng)
+    if method == "block":
+        return block_indices(n, n_samples, block, rng)
+    raise ValueError(f"不支援的自助法: {method} (可用: {list(METHODS)})")
+
+
+# =========================================================
+#  批次評估
+# =========================================================
+
+
+def evaluate_paths(returns, periods_per_year=12):
+    """
+    (..., T) 報酬陣列 -> 總報酬 / MDD / 夏普 (與 backtest_engine 相同的核心；
+    首期補 NaN 作為淨值基期，定義與點估計一致)。
+    """
+    returns = np.asarray(returns, dtype=float)
+    base = np.full(returns.shape[:-1] + (1,), np.nan)
+    returns = np.concatenate([base, returns], axis=-1)
+    equity = calc_equity(returns)
+    return {
+        "total_return": equity[..., -1] / 100 - 1,
+        "max_drawdown": calc_max_drawdown(equity),
+        "sharpe": calc_sharpe(returns, periods_per_year),
+    }
+
+
+def bootstrap_batch(strategy, benchmark, n_samples, seed, method, block, periods_per_year):
+    """
+    同一組索引重抽策略與大盤 (保留兩者的同期相關)，回傳各指標 (2, S) 陣列。
+    """
+    rng = np.random.default_rng(seed)
+    idx = resample_indices(method, len(strategy), n_samples, block, rng)
+    paths = np.stack([strategy[idx], benchmark[idx]])
+    return evaluate_paths(paths, periods_per_year)
+
+
+# 子行程共用的報酬序列 (initializer 只傳一次)
+_WORKER_RETURNS = None
+
+
+def _init_worker(strategy, benchmark):
+    global _WORKER_RETURNS
+    _WORKER_RETURNS = (strategy, benchmark)
+
+
+def _run_chunk(args):
+    return bootstrap_batch(*_WORKER_RETURNS, *args)
+
+
+def summarize(samples, point, ci=0.95):
+    """
+    各指標的點估計、信賴區間與策略勝過大盤的機率 (MDD 為負值，較大即回撤較淺)。
+    """
+    lo, hi = (1 - ci) / 2 * 100, (1 + ci) / 2 * 100
+    rows = []
+    for metric in METRICS:
+        strat, bench = samples[metric]
+        diff = strat - bench
+        rows.append(
+            {
+                "metric": metric,
+                "strategy": point[metric][0],
+                "strategy_lo": np.nanpercentile(strat, lo),
+                "strategy_hi": np.nanpercentile(strat, hi),
+                "benchmark": point[metric][1],
+                "benchmark_lo": np.nanpercentile(bench, lo),
+                "benchmark_hi": np.nanpercentile(bench, hi),
+                "diff_lo": np.nanpercentile(diff, lo),
+                "diff_hi": np.nanpercentile(diff, hi),
+                "p_strategy_beats": float(np.mean(strat > bench)),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def run_bootstrap(
+    path=PathConfig.FINAL_SIGNAL_CSV,
+    output_path=PathConfig.BOOTSTRAP_CSV,
+    method="stationary",
+    block=None,
+    n_samples=10_000,
+    ci=0.95,
+    seed=42,
+    chunk_size=None,
+    max_workers=None,
+    params=None,
+    frequency=None,
+):
+    """
+    對回測的策略 / 大盤報酬做自助法重抽 (stationary 或 block，平均區塊長度預設一年)，
+    批次陣列評估並分散到行程池，輸出信賴區間與策略勝過大盤的機率。
+    每批的亂數種子由 seed 衍生，結果與行程數無關；chunk_size 預設依序列長度限制每批記憶體。
+    """
+    if method not in METHODS:
+        raise ValueError(f"不支援的自助法: {method} (可用: {list(METHODS)})")
+
+    df = storage.read_frame(path, ["date", "Close", "signal"])
+    df = df.sort_values("date").reset_index(drop=True)
+    freq = get_frequency(frequency).on_axis(df["date"])
+    block = block or freq.periods(12)
+    result = backtest_engine(df, periods_per_year=freq.periods_per_year, params=params)
+
+    # 首期沒有報酬 (淨值基期)
+    strategy = result.strategy_return[1:]
+    benchmark = result.benchmark_return[1:]
+    point = {
+        "total_return": (result.total_ret_strat, result.total_ret_bench),
+        "max_drawdown": (result.mdd_strat, result.mdd_bench),
+        "sharpe": (result.sharpe_strat, result.sharpe_bench),
+    }
+
+    chunk_size = chunk_size or max(1, min(500, 2_000_000 // len(strategy)))
+    sizes = [min(chunk_size, n_samples - i) for i in range(0, n_samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(size, s, method, block, freq.periods_per_year) for size, s in zip(sizes, seeds)]
+    logging.info(
+        f"   [Bootstrap] {method} 自助法 {n_samples} 組 (區塊 {block} 期)，{len(tasks)} 批次"
+    )
+
+    batches = []
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(strategy, benchmark),
+    ) as pool:
+        with progress(total=n_samples, desc="自助法重抽中") as pbar:
+            for size, batch in zip(sizes, pool.map(_run_chunk, tasks)):
+                batches.append(batch)
+                pbar.update(size)
+
+    samples = {m: np.concatenate([b[m] for b in batches], axis=-1) for m in METRICS}
+    summary = summarize(samples, point, ci)
+
+    target = storage.write_frame(summary, output_path)
+    logging.info(f"   [Bootstrap] 信賴區間已儲存至 {target}")
+    return summary
+
+
+if __name__ == "__main__":
+    print(run_bootstrap().to_string(index=False))
@@ -0,0 +1,80 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.path import PathConfig
+from utils import render, storage
+
+
+def plot_dashboard(fig, date, macro_factor, final_return):
+    """
+    宏觀因子 (左軸) 與調整後預期回報 (右軸，正負區間上色)；長序列依圖寬降採樣。
+    """
+    width = render.pixel_width(fig)
+    ax1 = fig.subplots()
+    ax1.set_xlabel("Date")
+    ax1.set_ylabel("Macro Factor", color="tab:blue")
+    ax1.plot(
+        *render.decimate(date, macro_factor, width),
+        color="tab:blue",
+        label="Macro Factor",
+        alpha=0.8,
+    )
+    ax1.axhline(y=1.0, color="gray", linestyle="--")
+
+    date, final_return = render.decimate(date, final_return, width)
+    ax2 = ax1.twinx()
+    ax2.set_ylabel("Final Return (Adjusted)", color="tab:orange")
+    ax2.plot(
+        date,
+        final_return,
+        color="tab:orange",
+        label="Adjusted Return",
+    )
+    ax2.fill_between(
+        date,
+        final_return,
+        0,
+        where=(final_return >= 0),
+        color="tab:green",
+        alpha=0.2,
+    )
+    ax2.fill_between(
+        date,
+        final_return,
+        0,
+        where=(final_return < 0),
+        color="tab:red",
+        alpha=0.2,
+    )
+
+    ax1.set_title("MVP Quant Dashboard: Last 5 Years Projection")
+    fig.tight_layout()
+
+
+def visualize(chart_path=PathConfig.DASHBOARD_CHART):
+    path = PathConfig.FINAL_SIGNAL_CSV
+    if not storage.exists(path):
+        logging.warning("No signal file found to plot.")
+        return
+
+    df = storage.read_frame(path, ["date", "macro_factor", "final_return"])
+    recent_date = df["date"].max() - pd.DateOffset(years=5)
+    df_recent = df[df["date"] >= recent_date]
+
+    if not df_recent.empty:
+        # 背景行程輸出 PNG / SVG，不阻塞後續步驟
+        return render.submit(
+            plot_dashboard,
+            chart_path,
+            df_recent["date"].to_numpy(),
+            df_recent["macro_factor"].to_numpy(dtype=np.float64),
+            df_recent["final_return"].to_numpy(dtype=np.float64),
+            figsize=(14, 7),
+        )
+
+
+if __name__ == "__main__":
+    visualize()
+    render.wait()
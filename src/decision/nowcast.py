@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime
+
+from config.path import PathConfig
+from decision.rules import NOWCAST_RULES
+from macro import macro_factor_calc
+from utils import storage
+
+
+def _value(rows, *keys, default):
+    """
+    由後往前找第一個非空值 (等同 ffill 後取最後一列)；欄位都不存在時回傳 default。
+    """
+    for key in keys:
+        if key in rows[-1]:
+            for row in reversed(rows):
+                if row[key] != "":
+                    return float(row[key])
+    return default
+
+
+def calc_nowcast():
+    """
+    讀取最新的宏觀係數與訊號資料，回傳即時建議 (dict，可直接輸出 JSON)。
+    """
+    #  讀取與檢查數據
+    macro_path = PathConfig.MACRO_FACTOR_CSV
+    if not storage.exists(macro_path):
+        raise FileNotFoundError(f"找不到數據檔案: {macro_path}")
+
+    # 只需要最新一列與三期前；缺值以較早的列填補 (ffill)
+    rows = storage.read_tail(macro_path, 4)
+    if not rows:
+        raise ValueError(f"數據檔案沒有資料: {macro_path}")
+    if any(v == "" for row in rows for v in row.values()):
+        logging.warning("檢測到數據缺失，執行自動填充")
+    prev_rows = rows[:1]
+
+    current_snapshot = {
+        "10Y_Yield": _value(rows, "10Y_Yield", "DGS10", default=4.0),
+        "2Y_Yield": _value(rows, "2Y_Yield", "DGS2", default=3.8),
+        "Jobless_Claims_4W_MA": _value(rows, "Jobless_Claims", "ICSA", default=220000),
+        "Jobless_Claims_3M_Ago": _value(prev_rows, "Jobless_Claims", "ICSA", default=210000),
+        "PMI": _value(rows, "PMI", default=50.0),
+    }
+
+    #  計算當下宏觀係數
+    nowcast_factor, risks = macro_factor_calc.calculate_macro_factor(current_snapshot)
+
+    #  取得估值與廣度資訊
+    signal_path = PathConfig.FINAL_SIGNAL_CSV
+    raw_expected_return = 0.05
+    breadth_status = "UNKNOWN"
+
+    if storage.exists(signal_path):
+        signal_rows = storage.read_tail(signal_path)
+        raw_expected_return = _value(signal_rows, "expected_return", default=0.05)
+        breadth_status = signal_rows[-1].get("breadth_signal", "HEALTHY")
+
+    #  決策運算
+    final_decision_return = raw_expected_return * nowcast_factor
+
+    # 槓桿與操作邏輯判斷 (規則表見 decision/rules.py)
+    decision = NOWCAST_RULES.decide(
+        final_return=final_decision_return,
+        macro_factor=nowcast_factor,
+        breadth_signal=breadth_status,
+    )
+    action = NOWCAST_RULES.action(decision)
+    return {
+        "expected_return": float(raw_expected_return),
+        "macro_factor": float(nowcast_factor),
+        "risks": risks,
+        "breadth_signal": breadth_status,
+        "final_return": float(final_decision_return),
+        "decision": decision,
+        "leverage": float(action.leverage),
+        "action": action.label,
+        "reason": action.reason,
+    }
+
+
+def nowcast(target_date_str):
+    """
+    [Step 10] Real-Time Nowcasting & Actionable Advice
+    """
+    logging.info("[Step 10] Executing High-Frequency Nowcasting...")
+
+    try:
+        advice = calc_nowcast()
+        leverage = advice["leverage"]
+
+        #  輸出實戰診斷儀表板
+        print(f"\n 數據基準日: {target_date_str}")
+        print("-" * 50)
+        print(" 模型指標摘要:")
+        print(f"   - 預期年化報酬: {advice['expected_return']:.2%}")
+        print(f"   - 宏觀風險修正: x{advice['macro_factor']:.2f}")
+        print(f"   - 市場廣度狀態: {advice['breadth_signal']}")
+        print("-" * 50)
+        print(f" 修正後預期回報: {advice['final_return']:.2%}")
+
+        #  資產操作指令與槓桿建議
+        print("\n 【推薦動作】")
+        print("-" * 50)
+        print(f"指令動態：{advice['action']}")
+        print(f"槓桿倍數：{leverage}x")
+        print(
+            f"建議配置：{int(leverage * 100)}% 部位投資於 SPY/VOO，{int((1 - min(leverage, 1)) * 100)}% 留存現金"
+        )
+        print(f"理由詳述：{advice['reason']}")
+        print("-" * 50)
+
+    except Exception as e:
+        logging.error(f" Step 10 執行失敗: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    nowcast(datetime.now().strftime("%Y-%m-%d"))
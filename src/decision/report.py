@@ -1,37 +1,34 @@
 import logging
-import os
-import time
 
-import pandas as pd
-from tqdm import tqdm
 from config.path import PathConfig
+from decision.rules import SIGNAL_RULES
+from utils import storage
+from utils.progress import pause, progress
 
 
-def generate_market_report(path: str = None):
-    if not os.path.exists(path):
+def generate_market_report(path: str = None, params=None):
+    if not storage.exists(path):
         logging.error(" 錯誤：找不到數據文件")
-        return
-    with tqdm(total=3, desc="生成市場診斷報告") as pbar:
-        df = pd.read_csv(path)
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.sort_values("date")
-        time.sleep(0.5)
+        return False
+    with progress(total=3, desc="生成市場診斷報告") as pbar:
+        # 只讀最後一筆資料 (最新真實數據)；final_signal 依日期排序寫出
+        rows = storage.read_tail(path)
+        pause(0.5)
         pbar.update(1)
         pbar.set_postfix_str("數據加載完成")
-        if df.empty:
+        if not rows:
             return
 
-        # 取出最後一筆資料 (最新真實數據)
-        latest = df.iloc[-1]
+        latest = rows[-1]
 
-        c_date = latest["date"].strftime("%Y-%m-%d")
-        c_macro = latest["macro_factor"]
-        c_ret = latest["final_return"] * 100
-        time.sleep(0.5)
+        c_date = latest["date"][:10]
+        c_macro = float(latest["macro_factor"])
+        c_ret = float(latest["final_return"]) * 100
+        pause(0.5)
         pbar.update(1)
         pbar.set_postfix_str("指標提取完成")
         c_sig = latest["signal"]
-        time.sleep(0.5)
+        pause(0.5)
         pbar.update(1)
         pbar.set_postfix_str("報告生成完成")
 
@@ -43,15 +40,25 @@ def generate_market_report(path: str = None):
     print(f"2 預期年化報酬 : {c_ret:.2f}%")
     print(f"3️ 系統決策訊號 : 【{c_sig}】")
 
+    # 成分股廣度 (breadth/constituents.py，選用步驟)
+    breadth_rows = (
+        storage.read_tail(PathConfig.CONSTITUENT_BREADTH_CSV)
+        if storage.exists(PathConfig.CONSTITUENT_BREADTH_CSV)
+        else []
+    )
+    if breadth_rows:
+        b = breadth_rows[-1]
+        print(
+            f"4 成分股廣度 ({b['date'][:10]}) : 漲 {b['advances']} / 跌 {b['declines']}，"
+            f"站上 50 日線 {float(b['pct_above_50dma']):.0%} / 200 日線 {float(b['pct_above_200dma']):.0%}，"
+            f"新高 {b['new_highs']} / 新低 {b['new_lows']}"
+        )
+
     print("-" * 60)
     print(" 【最終執行指令】:")
 
-    if c_sig == "BULL":
-        print("    建議: 2.0x 槓桿 (SSO/期貨)")
-    elif c_sig == "NEUTRAL":
-        print("    建議: 1.0x 現貨 (SPY/VOO)")
-    else:
-        print("    建議: 0.0x 空手 (現金/SHV)")
+    leverage = SIGNAL_RULES.leverage_of(c_sig, params)
+    print(f"    建議: {leverage:.1f}x {SIGNAL_RULES.action(c_sig).label}")
 
     print("=" * 60 + "\n")
 
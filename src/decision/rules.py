@@ -0,0 +1,247 @@
+import operator
+from dataclasses import dataclass
+from functools import reduce
+
+import numpy as np
+
+from utils.schema import CATEGORIES, MISSING, SIGNAL, Category
+
+_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass(frozen=True)
+class Param:
+    """
+    可調參數 (門檻 / 槓桿)：求值時可由 params 覆寫，否則使用 default。
+    params 的值可為陣列 (例如 shape (N, 1))，與欄位廣播後一次評估 N 組參數。
+    """
+
+    name: str
+    default: float
+
+
+def _resolve(value, params):
+    if isinstance(value, Param):
+        return (params or {}).get(value.name, value.default)
+    return value
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    單條規則：when 內的 (欄位, 運算子, 門檻) 全部成立時輸出 signal。
+    """
+
+    signal: str
+    when: tuple[tuple[str, str, object], ...]
+
+
+@dataclass(frozen=True)
+class Action:
+    """
+    訊號對應的槓桿倍數與操作說明。
+    """
+
+    leverage: float | Param
+    label: str
+    reason: str = ""
+
+
+@dataclass(frozen=True)
+class RuleTable:
+    """
+    有序規則表：由上而下第一條成立的規則決定訊號，全部不成立則為 default。
+    整張表編譯成一次 np.select，可直接對整欄 (或整個矩陣) 求值。
+    分類欄位 (utils/schema.py 的 CATEGORIES) 一律轉成 int8 代碼後比較；
+    輸出訊號的代碼由 category 定義 (未指定時依 actions 的順序)。
+    """
+
+    rules: tuple[Rule, ...]
+    default: str
+    actions: dict[str, Action]
+    category: Category | None = None
+
+    @property
+    def outputs(self):
+        return self.category or Category("signal", tuple(self.actions))
+
+    @property
+    def columns(self):
+        return sorted({col for rule in self.rules for col, _, _ in rule.when})
+
+    @property
+    def params(self):
+        """
+        所有可調參數及其預設值。
+        """
+        values = [value for rule in self.rules for _, _, value in rule.when]
+        values += [action.leverage for action in self.actions.values()]
+        return {v.name: v.default for v in values if isinstance(v, Param)}
+
+    def _conditions(self, frame, params):
+        cols = {}
+        for col in self.columns:
+            category = CATEGORIES.get(col)
+            cols[col] = np.asarray(frame[col]) if category is None else category.encode(frame[col])
+
+        def operand(col, value):
+            category = CATEGORIES.get(col)
+            return _resolve(value, params) if category is None else category.code(value)
+
+        return [
+            reduce(
+                np.logical_and,
+                [_OPS[op](cols[col], operand(col, value)) for col, op, value in rule.when],
+            )
+            for rule in self.rules
+        ]
+
+    def evaluate_codes(self, frame, params=None):
+        """
+        對 DataFrame / dict of arrays 向量化求值，回傳訊號代碼 (int8，見 outputs)。
+        """
+        outputs = self.outputs
+        return np.select(
+            self._conditions(frame, params),
+            [outputs.code(rule.signal) for rule in self.rules],
+            default=outputs.code(self.default),
+        ).astype(np.int8)
+
+    def evaluate(self, frame, params=None):
+        """
+        同 evaluate_codes，回傳訊號標籤陣列。
+        """
+        return self.outputs.decode(self.evaluate_codes(frame, params))
+
+    def evaluate_leverage(self, frame, params=None):
+        """
+        直接求出槓桿倍數 (不產生字串陣列)，供大量參數組合批次評估。
+        """
+        return np.select(
+            self._conditions(frame, params),
+            [
+                _resolve(self.action(rule.signal).leverage, params)
+                for rule in self.rules
+            ],
+            default=_resolve(self.action(self.default).leverage, params),
+        )
+
+    def decide(self, **snapshot):
+        """
+        單筆快照求值 (例如 Step 10 Nowcasting)。
+        """
+        return str(self.evaluate({k: np.atleast_1d(v) for k, v in snapshot.items()})[0])
+
+    def action(self, signal):
+        """
+        訊號 -> Action；未知訊號視同 default。
+        """
+        return self.actions.get(signal, self.actions[self.default])
+
+    def leverage_of(self, signal, params=None):
+        """
+        單一訊號的槓桿倍數 (未知訊號視同 default)。
+        """
+        return float(_resolve(self.action(signal).leverage, params))
+
+    def leverage(self, signals, params=None):
+        """
+        訊號 (標籤、Categorical 或代碼) -> 槓桿倍數；缺值 (或不在 outputs 標籤內的值) 回傳 NaN。
+        """
+        outputs = self.outputs
+        codes = outputs.encode(signals)
+        lev = np.select(
+            [codes == outputs.code(sig) for sig in self.actions],
+            [_resolve(action.leverage, params) for action in self.actions.values()],
+            default=_resolve(self.action(self.default).leverage, params),
+        )
+        return np.where(codes == MISSING, np.nan, lev)
+
+
+# =========================================================
+#  歷史決策訊號 (signal_calc / report / backtest)
+# =========================================================
+
+SIGNAL_RULES = RuleTable(
+    rules=(
+        #  宏觀風控
+        Rule("BEAR", (("macro_factor", "<", Param("macro_floor", 0.8)),)),
+        #  技術面趨勢風控
+        Rule("BEAR", (("trend_signal", "==", False),)),
+        # 市場廣度風控
+        Rule("NEUTRAL", (("breadth_signal", "==", "FRAGILE"),)),
+        Rule("BEAR", (("breadth_signal", "==", "WEAK"),)),
+        #  估值決策
+        Rule(
+            "BULL",
+            (
+                ("final_return", ">", Param("bull_return", 0.05)),
+                ("macro_factor", ">=", 1.0),
+            ),
+        ),
+        Rule("NEUTRAL", (("final_return", ">", 0),)),
+    ),
+    default="BEAR",
+    actions={
+        "BULL": Action(Param("bull_leverage", 2.0), "槓桿 (SSO/期貨)"),
+        "NEUTRAL": Action(1.0, "現貨 (SPY/VOO)"),
+        "BEAR": Action(0.0, "空手 (現金/SHV)"),
+    },
+    category=SIGNAL,
+)
+
+
+# =========================================================
+#  即時操作建議 (decision/nowcast.py)
+# =========================================================
+
+NOWCAST_RULES = RuleTable(
+    rules=(
+        Rule("RISK_OFF", (("final_return", "<=", 0),)),
+        Rule("DEFENSIVE", (("breadth_signal", "==", "FRAGILE"),)),
+        Rule(
+            "AGGRESSIVE",
+            (
+                ("final_return", ">", 0.08),
+                ("macro_factor", ">=", 1.0),
+                ("breadth_signal", "==", "HEALTHY"),
+            ),
+        ),
+        Rule("HOLD", (("final_return", ">", 0.04), ("macro_factor", ">=", 0.9))),
+    ),
+    default="WEAK_HOLD",
+    actions={
+        "RISK_OFF": Action(
+            0.0,
+            " 避險/空手 (Risk Off)",
+            "模型預測為負報酬，大盤下行風險極高，建議撤離市場。",
+        ),
+        "DEFENSIVE": Action(
+            0.5,
+            " 減倉/避險 (Defensive)",
+            "偵測到『指標背離』：權值股獨強但廣度轉差，結構脆弱，建議部位減半。",
+        ),
+        "AGGRESSIVE": Action(
+            2.0,
+            " 強力買進 (Aggressive Buy)",
+            "估值極度便宜且宏觀順風，建議開啟 2x 槓桿（如 SSO/UPRO。",
+        ),
+        "HOLD": Action(
+            1.0,
+            " 正常持有 (Neutral/Buy)",
+            "環境穩健但回報空間一般，建議現貨持倉（SPY/VOO），不開槓桿。",
+        ),
+        "WEAK_HOLD": Action(
+            0.8,
+            "謹慎持有 (Weak Buy)",
+            "雖有回報預期，但宏觀數據出現微弱逆風，建議稍微調低倉位。",
+        ),
+    },
+)
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import time
+
+from config.path import PathConfig
+from decision.nowcast import calc_nowcast
+from decision.rules import SIGNAL_RULES
+from utils import storage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+RELOAD_INTERVAL = 1.0  # 檢查資料檔案是否變動的間隔 (秒)
+
+# 快照來源：任一檔案變動 (大小 / 修改時間) 即重新載入
+WATCHED_PATHS = (PathConfig.MACRO_FACTOR_CSV, PathConfig.FINAL_SIGNAL_CSV)
+
+
+# =========================================================
+#  快照
+# =========================================================
+
+
+def file_stamp(paths=WATCHED_PATHS):
+    """
+    各檔案的 (路徑, 大小, 修改時間)；檔案不存在為 None。
+    """
+    stamp = []
+    for path in paths:
+        target = storage._locate(path, warn=False)
+        if target is None:
+            stamp.append(None)
+            continue
+        stat = target.stat()
+        stamp.append((str(target), stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+def build_snapshot():
+    """
+    最新訊號 (final_signal 最後一列) + 即時建議 (nowcast) -> dict。
+    """
+    rows = storage.read_tail(PathConfig.FINAL_SIGNAL_CSV)
+    if not rows:
+        raise ValueError(f"數據檔案沒有資料: {PathConfig.FINAL_SIGNAL_CSV}")
+    row = rows[-1]
+    return {
+        "date": row["date"][:10],
+        "signal": row["signal"],
+        "leverage": SIGNAL_RULES.leverage_of(row["signal"]),
+        "action": SIGNAL_RULES.action(row["signal"]).label,
+        "macro_factor": float(row["macro_factor"]),
+        "breadth_signal": row["breadth_signal"],
+        "final_return": float(row["final_return"]),
+        "nowcast": calc_nowcast(),
+    }
+
+
+def _response(status, payload):
+    """
+    預先組好完整的 HTTP 回應位元組，查詢時直接寫出。
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Cache-Control: no-cache\r\n\r\n"
+    )
+    return head.encode("ascii") + body
+
+
+NOT_FOUND = _response("404 Not Found", {"error": "not found", "paths": ["/signal", "/health"]})
+NOT_ALLOWED = _response("405 Method Not Allowed", {"error": "only GET is supported"})
+
+
+class SignalState:
+    """
+    常駐記憶體的最新快照。重新載入時在背景執行緒讀檔，完成後一次替換整組回應，
+    查詢端永遠看到完整的新版或舊版。
+    """
+
+    def __init__(self, paths=WATCHED_PATHS):
+        self.paths = paths
+        self.stamp = None
+        self.version = 0
+        self.routes = self._routes(
+            _response("503 Service Unavailable", {"error": "signal data not loaded"}), None
+        )
+
+    def _routes(self, signal, loaded_at):
+        health = _response(
+            "200 OK",
+            {"status": "ok", "version": self.version, "loaded_at": loaded_at},
+        )
+        return {"/": signal, "/signal": signal, "/health": health}
+
+    def _load(self):
+        stamp = file_stamp(self.paths)
+        if stamp == self.stamp or None in stamp:
+            return None
+        try:
+            snapshot = build_snapshot()
+        except Exception as e:
+            # 同一版檔案只警告一次，沿用舊快照直到檔案再次變動
+            logging.warning(f"   [Service] 重新載入失敗，沿用舊快照: {e}")
+            self.stamp = stamp
+            return None
+        # 讀取期間檔案又被改寫 (寫到一半)：下次再載入
+        if file_stamp(self.paths) != stamp:
+            return None
+        return stamp, snapshot
+
+    async def reload(self):
+        """
+        檔案有變動時重新載入，回傳是否替換了快照。
+        """
+        loaded = await asyncio.to_thread(self._load)
+        if loaded is None:
+            return False
+        stamp, snapshot = loaded
+        self.version += 1
+        loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        signal = _response("200 OK", {**snapshot, "version": self.version})
+        self.routes = self._routes(signal, loaded_at)
+        self.stamp = stamp
+        logging.info(
+            f"   [Service] 已載入第 {self.version} 版快照 ({snapshot['date']} {snapshot['signal']})"
+        )
+        return True
+
+    def respond(self, method, target):
+        if method != "GET":
+            return NOT_ALLOWED
+        return self.routes.get(target.split("?", 1)[0], NOT_FOUND)
+
+    async def handle(self, reader, writer):
+        """
+        HTTP/1.1 keep-alive：同一連線可連續查詢，只解析請求行與 Connection 標頭。
+        """
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                line, _, headers = request.partition(b"\r\n")
+                method, target, version = line.decode("latin-1").split(" ", 2)
+                writer.write(self.respond(method, target))
+                await writer.drain()
+                headers = headers.lower()
+                if b"connection: close" in headers or (
+                    version == "HTTP/1.0" and b"connection: keep-alive" not in headers
+                ):
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self, interval=RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logging.warning(f"   [Service] 檢查資料更新失敗: {e}")
+
+
+# =========================================================
+#  服務入口
+# =========================================================
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, interval=RELOAD_INTERVAL):
+    """
+    啟動服務直到被取消：GET /signal 回傳最新快照，GET /health 回傳版本與載入時間。
+    """
+    state = SignalState()
+    try:
+        await state.reload()
+    except Exception as e:
+        logging.warning(f"   [Service] 初次載入失敗，稍後重試: {e}")
+
+    server = await asyncio.start_server(state.handle, host, port)
+    watcher = asyncio.create_task(state.watch(interval))
+    print(f" 訊號服務啟動: http://{host}:{port}/signal (每 {interval} 秒檢查資料更新)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT, interval=RELOAD_INTERVAL):
+    try:
+        asyncio.run(serve(host, port, interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_service()
@@ -1,9 +1,51 @@
 import logging
-import os
-import time
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from config.frequency import get_frequency
 from config.path import PathConfig
+from utils import storage
+from utils.future_mock import read_with_overlay
+from utils.incremental import update_frame
+from utils.progress import pause, progress
+from utils.schema import BREADTH, SIGNAL
+from decision.rules import SIGNAL_RULES
+
+
+def merge_signal_inputs(macro, market, breadth=None, calendar="macro"):
+    """
+    asof 合併宏觀、市場與廣度數據 (date 欄位需已轉為 datetime)。
+    calendar="macro" 以宏觀日期為主軸；"market" 以市場 (交易日) 為主軸，
+    宏觀係數沿用最近一次發布值，第一筆宏觀數據之前的日期捨去。
+    """
+    macro = macro.sort_values("date")
+    market = market.sort_values("date")
+    if calendar == "market":
+        df = pd.merge_asof(market, macro, on="date", direction="backward")
+        df = df.dropna(subset=["macro_factor"]).reset_index(drop=True)
+        df = df[list(macro.columns) + [c for c in market.columns if c != "date"]]
+    else:
+        df = pd.merge_asof(macro, market, on="date", direction="backward")
+
+    if breadth is not None:
+        breadth = breadth.sort_values("date")
+        df = pd.merge_asof(
+            df, breadth[["date", "breadth_signal"]], on="date", direction="backward"
+        )
+        df["breadth_signal"] = BREADTH.categorical(df["breadth_signal"]).fillna("HEALTHY")
+    else:
+        df["breadth_signal"] = BREADTH.categorical(np.full(len(df), BREADTH.code("HEALTHY"), np.int8))
+
+    return df
+
+
+def calc_signal_frame(df, params=None):
+    """
+    合併後的輸入 -> 加上修正後回報與最終訊號 (逐列獨立)。
+    """
+    df = df.copy()
+    df["final_return"] = df["expected_return"] * df["macro_factor"]
+    df["signal"] = SIGNAL.categorical(SIGNAL_RULES.evaluate_codes(df, params))
+    return df
 
 
 def calc_final_signal_pipeline(
@@ -11,12 +53,22 @@ def calc_final_signal_pipeline(
     market_path: str = PathConfig.MARKET_RETURN_CSV,
     breadth_path: str = PathConfig.BREADTH_CSV,
     output_path: str = PathConfig.FINAL_SIGNAL_CSV,
+    params: dict | None = None,
+    frequency=None,
+    incremental=None,
+    macro_overlay_path=PathConfig.MACRO_FACTOR_PROJECTION_CSV,
+    market_overlay_path=PathConfig.MARKET_RETURN_PROJECTION_CSV,
 ):
+    """
+    宏觀 / 市場數據接上 future_mock 的推算疊加層 (overlay 為 None 時只用原始數據)。
+    incremental 時只對新增 (或輸入有變動之後) 的日期求值並附加到既有檔案。
+    """
     global breadth
+    freq = get_frequency(frequency)
     logging.info("   [Decision] Merging Macro, Market, and Breadth data...")
 
     # 使用 tqdm 建立 5 個階段的動態管理
-    with tqdm(
+    with progress(
         total=5,
         desc="決策管線執行中",
         bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}, {postfix}]",
@@ -24,12 +76,18 @@ def calc_final_signal_pipeline(
         # 數據讀取與檢查
         pbar.set_postfix_str("讀取原始數據檔案...")
         try:
-            macro = pd.read_csv(macro_path)
-            market = pd.read_csv(market_path)
+            # 只載入決策需要的欄位
+            macro = read_with_overlay(
+                macro_path, macro_overlay_path, ["date", "macro_factor"]
+            )
+            market = read_with_overlay(
+                market_path,
+                market_overlay_path,
+                ["date", "Close", "expected_return", "trend_signal"],
+            )
 
-            if os.path.exists(breadth_path):
-                breadth = pd.read_csv(breadth_path)
-                breadth["date"] = pd.to_datetime(breadth["date"])
+            if storage.exists(breadth_path):
+                breadth = storage.read_frame(breadth_path, ["date", "breadth_signal"])
                 has_breadth = True
             else:
                 logging.warning(
@@ -39,34 +97,25 @@ def calc_final_signal_pipeline(
 
         except FileNotFoundError:
             logging.error("Error: Missing files. Run Macro and Market steps first.")
-            return
+            return False
 
-        time.sleep(0.3)
+        pause(0.3)
         pbar.update(1)
 
         # 日期格式統一
         pbar.set_postfix_str("統一日期格式中...")
         macro["date"] = pd.to_datetime(macro["date"])
         market["date"] = pd.to_datetime(market["date"])
-        time.sleep(0.3)
+        pause(0.3)
         pbar.update(1)
 
         # 數據合併
         pbar.set_postfix_str("進行資料表合併 (asof merge)...")
-        macro = macro.sort_values("date")
-        market = market.sort_values("date")
-        df = pd.merge_asof(macro, market, on="date", direction="backward")
-
-        if has_breadth:
-            breadth = breadth.sort_values("date")
-            df = pd.merge_asof(
-                df, breadth[["date", "breadth_signal"]], on="date", direction="backward"
-            )
-            df["breadth_signal"] = df["breadth_signal"].fillna("HEALTHY")
-        else:
-            df["breadth_signal"] = "HEALTHY"
+        df = merge_signal_inputs(
+            macro, market, breadth if has_breadth else None, calendar=freq.calendar
+        )
 
-        time.sleep(0.3)
+        pause(0.3)
         pbar.update(1)
 
         # 多重風控訊號計算
@@ -74,40 +123,19 @@ def calc_final_signal_pipeline(
         df["expected_return"] = df["expected_return"].fillna(0.07)
         if "trend_signal" not in df.columns:
             df["trend_signal"] = True
-
-        df["final_return"] = df["expected_return"] * df["macro_factor"]
-
-        def get_signal(row):
-            #  宏觀風控
-            if row["macro_factor"] < 0.8:  # 嚴格一點
-                return "BEAR"
-
-            #  技術面趨勢風控
-            if not row["trend_signal"]:
-                return "BEAR"
-
-            # 市場廣度風控
-            if row["breadth_signal"] == "FRAGILE":
-                return "NEUTRAL"
-
-            if row["breadth_signal"] == "WEAK":
-                return "BEAR"
-
-            #  估值決策
-            if row["final_return"] > 0.05 and row["macro_factor"] >= 1.0:
-                return "BULL"
-            elif row["final_return"] > 0:
-                return "NEUTRAL"
-            else:
-                return "BEAR"
-
-        df["signal"] = [get_signal(row) for _, row in df.iterrows()]
         pbar.update(1)
 
         # 檔案輸出
-        pbar.set_postfix_str("儲存最終信號 CSV...")
-        df.to_csv(output_path, index=False)
-        time.sleep(0.3)
+        pbar.set_postfix_str("儲存最終信號...")
+        update_frame(
+            output_path,
+            df,
+            lambda frame, offset: calc_signal_frame(frame, params),
+            inputs=list(df.columns),
+            params={"calendar": freq.calendar, "rules": params},
+            enabled=incremental,
+        )
+        pause(0.3)
         pbar.update(1)
 
     logging.info(f"   [Decision] Final signal saved to {output_path}")
@@ -0,0 +1,124 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.frequency import get_frequency
+from config.path import PathConfig
+from decision.rules import SIGNAL_RULES
+from market.market_return_calc import BASE_RETURN, SENSITIVITY
+from market.multi_asset import calc_market_matrices, load_price_matrix, load_universe
+from utils import storage
+from utils.future_mock import read_with_overlay
+from utils.schema import BREADTH, MISSING, SIGNAL, TREND
+
+
+def build_signal_panel(macro, market, breadth=None, params=None, calendar="macro"):
+    """
+    多標的訊號面板：主軸同 signal_calc (calendar="macro" 為宏觀日期，"market" 為價格矩陣的日期)，
+    把 date x ticker 的市場矩陣 asof 對齊後，宏觀係數與廣度訊號 (全市場共用) 只算一次並廣播到
+    所有標的，整個矩陣一次交給 SIGNAL_RULES 求值。
+    回傳長表 (date, ticker, ...)，只保留標的已有價格的期間。
+    """
+    macro = macro.sort_values("date")
+    market = {k: v.sort_index() for k, v in market.items()}
+
+    # reindex(ffill) 等同 merge_asof(direction="backward")
+    if calendar == "market":
+        dates = market["Close"].index
+        dates = dates[dates >= macro["date"].iloc[0]]
+        macro_factor = macro.set_index("date")["macro_factor"]
+        macro_factor = macro_factor.reindex(dates, method="ffill").to_numpy(float)
+    else:
+        dates = pd.DatetimeIndex(macro["date"])
+        macro_factor = macro["macro_factor"].to_numpy(float)
+
+    aligned = {k: v.reindex(dates, method="ffill") for k, v in market.items()}
+    tickers = aligned["Close"].columns.to_numpy()
+
+    if breadth is not None:
+        breadth = breadth.sort_values("date").set_index("date")["breadth_signal"]
+        breadth_signal = BREADTH.encode(breadth.reindex(dates, method="ffill"))
+        breadth_signal = np.where(
+            breadth_signal == MISSING, np.int8(BREADTH.code("HEALTHY")), breadth_signal
+        )
+    else:
+        breadth_signal = np.full(len(dates), BREADTH.code("HEALTHY"), dtype=np.int8)
+
+    expected = aligned["expected_return"].to_numpy(float)
+    final_return = expected * macro_factor[:, None]
+    trend_signal = TREND.encode(aligned["trend_signal"].to_numpy(object))
+
+    signal = SIGNAL_RULES.evaluate_codes(
+        {
+            "macro_factor": macro_factor[:, None],
+            "trend_signal": trend_signal,
+            "breadth_signal": breadth_signal[:, None],
+            "final_return": final_return,
+        },
+        params,
+    )
+
+    t, a = np.nonzero(aligned["Close"].notna().to_numpy())
+    return pd.DataFrame(
+        {
+            "date": dates[t],
+            "ticker": tickers[a],
+            "Close": aligned["Close"].to_numpy(float)[t, a],
+            "expected_return": expected[t, a],
+            "trend_signal": TREND.categorical(trend_signal[t, a]),
+            "macro_factor": macro_factor[t],
+            "breadth_signal": BREADTH.categorical(breadth_signal[t]),
+            "final_return": final_return[t, a],
+            "signal": SIGNAL.categorical(signal[t, a]),
+        }
+    )
+
+
+def calc_signal_panel_pipeline(
+    tickers=None,
+    macro_path=PathConfig.MACRO_FACTOR_CSV,
+    breadth_path=PathConfig.BREADTH_CSV,
+    output_path=PathConfig.SIGNAL_PANEL_CSV,
+    params=None,
+    base_return=BASE_RETURN,
+    sensitivity=SENSITIVITY,
+    frequency=None,
+    macro_overlay_path=PathConfig.MACRO_FACTOR_PROJECTION_CSV,
+):
+    """
+    一次執行整個標的池：宏觀 (含推算疊加層) / 廣度檔各讀一次，價格共用日線快取併發讀取。
+    """
+    freq = get_frequency(frequency)
+    tickers = tickers if tickers is not None else load_universe()
+    logging.info(f"   [Panel] 計算 {len(tickers)} 檔標的的訊號面板...")
+
+    try:
+        macro = read_with_overlay(macro_path, macro_overlay_path, ["date", "macro_factor"])
+    except FileNotFoundError:
+        logging.error("Error: Missing macro factor file. Run Macro step first.")
+        return
+
+    breadth = None
+    if storage.exists(breadth_path):
+        breadth = storage.read_frame(breadth_path, ["date", "breadth_signal"])
+
+    prices = load_price_matrix(tickers, interval=freq.interval)
+    market = calc_market_matrices(
+        prices,
+        base_return,
+        sensitivity,
+        window=freq.periods(24),
+        trend_window=freq.periods(10),
+    )
+    panel = build_signal_panel(macro, market, breadth, params, calendar=freq.calendar)
+
+    storage.write_frame(panel, output_path)
+    logging.info(
+        f"   [Panel] {prices.shape[1]} 檔標的、{len(panel)} 筆訊號已儲存至 {output_path}"
+    )
+    return panel
+
+
+if __name__ == "__main__":
+    calc_signal_panel_pipeline()
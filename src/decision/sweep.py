@@ -0,0 +1,221 @@
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config.frequency import get_frequency
+from config.path import PathConfig
+from decision.backtest import (
+    calc_equity,
+    calc_max_drawdown,
+    calc_pct_change,
+    calc_sharpe,
+    calc_strategy_return,
+)
+from decision.rules import SIGNAL_RULES
+from decision.signal_calc import merge_signal_inputs
+from market.market_return_calc import BASE_RETURN, SENSITIVITY, calc_bias
+from utils import storage
+from utils.future_mock import read_with_overlay
+from utils.progress import progress
+from utils.schema import BREADTH, TREND
+
+# 掃描參數與預設值 (對應 rules.py 的 Param、backtest 成本與 market 預期回報公式)
+DEFAULT_PARAMS = {
+    **SIGNAL_RULES.params,
+    "risk_free_rate_annual": 0.03,
+    "borrowing_cost_annual": 0.05,
+    "base_return": BASE_RETURN,
+    "sensitivity": SENSITIVITY,
+}
+
+DEFAULT_GRID = {
+    "macro_floor": [0.7, 0.75, 0.8, 0.85, 0.9],
+    "bull_return": [0.03, 0.04, 0.05, 0.06, 0.07],
+    "bull_leverage": [1.5, 2.0, 2.5, 3.0],
+    "risk_free_rate_annual": [0.02, 0.03, 0.04],
+    "borrowing_cost_annual": [0.04, 0.05, 0.06, 0.07],
+    "base_return": [0.06, 0.07, 0.08, 0.09],
+    "sensitivity": [0.1, 0.2, 0.3],
+}
+
+# 無市場數據時 signal_calc 使用的預期回報
+FALLBACK_EXPECTED_RETURN = 0.07
+
+
+def prepare_inputs(
+    macro_path=PathConfig.MACRO_FACTOR_CSV,
+    market_path=PathConfig.MARKET_RETURN_CSV,
+    breadth_path=PathConfig.BREADTH_CSV,
+    frequency=None,
+    macro_overlay_path=PathConfig.MACRO_FACTOR_PROJECTION_CSV,
+    market_overlay_path=PathConfig.MARKET_RETURN_PROJECTION_CSV,
+):
+    """
+    讀檔並合併一次，輸出與參數無關的欄位陣列 (長度 T)，供所有參數組合共用。
+    frequency 需與產生 market_return 的頻率一致 (乖離率視窗、訊號主軸、年化期數)；
+    與 signal_calc 相同接上 future_mock 的推算疊加層。
+    """
+    freq = get_frequency(frequency)
+    macro = read_with_overlay(macro_path, macro_overlay_path, ["date", "macro_factor"])
+    market = read_with_overlay(
+        market_path, market_overlay_path, ["date", "Close", "trend_signal"]
+    )
+    market = market.sort_values("date")
+    market["bias"] = calc_bias(market["Close"], freq.periods(24))
+    market["has_market"] = True
+
+    breadth = None
+    if storage.exists(breadth_path):
+        breadth = storage.read_frame(breadth_path, ["date", "breadth_signal"])
+
+    df = merge_signal_inputs(
+        macro,
+        market[["date", "Close", "bias", "trend_signal", "has_market"]],
+        breadth,
+        calendar=freq.calendar,
+    )
+
+    return {
+        "date": df["date"].to_numpy(),
+        "macro_factor": df["macro_factor"].to_numpy(float),
+        "bias": df["bias"].to_numpy(float),
+        "has_market": df["has_market"].notna().to_numpy(),
+        "trend_signal": TREND.encode(df["trend_signal"]),
+        "breadth_signal": BREADTH.encode(df["breadth_signal"]),
+        "market_ret": calc_pct_change(df["Close"]),
+        "periods_per_year": freq.on_axis(df["date"]).periods_per_year,
+    }
+
+
+def build_grid(grid=None):
+    """
+    參數網格 -> dict of 1-D arrays (笛卡兒積，長度 N)；未指定的參數用預設值。
+    """
+    grid = DEFAULT_GRID if grid is None else grid
+    grid = {**{k: [v] for k, v in DEFAULT_PARAMS.items()}, **grid}
+    combos = np.array(list(itertools.product(*grid.values())), dtype=float)
+    return {name: combos[:, i] for i, name in enumerate(grid)}
+
+
+def calc_strategy_returns(inputs, configs, periods_per_year=None):
+    """
+    以 (N, T) 二維陣列一次算出 N 組參數的逐期策略報酬。
+    periods_per_year 未指定時使用 inputs 記錄的訊號主軸年化期數。
+    """
+    if periods_per_year is None:
+        periods_per_year = inputs.get("periods_per_year", 12)
+    params = {k: np.asarray(v, dtype=float)[:, None] for k, v in configs.items()}
+
+    bias = inputs["bias"]
+    expected = np.where(
+        np.isnan(bias),
+        params["base_return"],
+        params["base_return"] - (bias * params["sensitivity"]),
+    )
+    expected = np.where(inputs["has_market"], expected, FALLBACK_EXPECTED_RETURN)
+
+    frame = {
+        "macro_factor": inputs["macro_factor"],
+        "trend_signal": inputs["trend_signal"],
+        "breadth_signal": inputs["breadth_signal"],
+        "final_return": expected * inputs["macro_factor"],
+    }
+    leverage = SIGNAL_RULES.evaluate_leverage(frame, params)
+    leverage = np.broadcast_to(leverage, expected.shape)
+
+    # Shift 1: 用上一期的信號操作這一期
+    shifted = np.full(expected.shape, np.nan)
+    shifted[:, 1:] = leverage[:, :-1]
+
+    return calc_strategy_return(
+        shifted,
+        inputs["market_ret"],
+        params["risk_free_rate_annual"] / periods_per_year,
+        params["borrowing_cost_annual"] / periods_per_year,
+    )
+
+
+def evaluate_batch(inputs, configs, periods_per_year=None):
+    """
+    以 (N, T) 二維陣列一次評估 N 組參數，回傳每組的總報酬 / MDD / 夏普。
+    periods_per_year 未指定時使用 inputs 記錄的訊號主軸年化期數。
+    """
+    if periods_per_year is None:
+        periods_per_year = inputs.get("periods_per_year", 12)
+    strat_ret = calc_strategy_returns(inputs, configs, periods_per_year)
+    equity = calc_equity(strat_ret)
+
+    result = pd.DataFrame({k: np.asarray(v, dtype=float) for k, v in configs.items()})
+    result["total_return"] = equity[:, -1] / 100 - 1
+    result["max_drawdown"] = calc_max_drawdown(equity)
+    result["sharpe"] = calc_sharpe(strat_ret, periods_per_year)
+    return result
+
+
+# 子行程共用的輸入陣列 (initializer 只傳一次，避免每批重複序列化)
+_WORKER_INPUTS = None
+
+
+def _init_worker(inputs):
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+
+
+def _run_chunk(configs):
+    return evaluate_batch(_WORKER_INPUTS, configs)
+
+
+def run_sweep(
+    grid=None,
+    output_path=PathConfig.SWEEP_RESULTS_CSV,
+    chunk_size=256,
+    max_workers=None,
+    sort_by="sharpe",
+    inputs=None,
+):
+    """
+    平行參數掃描：參數組合切成批次交給行程池，每批完成即寫入 output_path，
+    全部完成後依 sort_by 排名重寫為最終結果表。
+    """
+    inputs = inputs if inputs is not None else prepare_inputs()
+    configs = build_grid(grid)
+    total = len(next(iter(configs.values())))
+    chunks = [
+        {k: v[i : i + chunk_size] for k, v in configs.items()}
+        for i in range(0, total, chunk_size)
+    ]
+    logging.info(f"   [Sweep] {total} 組參數，{len(chunks)} 批次")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(inputs,)
+    ) as pool:
+        futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+        with progress(total=total, desc="參數掃描中") as pbar:
+            for future in as_completed(futures):
+                batch = future.result()
+                batch.to_csv(
+                    output_path,
+                    mode="a" if results else "w",
+                    header=not results,
+                    index=False,
+                )
+                results.append(batch)
+                pbar.update(len(batch))
+
+    ranked = pd.concat(results, ignore_index=True)
+    ranked = ranked.sort_values(sort_by, ascending=False, ignore_index=True)
+    ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+    ranked.to_csv(output_path, index=False)
+    logging.info(f"   [Sweep] 排名結果已儲存至 {output_path}")
+    return ranked
+
+
+if __name__ == "__main__":
+    top = run_sweep()
+    print(top.head(20).to_string(index=False))
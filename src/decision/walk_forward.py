@@ -0,0 +1,193 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config.frequency import get_frequency
+from config.path import PathConfig
+from decision.backtest import calc_equity
+from decision.bootstrap import evaluate_paths
+from decision.rules import SIGNAL_RULES
+from decision.sweep import (
+    DEFAULT_GRID,
+    DEFAULT_PARAMS,
+    build_grid,
+    calc_strategy_returns,
+    prepare_inputs,
+)
+from utils import storage
+from utils.progress import progress
+
+# 預設只重新估計訊號門檻與槓桿 (rules.py 的 Param)，成本與預期回報公式維持預設值
+WALK_FORWARD_GRID = {k: DEFAULT_GRID[k] for k in SIGNAL_RULES.params if k in DEFAULT_GRID}
+OBJECTIVES = ("sharpe", "total_return", "max_drawdown")
+MODES = ("expanding", "rolling")
+
+
+def build_windows(dates, train, test, mode="expanding"):
+    """
+    [(訓練起, 訓練迄, 測試起, 測試迄)] 列位置 (左閉右開)；train / test 為 pd.DateOffset，
+    依 dates 的日期切分 (主軸列距不固定，不能以期數換算)。測試期首尾相接涵蓋訓練期之後的全部歷史；
+    expanding 訓練期從頭累積，rolling 只取測試期起點之前 train 長度內的列。
+    """
+    if mode not in MODES:
+        raise ValueError(f"不支援的視窗模式: {mode} (可用: {list(MODES)})")
+    dates = pd.DatetimeIndex(dates)
+    n = len(dates)
+    windows = []
+    split = int(dates.searchsorted(dates[0] + train)) if n else 0
+    while split < n:
+        end = max(int(dates.searchsorted(dates[split] + test)), split + 1)
+        start = 0 if mode == "expanding" else int(dates.searchsorted(dates[split] - train))
+        windows.append((start, split, split, min(end, n)))
+        split = end
+    return windows
+
+
+def fit_chunk(inputs, windows, objective, configs, offset=0):
+    """
+    一批參數的逐期報酬只算一次，各視窗切片評估訓練期分數。
+    回傳每個視窗在本批內的最佳 (分數, 參數序號, 測試期報酬)。
+    """
+    returns = calc_strategy_returns(inputs, configs)
+    periods_per_year = inputs.get("periods_per_year", 12)
+
+    best = []
+    for train_start, train_end, test_start, test_end in windows:
+        score = evaluate_paths(returns[:, train_start:train_end], periods_per_year)[objective]
+        score = np.where(np.isnan(score), -np.inf, score)
+        i = int(np.argmax(score))
+        best.append((float(score[i]), offset + i, returns[i, test_start:test_end]))
+    return best
+
+
+# 子行程共用的輸入陣列與視窗 (initializer 只傳一次)
+_WORKER_ARGS = None
+
+
+def _init_worker(inputs, windows, objective):
+    global _WORKER_ARGS
+    _WORKER_ARGS = (inputs, windows, objective)
+
+
+def _run_chunk(configs, offset):
+    return fit_chunk(*_WORKER_ARGS, configs, offset)
+
+
+def _equity(returns):
+    # 首期補 NaN 作為基期 100，回傳每期期末淨值
+    return calc_equity(np.concatenate([[np.nan], returns]))[1:]
+
+
+def run_walk_forward(
+    grid=None,
+    train=pd.DateOffset(years=10),
+    test=pd.DateOffset(years=1),
+    mode="expanding",
+    objective="sharpe",
+    chunk_size=64,
+    max_workers=None,
+    inputs=None,
+    frequency=None,
+    output_path=PathConfig.WALK_FORWARD_CSV,
+    equity_path=PathConfig.WALK_FORWARD_EQUITY_CSV,
+):
+    """
+    Walk-forward 最佳化：每個訓練視窗 (train，預設 10 年，expanding / rolling) 依 objective 選出最佳參數，
+    套用到下一段測試期 (test，預設 1 年)，串接所有測試期成為樣本外淨值曲線。
+    prepare_inputs 只執行一次；參數切批交給行程池，每批的逐期報酬供所有視窗共用。
+    回傳 (各視窗結果, 樣本外逐期報酬與淨值)。
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"不支援的目標: {objective} (可用: {list(OBJECTIVES)})")
+    freq = get_frequency(frequency)
+    inputs = inputs if inputs is not None else prepare_inputs(frequency=freq)
+    periods_per_year = inputs.get("periods_per_year", 12)
+    dates = pd.DatetimeIndex(inputs["date"])
+
+    windows = build_windows(dates, train, test, mode)
+    if not windows:
+        raise ValueError(
+            f"歷史只有 {dates[0]:%Y-%m-%d} ~ {dates[-1]:%Y-%m-%d}，不足一個訓練視窗 ({train})"
+        )
+
+    configs = build_grid(WALK_FORWARD_GRID if grid is None else grid)
+    total = len(next(iter(configs.values())))
+    chunks = [
+        ({k: v[i : i + chunk_size] for k, v in configs.items()}, i)
+        for i in range(0, total, chunk_size)
+    ]
+    logging.info(
+        f"   [WalkForward] {len(windows)} 個視窗 ({mode}) x {total} 組參數，{len(chunks)} 批次"
+    )
+
+    # 各視窗目前的最佳 (分數, 參數序號, 測試期報酬)；同分取序號小者，結果與批次完成順序無關
+    best = [(-np.inf, total, None)] * len(windows)
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(inputs, windows, objective),
+    ) as pool:
+        futures = {
+            pool.submit(_run_chunk, chunk, offset): min(chunk_size, total - offset)
+            for chunk, offset in chunks
+        }
+        with progress(total=total, desc="Walk-forward 最佳化中") as pbar:
+            for future in as_completed(futures):
+                for w, candidate in enumerate(future.result()):
+                    if (candidate[0], -candidate[1]) > (best[w][0], -best[w][1]):
+                        best[w] = candidate
+                pbar.update(futures[future])
+
+    rows = []
+    for (train_start, train_end, test_start, test_end), (score, idx, ret) in zip(windows, best):
+        metrics = evaluate_paths(ret, periods_per_year)
+        rows.append(
+            {
+                "train_start": dates[train_start],
+                "train_end": dates[train_end - 1],
+                "test_start": dates[test_start],
+                "test_end": dates[test_end - 1],
+                **{k: configs[k][idx] for k in configs},
+                f"train_{objective}": score,
+                **{f"test_{k}": float(v) for k, v in metrics.items()},
+            }
+        )
+    result = pd.DataFrame(rows)
+
+    # 樣本外串接，並以同期的大盤與預設參數對照
+    start = windows[0][2]
+    oos = np.concatenate([ret for _, _, ret in best])
+    default = calc_strategy_returns(
+        inputs, {k: np.array([v]) for k, v in DEFAULT_PARAMS.items()}
+    )[0, start:]
+    bench = inputs["market_ret"][start:]
+    curve = pd.DataFrame(
+        {
+            "date": dates[start:],
+            "strategy_return": oos,
+            "default_return": default,
+            "benchmark_return": bench,
+            "strategy_equity": _equity(oos),
+            "default_equity": _equity(default),
+            "benchmark_equity": _equity(bench),
+        }
+    )
+
+    for name, path, frame in (("視窗結果", output_path, result), ("樣本外淨值", equity_path, curve)):
+        target = storage.write_frame(frame, path)
+        logging.info(f"   [WalkForward] {name}已儲存至 {target}")
+
+    summary = evaluate_paths(np.stack([oos, default, bench]), periods_per_year)
+    for i, label in enumerate(("Walk-forward", "預設參數", "大盤")):
+        logging.info(
+            f"   [WalkForward] 樣本外 {label}: 總報酬 {summary['total_return'][i]:.2%} | "
+            f"MDD {summary['max_drawdown'][i]:.2%} | 夏普 {summary['sharpe'][i]:.2f}"
+        )
+    return result, curve
+
+
+if __name__ == "__main__":
+    windows, _ = run_walk_forward()
+    print(windows.to_string(index=False))
@@ -1,10 +1,9 @@
 import logging
-import os
 
-import pandas as pd
+import numpy as np
 
 from config.path import PathConfig
-
+from utils import storage
 
 
 def calc_macro_factor_logic(excess_liquidity, yield_spread, pmi=50):
@@ -47,14 +46,47 @@ def calc_macro_factor_logic(excess_liquidity, yield_spread, pmi=50):
     return round(max(0.3, min(1.3, final_factor)), 2)
 
 
+def calc_macro_factor_array(excess_liquidity, yield_spread, pmi=50):
+    """
+    calc_macro_factor_logic 的向量化版本：輸入整欄，輸出與逐筆計算逐位元相同的係數陣列。
+    """
+    liq = np.asarray(excess_liquidity, dtype=float)
+    spread = np.asarray(yield_spread, dtype=float)
+    pmi = np.asarray(pmi, dtype=float)
+
+    #  殖利率曲線得分
+    spread_score = np.select(
+        [spread < 0, spread < 0.2],
+        [0.5 + (spread * 0.5), 0.6 + (spread / 0.2) * 0.4],
+        default=1.0,
+    )
+
+    # 流動性得分
+    liq_score = np.where(liq > 0, 0.9 + (liq * 5), 0.8 + (liq * 10))
+
+    #  經濟擴張獎勵 (PMI)
+    pmi_bonus = np.select(
+        [pmi > 52, pmi < 48], [(pmi - 52) * 0.02, (pmi - 48) * 0.05], default=0.0
+    )
+
+    # 與 min()/max() 相同的比較順序 (含 NaN 行為)
+    base_score = np.where(liq_score < spread_score, liq_score, spread_score)
+    final_factor = base_score + pmi_bonus
+    final_factor = np.where(final_factor < 1.3, final_factor, 1.3)
+    final_factor = np.where(final_factor > 0.3, final_factor, 0.3)
+
+    # 逐筆計算時欄位值為 np.float64，round() 即 np.round，故兩者逐位元一致
+    return np.round(final_factor, 2)
+
+
 # =========================================================
-#  兼容接口 (供 main.py Step 10 呼叫)
+#  兼容接口 (供 decision/nowcast.py Step 10 呼叫)
 # =========================================================
 
 
 def calculate_macro_factor(current_snapshot):
     """
-    對接 main.py Step 10 的字典格式
+    對接 decision/nowcast.py Step 10 的字典格式
     """
     # 取得利差
     y10 = current_snapshot.get("10Y_Yield", 4.0)
@@ -87,15 +119,20 @@ def calculate_macro_factor(current_snapshot):
 # =========================================================
 
 
-def calc_macro_factor_pipeline(input_path=None, output_path=None):
-    if not os.path.exists(input_path):
-        logging.warning(f" [Macro] 找不到 {input_path}")
-        return
+def calc_macro_factor_frame(df):
+    """
+    (date, excess_liquidity, yield_spread, PMI) -> (date, macro_factor)，逐列獨立。
+    """
+    factor = calc_macro_factor_array(
+        df["excess_liquidity"], df["yield_spread"], df["PMI"]
+    )
+    return df[["date"]].assign(macro_factor=factor)
 
-    logging.info("   [Macro] Loading data for historical calculation...")
-    df = pd.read_csv(input_path)
 
-    # 欄位預處理
+def prepare_macro_columns(df):
+    """
+    補齊係數需要的欄位 (缺少時以預設值代替) 並填補缺值。
+    """
     if "yield_spread" not in df.columns:
         if "DGS10" in df.columns and "DGS2" in df.columns:
             df["yield_spread"] = df["DGS10"] - df["DGS2"]
@@ -108,25 +145,82 @@ def calc_macro_factor_pipeline(input_path=None, output_path=None):
     if "PMI" not in df.columns:
         df["PMI"] = 50
 
-    df = df.ffill().fillna(0)
+    return df.ffill().fillna(0)
 
-    # 執行批次計算
-    df["macro_factor"] = df.apply(
-        lambda x: calc_macro_factor_logic(
-            x["excess_liquidity"], x["yield_spread"], x["PMI"]
-        ),
-        axis=1,
-    )
+
+def calc_macro_factor_pipeline(input_path=None, output_path=None, incremental=None, as_of=None):
+    """
+    incremental 時只計算新發布的宏觀數據列並附加到既有檔案。
+    as_of 指定日期時不讀 input_path，改由原始序列重建當天可得的宏觀面板 (不做增量)。
+    """
+    if as_of is not None:
+        from utils import macro_preprocess
+
+        logging.info(f"   [Macro] Rebuilding macro panel as of {as_of}...")
+        df = macro_preprocess.load_macro_data(
+            **{f"{column}_csv": path for column, path in macro_preprocess.SOURCE_PATHS.items()},
+            output_path=None,
+            as_of=as_of,
+        )
+        incremental = False
+    elif not storage.exists(input_path):
+        logging.warning(f" [Macro] 找不到 {input_path}")
+        return False
+    else:
+        logging.info("   [Macro] Loading data for historical calculation...")
+        df = storage.read_frame(input_path)
+
+    # 欄位預處理
+    df = prepare_macro_columns(df)
+    inputs = ["date", "excess_liquidity", "yield_spread", "PMI"]
+
+    # 延後載入 (nowcast 只用到 calculate_macro_factor)
+    from utils.incremental import update_frame
 
     try:
-        output_df = df[["date", "macro_factor"]]
-        output_df.to_csv(output_path, index=False)
+        # 執行批次計算 (整欄向量化)
+        update_frame(
+            output_path,
+            df,
+            lambda frame, offset: calc_macro_factor_frame(frame),
+            inputs=inputs,
+            enabled=incremental,
+        )
         logging.info(f"    [Macro] 成功產生平衡型係數！已儲存至: {output_path}")
         logging.info(
-            f"    數據預覽 (最新 5 筆):\n{output_df.tail().to_string(index=False)}"
+            f"    數據預覽 (最新 5 筆):\n{calc_macro_factor_frame(df.tail()).to_string(index=False)}"
         )
     except Exception as e:
         logging.error(f"    存檔失敗: {e}")
+        return False
+
+
+def calc_point_in_time_pipeline(
+    output_path=PathConfig.MACRO_FACTOR_PIT_CSV,
+    dates=None,
+    vintage_dir=PathConfig.VINTAGE_DIR,
+):
+    """
+    每月 (或 dates) 以當時已發布的數據計算宏觀係數 -> (date, period, macro_factor)：
+    date 為計算當天，period 為當時最新的宏觀週期。回測使用此檔即不含事後修正與發布延遲的前視。
+    """
+    from utils import macro_preprocess
+
+    df = macro_preprocess.point_in_time_panel(dates=dates, vintage_dir=vintage_dir)
+    if df.empty:
+        logging.warning(" [Macro] Point-in-time 面板沒有資料")
+        return False
+
+    df = prepare_macro_columns(df)
+    out = df[["date", "period"]].assign(
+        macro_factor=calc_macro_factor_array(df["excess_liquidity"], df["yield_spread"], df["PMI"])
+    )
+    storage.write_frame(out, output_path)
+    logging.info(
+        f"    [Macro] Point-in-time 係數 {len(out)} 期 "
+        f"({out['date'].min():%Y-%m-%d} ~ {out['date'].max():%Y-%m-%d})，已儲存至: {output_path}"
+    )
+    return out
 
 
 if __name__ == "__main__":
@@ -1,16 +1,22 @@
+import argparse
 import logging
 import os
+from dataclasses import replace
 from datetime import datetime
 
-import matplotlib.pyplot as plt
-import pandas as pd
-
-from breadth import cap_vs_equal
+from breadth import cap_vs_equal, constituents
+from config.frequency import FREQUENCIES, get_frequency
 from config.path import PathConfig
+from config.runtime import RuntimeConfig
 from decision import backtest, report, signal_calc
+from decision.dashboard import visualize
+from decision.nowcast import nowcast
+from decision.rules import SIGNAL_RULES
 from macro import macro_factor_calc
 from market import market_return_calc
-from utils import fred_loader, future_mock, macro_preprocess
+from utils import fred_loader, future_mock, macro_preprocess, price_cache, render, vintage
+from utils.dag import DagRunner, Stage
+from utils.telemetry import Telemetry
 
 logging.basicConfig(
     level=logging.WARNING,  # INFO, WARNING, ERROR, CRITICAL
@@ -21,231 +27,285 @@ logging.basicConfig(
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
 logging.getLogger("PIL").setLevel(logging.WARNING)
 
+# 產出資料的步驟 (cli.py compute)；其餘為報表 / 回測 / 畫圖等輸出類步驟
+COMPUTE_STAGES = (
+    "prices",
+    "macro_preprocess",
+    "macro_factor",
+    "macro_pit",
+    "market",
+    "breadth",
+    "constituent_breadth",
+    "future_mock",
+    "signal_calc",
+)
 
-def run_pipeline():
-    # 設定目標日期
-    target_date_str = datetime.now().strftime("%Y-%m-%d")
-    PathConfig.ensure_dir()
-    print("==========================================")
-    print(f" Target Date : {target_date_str}")
-    print("==========================================")
-
-    # ------------------------------------------------------
-    # Batch Processing (歷史數據與趨勢推演)
-    # ------------------------------------------------------
-
-    logging.info("\n[Step 1] Fetching Real World Data...")
-    fred_loader.update_all_fred(output_dir=PathConfig.RAW_DATA_DIR)
 
-    logging.info("\n[Step 2] Preprocessing Macro Data...")
-    macro_preprocess.load_macro_data(
-        m2_csv=PathConfig.M2_CSV,
-        gdp_csv=PathConfig.GDP_CSV,
-        yield_10y_csv=PathConfig.YIELD_10Y_CSV,
-        yield_2y_csv=PathConfig.YIELD_2Y_CSV,
+def build_stages(target_date_str, params=None, frequency=None):
+    """
+    以 DAG 宣告管線步驟：依賴由輸入 / 輸出檔案推導，互不依賴的步驟 (FRED、市場、廣度) 併發執行。
+    params 可覆寫訊號門檻 (見 decision/rules.py 的 Param) 與市場預期回報參數；
+    frequency ("monthly" / "daily") 決定市場週期、推算步長、訊號主軸與回測年化。
+    RuntimeConfig.POINT_IN_TIME 時加入 point-in-time 宏觀係數步驟，訊號改用其輸出；
+    RuntimeConfig.CONSTITUENT_BREADTH 時加入成分股廣度步驟，報告附上其最新一天。
+    """
+    params = params or {}
+    freq = get_frequency(frequency)
+    signal_params = {k: v for k, v in params.items() if k in SIGNAL_RULES.params}
+    market_params = {
+        "base_return": params.get("base_return", market_return_calc.BASE_RETURN),
+        "sensitivity": params.get("sensitivity", market_return_calc.SENSITIVITY),
+    }
+    projections = (
+        PathConfig.MACRO_FACTOR_PROJECTION_CSV,
+        PathConfig.MARKET_RETURN_PROJECTION_CSV,
+        PathConfig.PROJECTION_BANDS_CSV,
     )
-
-    logging.info("\n[Step 3] Calculating Historical Macro Factors...")
-    macro_factor_calc.calc_macro_factor_pipeline(
-        input_path=PathConfig.MACRO_CSV, output_path=PathConfig.MACRO_FACTOR_CSV
+    price_files = tuple(price_cache.cache_file(ticker) for ticker in price_cache.PIPELINE_TICKERS)
+    point_in_time = RuntimeConfig.POINT_IN_TIME
+    constituent_outputs = (
+        (PathConfig.CONSTITUENT_BREADTH_CSV,) if RuntimeConfig.CONSTITUENT_BREADTH else ()
     )
-
-    logging.info("\n[Step 4] Calculating Historical Market Returns...")
-    market_return_calc.calc_market_return_pipeline(
-        output_path=PathConfig.MARKET_RETURN_CSV
+    macro_factor_path = PathConfig.MACRO_FACTOR_PIT_CSV if point_in_time else PathConfig.MACRO_FACTOR_CSV
+    signal_inputs = (
+        macro_factor_path,
+        PathConfig.MARKET_RETURN_CSV,
+        PathConfig.BREADTH_CSV,
+        *projections[:2],
     )
 
-    logging.info("\n[Step 4.5] Analyzing Market Breadth (Cap vs Equal)...")
-    cap_vs_equal.calc_breadth_pipeline()
-
-    logging.info(f"\n[Step 5] Projecting Trend to {target_date_str}...")
-    try:
-        future_mock.mock_future_data(target_date_str=target_date_str)
-    except AttributeError:
-        logging.warning("警告：找不到 mock_future_data，跳過推算步驟。")
-
-    logging.info("\n[Step 6] Generating Final Signals...")
-    signal_calc.calc_final_signal_pipeline(
-        macro_path=PathConfig.MACRO_FACTOR_CSV,
-        market_path=PathConfig.MARKET_RETURN_CSV,
-        breadth_path=PathConfig.BREADTH_CSV,
-        output_path=PathConfig.FINAL_SIGNAL_CSV,
-    )
-
-    logging.info("\n[Step 7] Analyzing Market Status...")
-    report.generate_market_report(PathConfig.FINAL_SIGNAL_CSV)
-
-    logging.info("\n[Step 8] Running Backtest...")
-    backtest.run_backtest(PathConfig.FINAL_SIGNAL_CSV)
-
-    # ------------------------------------------------------
-    #  Real-Time Nowcasting & Actionable Advice
-    # ------------------------------------------------------
-
-    logging.info("[Step 10] Executing High-Frequency Nowcasting...")
-
-    try:
-        #  讀取與檢查數據
-        macro_path = PathConfig.MACRO_FACTOR_CSV
-        if not os.path.exists(macro_path):
-            raise FileNotFoundError(f"找不到數據檔案: {macro_path}")
-
-        df_macro = pd.read_csv(macro_path)
-        # 數據健壯性檢查：處理缺失值
-        if df_macro.isnull().values.any():
-            logging.warning("檢測到數據缺失，執行自動填充")
-            df_macro.ffill(inplace=True)
-
-        latest_row = df_macro.iloc[-1]
-        prev_idx = max(0, len(df_macro) - 4)
-        prev_3m_row = df_macro.iloc[prev_idx]
-
-        current_snapshot = {
-            "10Y_Yield": latest_row.get("10Y_Yield", latest_row.get("DGS10", 4.0)),
-            "2Y_Yield": latest_row.get("2Y_Yield", latest_row.get("DGS2", 3.8)),
-            "Jobless_Claims_4W_MA": latest_row.get(
-                "Jobless_Claims", latest_row.get("ICSA", 220000)
+    stages = [
+        # [Step 1] 下載類步驟以日期為參數：同一天重跑不再連網
+        Stage(
+            "fred",
+            lambda: fred_loader.update_all_fred(output_dir=PathConfig.RAW_DATA_DIR),
+            outputs=(PathConfig.FRED_RAW_CSV,),
+            params={"date": target_date_str},
+        ),
+        # [Step 2]
+        Stage(
+            "macro_preprocess",
+            lambda: macro_preprocess.load_macro_data(
+                m2_csv=PathConfig.M2_CSV,
+                gdp_csv=PathConfig.GDP_CSV,
+                yield_10y_csv=PathConfig.YIELD_10Y_CSV,
+                yield_2y_csv=PathConfig.YIELD_2Y_CSV,
             ),
-            "Jobless_Claims_3M_Ago": prev_3m_row.get(
-                "Jobless_Claims", prev_3m_row.get("ICSA", 210000)
+            inputs=(
+                PathConfig.M2_CSV,
+                PathConfig.GDP_CSV,
+                PathConfig.YIELD_10Y_CSV,
+                PathConfig.YIELD_2Y_CSV,
             ),
-            "PMI": latest_row.get("PMI", 50.0),
-        }
-
-        #  計算當下宏觀係數
-        nowcast_factor, risks = macro_factor_calc.calculate_macro_factor(
-            current_snapshot
-        )
-
-        #  取得估值與廣度資訊
-        signal_path = PathConfig.FINAL_SIGNAL_CSV
-        raw_expected_return = 0.05
-        breadth_status = "UNKNOWN"
-
-        if os.path.exists(signal_path):
-            df_signal = pd.read_csv(signal_path)
-            latest_signal = df_signal.iloc[-1]
-            raw_expected_return = latest_signal.get("expected_return", 0.05)
-            breadth_status = latest_signal.get("breadth_signal", "HEALTHY")
-
-        #  決策運算
-        final_decision_return = raw_expected_return * nowcast_factor
-
-        #  輸出實戰診斷儀表板
-        print(f"\n 數據基準日: {target_date_str}")
-        print("-" * 50)
-        print(" 模型指標摘要:")
-        print(f"   - 預期年化報酬: {raw_expected_return:.2%}")
-        print(f"   - 宏觀風險修正: x{nowcast_factor:.2f}")
-        print(f"   - 市場廣度狀態: {breadth_status}")
-        print("-" * 50)
-        print(f" 修正後預期回報: {final_decision_return:.2%}")
-
-        #  資產操作指令與槓桿建議
-        print("\n 【推薦動作】")
-        print("-" * 50)
-
-        # leverage = 1.0
-        # action = ""
-        # reason = ""
-
-        # 槓桿與操作邏輯判斷
-        if final_decision_return <= 0:
-            leverage = 0.0
-            action = " 避險/空手 (Risk Off)"
-            reason = "模型預測為負報酬，大盤下行風險極高，建議撤離市場。"
-        elif breadth_status == "FRAGILE":
-            leverage = 0.5
-            action = " 減倉/避險 (Defensive)"
-            reason = (
-                "偵測到『指標背離』：權值股獨強但廣度轉差，結構脆弱，建議部位減半。"
+            outputs=(PathConfig.MACRO_CSV,),
+        ),
+        # [Step 3]
+        Stage(
+            "macro_factor",
+            lambda: macro_factor_calc.calc_macro_factor_pipeline(
+                input_path=PathConfig.MACRO_CSV,
+                output_path=PathConfig.MACRO_FACTOR_CSV,
+            ),
+            inputs=(PathConfig.MACRO_CSV,),
+            outputs=(PathConfig.MACRO_FACTOR_CSV,),
+        ),
+        # [Step 3.9] 同步日線快取 (每次執行；快取 REFRESH_MINUTES 內同步過或離線時不連網)，
+        # market / breadth 以快取檔為輸入，快取沒有新 K 棒時直接跳過
+        Stage(
+            "prices",
+            lambda: [price_cache.sync_daily(ticker) for ticker in price_cache.PIPELINE_TICKERS],
+            outputs=price_files,
+            cacheable=False,
+        ),
+        # [Step 4]
+        Stage(
+            "market",
+            lambda: market_return_calc.calc_market_return_pipeline(
+                output_path=PathConfig.MARKET_RETURN_CSV,
+                frequency=freq,
+                **market_params,
+            ),
+            inputs=(price_cache.cache_file("^GSPC"),),
+            outputs=(PathConfig.MARKET_RETURN_CSV,),
+            params={"frequency": freq.name, **market_params},
+        ),
+        # [Step 4.5] 近 5 年區間隨日期移動，故仍以日期為參數
+        Stage(
+            "breadth",
+            cap_vs_equal.calc_breadth_pipeline,
+            inputs=price_files,
+            outputs=(PathConfig.BREADTH_CSV,),
+            params={"date": target_date_str},
+        ),
+        # [Step 5] 推算結果寫入疊加層，不改動 macro_factor / market 的輸出
+        Stage(
+            "future_mock",
+            lambda: future_mock.mock_future_data(
+                target_date_str=target_date_str, frequency=freq, **market_params
+            ),
+            inputs=(PathConfig.MACRO_FACTOR_CSV, PathConfig.MARKET_RETURN_CSV),
+            outputs=projections,
+            params={"target_date": target_date_str, "frequency": freq.name, **market_params},
+        ),
+        # [Step 6]
+        Stage(
+            "signal_calc",
+            lambda: signal_calc.calc_final_signal_pipeline(
+                macro_path=macro_factor_path,
+                market_path=PathConfig.MARKET_RETURN_CSV,
+                breadth_path=PathConfig.BREADTH_CSV,
+                output_path=PathConfig.FINAL_SIGNAL_CSV,
+                params=signal_params,
+                frequency=freq,
+            ),
+            inputs=signal_inputs,
+            outputs=(PathConfig.FINAL_SIGNAL_CSV,),
+            params={"frequency": freq.name, **signal_params},
+        ),
+        # [Step 7] ~ [Step 9] 輸出類步驟每次都執行，after 維持原本的輸出順序；
+        # 圖表交給背景行程渲染 (utils/render.py)，步驟送出後即完成
+        Stage(
+            "report",
+            lambda: report.generate_market_report(
+                PathConfig.FINAL_SIGNAL_CSV, params=signal_params
+            ),
+            inputs=(PathConfig.FINAL_SIGNAL_CSV, *constituent_outputs),
+            cacheable=False,
+        ),
+        Stage(
+            "backtest",
+            lambda: backtest.run_backtest(
+                PathConfig.FINAL_SIGNAL_CSV, params=signal_params, frequency=freq
+            ),
+            inputs=(PathConfig.FINAL_SIGNAL_CSV,),
+            after=("report",),
+            cacheable=False,
+        ),
+        Stage(
+            "nowcast",
+            lambda: nowcast(target_date_str),
+            inputs=(PathConfig.MACRO_FACTOR_CSV, PathConfig.FINAL_SIGNAL_CSV),
+            after=("backtest",),
+            cacheable=False,
+        ),
+        Stage(
+            "visualize",
+            visualize,
+            inputs=(PathConfig.FINAL_SIGNAL_CSV,),
+            after=("nowcast",),
+            cacheable=False,
+        ),
+    ]
+
+    if point_in_time:
+        # [Step 3.5] 以原始序列 (有 ALFRED 版本檔時含歷次修正) 重建每月當時可得的宏觀係數；
+        # 預設日期到今天為止，故以日期為參數
+        vintages = [vintage.vintage_path(name) for name in fred_loader.VINTAGE_SERIES.values()]
+        stages.append(
+            Stage(
+                "macro_pit",
+                macro_factor_calc.calc_point_in_time_pipeline,
+                inputs=(
+                    *macro_preprocess.SOURCE_PATHS.values(),
+                    *(path for path in vintages if os.path.exists(path)),
+                ),
+                outputs=(PathConfig.MACRO_FACTOR_PIT_CSV,),
+                params={"date": target_date_str},
             )
-        elif (
-            final_decision_return > 0.08
-            and nowcast_factor >= 1.0
-            and breadth_status == "HEALTHY"
-        ):
-            leverage = 2.0
-            action = " 強力買進 (Aggressive Buy)"
-            reason = "估值極度便宜且宏觀順風，建議開啟 2x 槓桿（如 SSO/UPRO。"
-        elif final_decision_return > 0.04 and nowcast_factor >= 0.9:
-            leverage = 1.0
-            action = " 正常持有 (Neutral/Buy)"
-            reason = "環境穩健但回報空間一般，建議現貨持倉（SPY/VOO），不開槓桿。"
-        else:
-            leverage = 0.8
-            action = "謹慎持有 (Weak Buy)"
-            reason = "雖有回報預期，但宏觀數據出現微弱逆風，建議稍微調低倉位。"
-
-        print(f"指令動態：{action}")
-        print(f"槓桿倍數：{leverage}x")
-        print(
-            f"建議配置：{int(leverage * 100)}% 部位投資於 SPY/VOO，{int((1 - min(leverage, 1)) * 100)}% 留存現金"
-        )
-        print(f"理由詳述：{reason}")
-        print("-" * 50)
-
-    except Exception as e:
-        logging.error(f" Step 10 執行失敗: {e}")
-
-    #  畫圖 (視覺化)
-    logging.info("\n[Step 9] Visualizing Results...")
-    visualize()
-    logging.info("\n Pipeline Completed Successfully!")
-
-
-def visualize():
-    path = PathConfig.FINAL_SIGNAL_CSV
-    if not os.path.exists(path):
-        logging.warning("No signal file found to plot.")
-        return
-
-    df = pd.read_csv(path, parse_dates=["date"])
-    recent_date = df["date"].max() - pd.DateOffset(years=5)
-    df_recent = df[df["date"] >= recent_date]
-
-    if not df_recent.empty:
-        fig, ax1 = plt.subplots(figsize=(14, 7))
-        ax1.set_xlabel("Date")
-        ax1.set_ylabel("Macro Factor", color="tab:blue")
-        ax1.plot(
-            df_recent["date"],
-            df_recent["macro_factor"],
-            color="tab:blue",
-            label="Macro Factor",
-            alpha=0.8,
-        )
-        ax1.axhline(y=1.0, color="gray", linestyle="--")
-
-        ax2 = ax1.twinx()
-        ax2.set_ylabel("Final Return (Adjusted)", color="tab:orange")
-        ax2.plot(
-            df_recent["date"],
-            df_recent["final_return"],
-            color="tab:orange",
-            label="Adjusted Return",
         )
-        ax2.fill_between(
-            df_recent["date"],
-            df_recent["final_return"],
-            0,
-            where=(df_recent["final_return"] >= 0),
-            color="tab:green",
-            alpha=0.2,
-        )
-        ax2.fill_between(
-            df_recent["date"],
-            df_recent["final_return"],
-            0,
-            where=(df_recent["final_return"] < 0),
-            color="tab:red",
-            alpha=0.2,
+    if constituent_outputs:
+        # [Step 4.6] 約 500 檔成分股的日線批次同步，每天一次
+        stages.append(
+            Stage(
+                "constituent_breadth",
+                constituents.calc_constituent_breadth_pipeline,
+                outputs=constituent_outputs,
+                params={"date": target_date_str},
+            )
         )
+    return stages
+
+
+def run_pipeline(
+    params=None,
+    force=False,
+    headless=None,
+    telemetry=True,
+    frequency=None,
+    incremental=None,
+    only=None,
+    point_in_time=None,
+    constituent_breadth=None,
+):
+    """
+    headless=True 關閉進度條與展示停頓；telemetry=True 時輸出各步驟量測
+    (PathConfig.RUN_REPORT_JSON / RUN_METRICS_PROM)；incremental=True 時各計算步驟
+    只重算新增的尾段 (utils/incremental.py)。only 指定步驟名稱時只執行這些步驟
+    (上游輸出視為既有檔案)。point_in_time=True 時訊號使用 point-in-time 宏觀係數；
+    constituent_breadth=True 時另計算 S&P 500 成分股廣度。
+    """
+    if headless is not None:
+        RuntimeConfig.HEADLESS = headless
+    if incremental is not None:
+        RuntimeConfig.INCREMENTAL = incremental
+    if point_in_time is not None:
+        RuntimeConfig.POINT_IN_TIME = point_in_time
+    if constituent_breadth is not None:
+        RuntimeConfig.CONSTITUENT_BREADTH = constituent_breadth
 
-        plt.title("MVP Quant Dashboard: Last 5 Years Projection")
-        fig.tight_layout()
-        plt.show()
+    # 設定目標日期
+    target_date_str = datetime.now().strftime("%Y-%m-%d")
+    PathConfig.ensure_dir()
+    print("==========================================")
+    print(f" Target Date : {target_date_str}")
+    print("==========================================")
+
+    stages = build_stages(target_date_str, params, frequency)
+    if only is not None:
+        stages = [
+            replace(stage, after=tuple(name for name in stage.after if name in only))
+            for stage in stages
+            if stage.name in only
+        ]
+
+    collector = Telemetry(trace_memory=RuntimeConfig.TRACE_MEMORY) if telemetry else None
+    runner = DagRunner(stages, telemetry=collector)
+    try:
+        status = runner.run(force=force)
+    finally:
+        # 等待背景圖表寫完 (輸出於 PathConfig.CHARTS_DIR)
+        render.wait()
+        if collector is not None:
+            collector.close()
+            collector.write_json()
+            collector.write_prometheus()
+
+    failed = [name for name, result in status.items() if result in ("failed", "blocked")]
+    if failed:
+        logging.error(f"\n Pipeline 未完成，失敗或中止的步驟: {failed}")
+    else:
+        logging.info("\n Pipeline Completed Successfully!")
+    return status
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Expected Market Return pipeline")
+    parser.add_argument("--headless", action="store_true", help="關閉進度條與展示停頓")
+    parser.add_argument("--force", action="store_true", help="忽略快取指紋，所有步驟重跑")
+    parser.add_argument("--frequency", choices=sorted(FREQUENCIES), help="管線頻率 (預設 monthly)")
+    parser.add_argument("--incremental", action="store_true", help="只重算新增的資料列並附加寫入")
+    parser.add_argument(
+        "--point-in-time", action="store_true", help="訊號改用每月當時已發布的宏觀數據 (無前視)"
+    )
+    parser.add_argument(
+        "--constituents", action="store_true", help="另計算 S&P 500 成分股廣度 (騰落線、均線、新高新低)"
+    )
+    args = parser.parse_args()
+    run_pipeline(
+        force=args.force,
+        headless=args.headless or None,
+        frequency=args.frequency,
+        incremental=args.incremental or None,
+        point_in_time=args.point_in_time or None,
+        constituent_breadth=args.constituents or None,
+    )
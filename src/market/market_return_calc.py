@@ -1,44 +1,82 @@
 import logging
 
 import pandas as pd
-import yfinance as yf
 
+from config.frequency import get_frequency
 from config.path import PathConfig
+from utils import price_cache
+from utils.incremental import rolling_mean, update_frame
 
 
-def calc_market_return_pipeline(output_path=None):
-    logging.info("   [Market] Fetching S&P 500 data from yfinance...")
+BASE_RETURN = 0.08  # 長期基準回報
+SENSITIVITY = 0.2  # 乖離率對預期回報的敏感度
 
-    #  抓取資料
-    try:
-        sp500 = yf.download("^GSPC", period="max", interval="1mo", progress=False)
-    except Exception as e:
-        logging.error(f" 下載失敗: {e}")
-        return
 
-    if sp500.empty:
-        logging.error(" 錯誤: 下載到的資料為空 (Empty DataFrame)")
-        return
+def calc_bias(close, window=24, offset=0):
+    """
+    均值回歸乖離率：(Close - MA) / MA。
+    offset 為 close 第一列在完整歷史中的位置 (增量重算尾段時傳入，見 utils/incremental.py)。
+    """
+    ma = rolling_mean(close, window, offset)
+    return (close - ma) / ma
+
 
-    # 檢查是否為 MultiIndex
-    if isinstance(sp500.columns, pd.MultiIndex):
-        try:
-            cols = list(sp500)
+def calc_expected_return(bias, base_return=BASE_RETURN, sensitivity=SENSITIVITY):
+    """
+    預期回報 = 基準回報 - 乖離率 * 敏感度 (乖離率不足時以基準回報填補)。
+    """
+    return (base_return - (bias * sensitivity)).fillna(base_return)
 
-            if any("Close" in str(c) for c in cols):
-                sp500.columns = [c[0] for c in cols]
 
-        except Exception as e:
-            logging.error(f"欄位攤平發生錯誤: {e}")
+def calc_trend_signal(close, window=10, offset=0):
+    """
+    趨勢濾網：收盤價站上 window 期均線 (均線不足時為 False)。
+    """
+    return close > rolling_mean(close, window, offset)
 
-    current_cols = list(sp500)
 
-    if "Close" not in current_cols:
-        if "Adj Close" in current_cols:
-            sp500.rename(columns={"Adj Close": "Close"}, inplace=True)
-        else:
-            logging.error(f" 嚴重錯誤: 找不到 Close 欄位。目前的欄位是: {current_cols}")
-            return
+def calc_market_frame(
+    prices, base_return=BASE_RETURN, sensitivity=SENSITIVITY, frequency=None, offset=0
+):
+    """
+    (date, Close) -> (date, Close, expected_return, trend_signal)。
+    """
+    freq = get_frequency(frequency)
+    df = prices[["date", "Close"]].copy()
+
+    #  計算均值回歸，定義預期回報
+    bias = calc_bias(df["Close"], freq.periods(24), offset)
+    df["expected_return"] = calc_expected_return(bias, base_return, sensitivity)
+
+    #  趨勢濾網 (Trend Filter)
+    df["trend_signal"] = calc_trend_signal(df["Close"], freq.periods(10), offset)
+    return df
+
+
+def calc_market_return_pipeline(
+    output_path=None,
+    base_return=BASE_RETURN,
+    sensitivity=SENSITIVITY,
+    frequency=None,
+    incremental=None,
+):
+    """
+    frequency 決定價格週期與視窗長度 (24 個月乖離率、10 個月趨勢線依頻率換算期數)。
+    incremental 時只重算新增的 K 棒 (往前帶一個視窗) 並附加到既有檔案，見 utils/incremental.py。
+    """
+    freq = get_frequency(frequency)
+    logging.info(f"   [Market] Loading S&P 500 data from price cache ({freq.name})...")
+
+    #  抓取資料 (共用日線快取，月線由日線聚合)
+    try:
+        sp500 = price_cache.load_prices("^GSPC", interval=freq.interval)
+    except Exception as e:
+        logging.error(f" 下載失敗: {e}")
+        return False
+
+    if sp500.empty:
+        logging.error(" 錯誤: 下載到的資料為空 (Empty DataFrame)")
+        return False
 
     sp500 = sp500[["Close"]].copy()
 
@@ -46,31 +84,23 @@ def calc_market_return_pipeline(output_path=None):
     if not isinstance(sp500.index, pd.DatetimeIndex):
         sp500.index = pd.to_datetime(sp500.index)
 
-    sp500.index = sp500.index.to_series().dt.to_period("M").dt.to_timestamp()
+    if freq.interval == "1mo":
+        sp500.index = sp500.index.to_series().dt.to_period("M").dt.to_timestamp()
     sp500.index.name = "date"
     sp500.reset_index(inplace=True)
 
-    #  計算均值回歸
-    sp500["ma_24"] = sp500["Close"].rolling(24).mean()
-    sp500["bias"] = (sp500["Close"] - sp500["ma_24"]) / sp500["ma_24"]
-
-    # 定義預期回報
-    base_return = 0.08
-    sensitivity = 0.2
-    sp500["expected_return"] = base_return - (sp500["bias"] * sensitivity)
-
-    #  趨勢濾網 (Trend Filter)
-    sp500["ma_10"] = sp500["Close"].rolling(10).mean()
-    sp500["trend_signal"] = sp500["Close"] > sp500["ma_10"]
-
-    #  存檔
-    sp500["date"] = sp500["date"].dt.strftime("%Y-%m-%d")
-    sp500["expected_return"] = sp500["expected_return"].fillna(base_return)
-    sp500["trend_signal"] = sp500["trend_signal"].fillna(True)
-
-    output_df = sp500[["date", "Close", "expected_return", "trend_signal"]].copy()
-
-    output_df.to_csv(output_path, index=False)
+    #  計算並存檔
+    update_frame(
+        output_path,
+        sp500,
+        lambda frame, offset: calc_market_frame(
+            frame, base_return, sensitivity, freq, offset
+        ),
+        inputs=["date", "Close"],
+        lookback=max(freq.periods(24), freq.periods(10)) - 1,
+        params={"frequency": freq.name, "base_return": base_return, "sensitivity": sensitivity},
+        enabled=incremental,
+    )
     logging.info(f"  [Market] 資料處理成功！已儲存至 {output_path}")
 
 
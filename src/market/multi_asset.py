@@ -0,0 +1,87 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config.path import PathConfig
+from market.market_return_calc import (
+    BASE_RETURN,
+    SENSITIVITY,
+    calc_bias,
+    calc_expected_return,
+    calc_trend_signal,
+)
+from utils import price_cache
+
+# 預設標的池 (美股類股 ETF、主要指數、國際指數 / ETF)；可由 PathConfig.UNIVERSE_CSV 覆寫
+DEFAULT_UNIVERSE = (
+    "^GSPC", "^IXIC", "^DJI", "^RUT",
+    "SPY", "QQQ", "IWM", "RSP",
+    "XLB", "XLC", "XLE", "XLF", "XLI", "XLK", "XLP", "XLRE", "XLU", "XLV", "XLY",
+    "^N225", "^FTSE", "^GDAXI", "^HSI", "^STOXX50E",
+    "EFA", "EEM", "VGK", "EWJ",
+)
+
+
+def load_universe(path=PathConfig.UNIVERSE_CSV):
+    """
+    讀取標的清單 CSV (欄位: ticker)；檔案不存在時回傳預設標的池。
+    """
+    if not os.path.exists(path):
+        return list(DEFAULT_UNIVERSE)
+    return pd.read_csv(path, dtype=str)["ticker"].dropna().tolist()
+
+
+def load_price_matrix(tickers, interval="1mo", start=None, max_workers=8, offline=None):
+    """
+    併發讀取多檔標的 (共用 price_cache 日線快取)，對齊成 date x ticker 收盤價矩陣。
+    上市前 / 無資料的格子為 NaN；讀取失敗的標的記錄後略過。
+    """
+
+    def load(ticker):
+        try:
+            return price_cache.load_prices(
+                ticker, interval=interval, start=start, offline=offline
+            )["Close"]
+        except Exception as e:
+            logging.warning(f"   [Multi] {ticker} 讀取失敗，略過: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        series = dict(zip(tickers, pool.map(load, tickers)))
+
+    series = {t: s for t, s in series.items() if s is not None and not s.empty}
+    if not series:
+        raise ValueError("所有標的皆讀取失敗")
+
+    prices = pd.concat(series, axis=1, join="outer").sort_index()
+    prices.index.name = "date"
+    prices.columns.name = "ticker"
+    return prices
+
+
+def _per_ticker(prices, func):
+    """
+    逐檔以該標的自己的交易日計算再對齊回矩陣：各市場假日不同，外部合併後的 NaN
+    若留在矩陣裡，會讓涵蓋它的整個滾動視窗都變成 NaN。
+    """
+    columns = {ticker: func(prices[ticker].dropna()) for ticker in prices.columns}
+    out = pd.concat(columns, axis=1).reindex(prices.index)
+    out.columns.name = prices.columns.name
+    return out
+
+
+def calc_market_matrices(
+    prices, base_return=BASE_RETURN, sensitivity=SENSITIVITY, window=24, trend_window=10
+):
+    """
+    對整個價格矩陣計算預期回報與趨勢訊號 (與 market_return_calc 同一組公式)；
+    均線依各標的自己的觀測值計算。沒有價格的格子維持 NaN，不會被填成基準回報。
+    """
+    has_price = prices.notna()
+    bias = _per_ticker(prices, lambda s: calc_bias(s, window))
+    expected = calc_expected_return(bias, base_return, sensitivity).where(has_price)
+    trend = _per_ticker(prices, lambda s: calc_trend_signal(s, trend_window))
+    trend = trend.astype(object).where(has_price)
+    return {"Close": prices, "expected_return": expected, "trend_signal": trend}
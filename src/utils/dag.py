@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from config.path import PathConfig
+from utils import storage
+
+
+@dataclass
+class Stage:
+    """
+    管線中的一個步驟。inputs / outputs 為檔案路徑 (處理後資料可用 PathConfig 的 .csv 常數，
+    實際格式由 storage 決定)；依賴關係由「誰產出我的輸入」自動推導，after 可補充純順序依賴。
+    cacheable=False 的步驟 (報表、回測輸出) 每次都執行；main_thread=True 的步驟
+    (例如互動式畫圖) 在主執行緒上執行。func 回傳 False 或執行後缺少 outputs 時視為失敗，
+    不記錄指紋 (下次照常重跑)，下游步驟中止。
+    """
+
+    name: str
+    func: Callable[[], object]
+    inputs: tuple = ()
+    outputs: tuple = ()
+    params: dict = field(default_factory=dict)
+    after: tuple = ()
+    cacheable: bool = True
+    main_thread: bool = False
+
+
+def _file_path(path):
+    # 原始資料 / 價格快取只有 CSV，計算指紋時不警告格式退回
+    located = storage._locate(path, warn=False)
+    if located is not None:
+        return located
+    return Path(path) if os.path.exists(path) else None
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+
+def fingerprint(stage):
+    """
+    步驟指紋：輸入檔內容 + 參數的 SHA-256；輸入檔不存在時回傳 None (不可跳過)。
+    """
+    digest = hashlib.sha256(stage.name.encode())
+    digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+    for path in stage.inputs:
+        located = _file_path(path)
+        if located is None:
+            return None
+        digest.update(str(path).encode())
+        _hash_file(located, digest)
+    return digest.hexdigest()
+
+
+class DagRunner:
+    """
+    依賴感知的管線執行器：互不依賴的步驟併發執行，輸入與參數未變動的步驟直接跳過。
+    """
+
+    def __init__(
+        self,
+        stages,
+        state_path=PathConfig.PIPELINE_STATE_JSON,
+        max_workers=4,
+        telemetry=None,
+    ):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.telemetry = telemetry
+        self.deps = self._resolve_deps()
+
+    def _resolve_deps(self):
+        producers = {}
+        for stage in self.stages.values():
+            for path in stage.outputs:
+                producers.setdefault(str(path), set()).add(stage.name)
+
+        deps = {}
+        for stage in self.stages.values():
+            needed = set(stage.after)
+            for path in stage.inputs:
+                needed |= producers.get(str(path), set())
+            needed.discard(stage.name)
+            unknown = needed - self.stages.keys()
+            if unknown:
+                raise ValueError(f"{stage.name} 依賴不存在的步驟: {unknown}")
+            deps[stage.name] = needed
+
+        # 依賴環檢查 (Kahn)
+        pending = {name: set(d) for name, d in deps.items()}
+        while pending:
+            ready = [name for name, d in pending.items() if not d]
+            if not ready:
+                raise ValueError(f"管線存在循環依賴: {sorted(pending)}")
+            for name in ready:
+                del pending[name]
+            for d in pending.values():
+                d.difference_update(ready)
+        return deps
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _should_skip(self, stage, state, force):
+        if force or not stage.cacheable:
+            return False
+        if any(_file_path(path) is None for path in stage.outputs):
+            return False
+        previous = state.get(stage.name, {}).get("fingerprint")
+        return previous is not None and previous == fingerprint(stage)
+
+    def _execute(self, stage, state, force):
+        if self._should_skip(stage, state, force):
+            logging.info(f"   [DAG] {stage.name}: 輸入未變動，跳過")
+            if self.telemetry is not None:
+                self.telemetry.skip(stage.name)
+            return "skipped"
+        logging.info(f"   [DAG] {stage.name}: 執行中...")
+        measure = self.telemetry.measure(stage.name) if self.telemetry else nullcontext()
+        with measure:
+            result = stage.func()
+            # 步驟以回傳 False 表示失敗 (記錄錯誤後返回)；輸出檔未產生也視為失敗
+            missing = [str(path) for path in stage.outputs if _file_path(path) is None]
+            if result is False or missing:
+                detail = f"缺少輸出 {missing}" if missing else "步驟回報失敗"
+                raise RuntimeError(f"{stage.name}: {detail}")
+        # 執行後再取指紋：會改寫自身輸入的步驟下次才能正確跳過
+        if stage.cacheable:
+            state[stage.name] = {"fingerprint": fingerprint(stage)}
+        return "ran"
+
+    def run(self, force=False):
+        """
+        執行整個管線，回傳 {步驟名稱: ran / skipped / failed / blocked}。
+        """
+        state = self._load_state()
+        status = {}
+        remaining = dict(self.deps)
+        running = {}
+        main_queue = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while remaining or running or main_queue:
+                for name, d in list(remaining.items()):
+                    if any(status.get(dep) in ("failed", "blocked") for dep in d):
+                        # 上游失敗的步驟不再執行
+                        status[name] = "blocked"
+                        del remaining[name]
+                        if self.telemetry is not None:
+                            self.telemetry.skip(name, status="blocked")
+                    elif all(status.get(dep) in ("ran", "skipped") for dep in d):
+                        del remaining[name]
+                        stage = self.stages[name]
+                        if stage.main_thread:
+                            main_queue.append(name)
+                        else:
+                            future = pool.submit(self._execute, stage, state, force)
+                            running[future] = name
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        status[name] = self._result(name, future.result)
+                elif main_queue:
+                    # 主執行緒步驟等背景步驟都結束後才執行，避免阻塞併發
+                    name = main_queue.pop(0)
+                    stage = self.stages[name]
+                    status[name] = self._result(
+                        name, lambda: self._execute(stage, state, force)
+                    )
+
+        self._save_state(state)
+        return status
+
+    @staticmethod
+    def _result(name, get):
+        try:
+            return get()
+        except Exception as e:
+            logging.error(f"   [DAG] {name} 執行失敗: {e}")
+            return "failed"
@@ -1,116 +1,430 @@
+import csv
 import io
+import json
 import logging
 import os
-from functools import reduce
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 from config.path import PathConfig
+from config.runtime import RuntimeConfig
+from utils import telemetry, vintage
 
+FRED_BASE_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv"
+# ALFRED 歷次發布值 (FRED API，需 API key：環境變數 FRED_API_KEY)
+ALFRED_API_URL = "https://api.stlouisfed.org/fred/series/observations"
+ALFRED_PAGE_SIZE = 100000  # API 單次回傳上限
 
-def update_all_fred(output_dir=PathConfig.RAW_DATA_DIR):
+# 會被修正的序列 (FRED 代碼 -> data/raw/fred 的欄位名稱)，下載全部版本供 point-in-time 使用
+VINTAGE_SERIES = {
+    "M2SL": "m2",
+    "GDP": "gdp",
+}
+
+# 預設下載清單 (FRED 代碼 -> 欄位名稱)；可由 PathConfig.FRED_CATALOG_CSV 覆寫
+FRED_SERIES = {
+    "DGS10": "10Y_Yield",  # 10年期公債殖利率
+    "DGS2": "2Y_Yield",  # 2年期公債殖利率
+    "ICSA": "Jobless_Claims",  # 初領失業金人數
+    "T10Y2Y": "Yield_Spread",  # 10Y-2Y 利差
+}
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# 可重試的 HTTP 狀態碼 (限流 / 伺服器暫時錯誤)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def load_series_catalog(path=PathConfig.FRED_CATALOG_CSV):
     """
-    從 FRED 官網下載 CSV 數據 (Requests Mode)。
+    讀取下載清單 CSV (欄位: code, name)；檔案不存在時回傳預設清單。
     """
-    logging.info("   [FRED] 開始下載最新宏觀數據 (Requests Mode)...")
+    if not os.path.exists(path):
+        return dict(FRED_SERIES)
+    catalog = pd.read_csv(path, dtype=str)
+    return dict(zip(catalog["code"], catalog["name"]))
 
-    series_map = {
-        "DGS10": "10Y_Yield",  # 10年期公債殖利率
-        "DGS2": "2Y_Yield",  # 2年期公債殖利率
-        "ICSA": "Jobless_Claims",  # 初領失業金人數
-        "T10Y2Y": "Yield_Spread",  # 10Y-2Y 利差
-    }
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
+def make_session(pool_size=8):
+    """
+    建立共用連線池的 Session (所有執行緒共用同一組 keep-alive 連線)。
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    data_frames = []
 
-    try:
-        session = requests.Session()
-        session.headers.update(headers)
+def parse_fred_csv(content_text, fred_code, col_name):
+    """
+    解析 fredgraph.csv 內容，回傳以 DATE 為索引的單欄 DataFrame；內容異常時回傳 None。
+    """
+    if "DATE" not in content_text[:50] and "observation_date" not in content_text[:50]:
+        logging.warning(" 下載內容異常 (可能是 HTML 錯誤頁):")
+        logging.info(f"     內容預覽: {content_text[:100]}...")
+        return None
 
-        for fred_code, col_name in series_map.items():
-            url = f"https://fred.stlouisfed.org/graph/fredgraph.csv?id={fred_code}"
-            logging.info(f"   - Fetching {col_name} ({fred_code})...")
+    df = pd.read_csv(io.StringIO(content_text), na_values=".")
 
-            try:
-                response = session.get(url, timeout=10)
+    if "observation_date" in df.columns:
+        df = df.rename(columns={"observation_date": "DATE"})
 
-                if response.status_code != 200:
-                    logging.info(f"  HTTP 錯誤 {response.status_code}: {url}")
-                    continue
+    # 確保有 DATE 欄位才繼續
+    if "DATE" not in df.columns:
+        logging.warning(f"  CSV 缺少日期欄位，跳過。欄位: {df.columns}")
+        return None
 
-                content_text = response.text
+    # 轉換日期格式並設為 Index
+    df["DATE"] = pd.to_datetime(df["DATE"])
+    df = df.set_index("DATE")
 
-                if (
-                    "DATE" not in content_text[:50]
-                    and "observation_date" not in content_text[:50]
-                ):
-                    logging.warning(" 下載內容異常 (可能是 HTML 錯誤頁):")
-                    logging.info(f"     內容預覽: {content_text[:100]}...")
-                    continue
+    # 重新命名數值欄位 (例如 DGS10 -> 10Y_Yield)，並強制轉為數值
+    df = df.rename(columns={fred_code: col_name})
+    df[col_name] = pd.to_numeric(df[col_name], errors="coerce")
+    return df[[col_name]]
 
-                # 使用 io.StringIO 讀取
-                csv_data = io.StringIO(content_text)
 
-                df = pd.read_csv(csv_data, na_values=".")
+def load_cached_series(cache_dir, fred_code, col_name):
+    """
+    讀取本地序列快取：回傳 (DataFrame 或 None, meta)。meta 含最後觀測日與 HTTP 驗證標頭。
+    """
+    data_path = os.path.join(cache_dir, f"{fred_code}.csv")
+    meta_path = os.path.join(cache_dir, f"{fred_code}.json")
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, {}
 
-                if "observation_date" in df.columns:
-                    df = df.rename(columns={"observation_date": "DATE"})
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    df = pd.read_csv(
+        data_path, parse_dates=["DATE"], float_precision="round_trip"
+    ).set_index("DATE")
+    if col_name not in df.columns:
+        return None, {}
+    return df[[col_name]], meta
 
-                # 確保有 DATE 欄位才繼續
-                if "DATE" not in df.columns:
-                    logging.warning(f"  CSV 缺少日期欄位，跳過。欄位: {df.columns}")
-                    continue
 
-                # 轉換日期格式並設為 Index
-                df["DATE"] = pd.to_datetime(df["DATE"])
-                df = df.set_index("DATE")
+def save_cached_series(cache_dir, fred_code, df, meta, write_data=True):
+    os.makedirs(cache_dir, exist_ok=True)
+    if write_data:
+        df.reset_index().to_csv(os.path.join(cache_dir, f"{fred_code}.csv"), index=False)
+    with open(os.path.join(cache_dir, f"{fred_code}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
 
-                # 重新命名數值欄位 (例如 DGS10 -> 10Y_Yield)
-                df = df.rename(columns={fred_code: col_name})
 
-                # 強制轉為數值
-                df[col_name] = pd.to_numeric(df[col_name], errors="coerce")
+def fetch_series(
+    session,
+    fred_code,
+    col_name,
+    base_url=FRED_BASE_URL,
+    timeout=10,
+    retries=3,
+    backoff=0.5,
+    cache_dir=None,
+):
+    """
+    下載單一序列；連線錯誤、可重試狀態碼與異常內容以指數退避重試。
+    有快取時只請求最後觀測日之後的資料 (cosd)，並附上 ETag / Last-Modified 條件標頭，
+    回傳 (DataFrame 或 None, 是否有變動)。離線模式 (RuntimeConfig.OFFLINE) 只讀快取。
+    """
+    cached, meta = (None, {})
+    if cache_dir is not None:
+        cached, meta = load_cached_series(cache_dir, fred_code, col_name)
+    if RuntimeConfig.OFFLINE:
+        if cached is None:
+            logging.warning(f"   - 離線模式下找不到 {fred_code} 的快取")
+        return cached, False
 
-                data_frames.append(df)
+    params = {"id": fred_code}
+    headers = {}
+    if cached is not None:
+        # 從最後一筆觀測重新請求，可同時接住該筆的修正值
+        params["cosd"] = meta["last_date"]
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    logging.info(f"   - Fetching {col_name} ({fred_code})...")
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            response = session.get(
+                base_url, params=params, headers=headers, timeout=timeout
+            )
+        except requests.RequestException as e:
+            logging.warning(f"  連線失敗 {fred_code} (第 {attempt + 1} 次): {e}")
+            continue
+
+        if response.status_code == 304 and cached is not None:
+            logging.info(f"   - {fred_code} 未更新 (304)，使用快取")
+            return cached, False
+        if response.status_code in RETRY_STATUS:
+            logging.warning(
+                f"  HTTP {response.status_code}: {response.url} (第 {attempt + 1} 次)"
+            )
+            continue
+        if response.status_code != 200:
+            logging.info(f"  HTTP 錯誤 {response.status_code}: {response.url}")
+            return cached, False
+
+        try:
+            df = parse_fred_csv(response.text, fred_code, col_name)
+        except Exception as e:
+            logging.error(f"解析失敗 {fred_code}: {e}")
+            df = None
+        if df is None:
+            continue
+
+        changed = True
+        if cached is not None:
+            # 只附加增量：以新資料取代重疊區段
+            if len(df):
+                df = pd.concat([cached[cached.index < df.index.min()], df])
+            else:
+                df = cached
+            changed = not df.equals(cached)
+
+        if cache_dir is not None and len(df):
+            meta = {
+                "last_date": df.index.max().strftime("%Y-%m-%d"),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            save_cached_series(cache_dir, fred_code, df, meta, write_data=changed)
+        return df, changed
+
+    logging.error(f"下載失敗 {fred_code}：已重試 {retries} 次")
+    return cached, False
+
+
+def fetch_all_series(
+    series=None,
+    base_url=FRED_BASE_URL,
+    max_workers=8,
+    timeout=10,
+    retries=3,
+    backoff=0.5,
+    cache_dir=None,
+):
+    """
+    併發下載整份清單 (最多 max_workers 條連線)。
+    回傳 ({fred_code: DataFrame}, 有變動的 fred_code 集合)，失敗且無快取者略過。
+    """
+    series = series if series is not None else load_series_catalog()
+    session = make_session(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            fred_code: pool.submit(
+                fetch_series,
+                session,
+                fred_code,
+                col_name,
+                base_url,
+                timeout,
+                retries,
+                backoff,
+                cache_dir,
+            )
+            for fred_code, col_name in series.items()
+        }
+        results = {code: future.result() for code, future in futures.items()}
+
+    session.close()
+    frames = {code: df for code, (df, _) in results.items() if df is not None}
+    changed = {code for code, (_, is_changed) in results.items() if is_changed}
+    return frames, changed
+
+
+def join_series(frames):
+    """
+    單次 N 路外部合併 (依清單順序排列欄位)。
+    """
+    df_merged = pd.concat(list(frames), axis=1, join="outer").sort_index()
+    df_merged.index.name = "DATE"
+    return df_merged
 
-            except Exception as e_inner:
-                logging.error(f"下載或解析失敗 {fred_code}: {e_inner}")
-                continue
 
-        if not data_frames:
+def _csv_header(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def update_all_fred(
+    output_dir=PathConfig.RAW_DATA_DIR,
+    series=None,
+    cache_dir=PathConfig.FRED_CACHE_DIR,
+    **fetch_kwargs,
+):
+    """
+    從 FRED 官網下載 CSV 數據 (Requests Mode，併發 + 重試 + 增量快取)。
+    所有序列皆未變動且欄位 (序列清單) 相同時不重寫 fred_raw.csv (修改時間不變，下游可據此跳過)。
+    回傳是否成功：False 表示流程中止 (管線將此步驟標記為失敗)。
+    cache_dir=None 時每次下載完整歷史。離線模式 (RuntimeConfig.OFFLINE) 不連網：
+    沿用既有 fred_raw.csv，沒有時由各序列的快取合併。
+    """
+    output_path = os.path.join(output_dir, "fred_raw.csv")
+    if RuntimeConfig.OFFLINE and os.path.exists(output_path):
+        logging.info("   [FRED] 離線模式，沿用既有 fred_raw.csv")
+        return True
+
+    logging.info("   [FRED] 開始下載最新宏觀數據 (Requests Mode)...")
+
+    try:
+        frames, changed = fetch_all_series(series, cache_dir=cache_dir, **fetch_kwargs)
+
+        if not frames:
             raise ValueError("所有數據下載皆失敗。")
 
-        logging.info("   [System] 合併數據中...")
-        # 合併所有 DataFrame
-        df_merged = reduce(
-            lambda left, right: pd.merge(
-                left, right, on="DATE", how="outer", sort=True
-            ),
-            data_frames,
-        )
+        # 清單增刪序列時即使其餘序列未變動也要重寫，否則會留下已移除的欄位
+        columns = ["DATE", *(col for df in frames.values() for col in df.columns)]
+        if not changed and os.path.exists(output_path):
+            if _csv_header(output_path) == columns:
+                logging.info("   [FRED] 所有序列皆無更新，沿用既有 fred_raw.csv")
+                return True
+            logging.info("   [FRED] 序列清單已變動，重寫 fred_raw.csv")
 
+        logging.info("   [System] 合併數據中...")
         # 重置索引，讓 DATE 變回欄位以便存檔
-        df_merged = df_merged.reset_index()
+        df_merged = join_series(frames.values()).reset_index()
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        output_path = os.path.join(output_dir, "fred_raw.csv")
         df_merged.to_csv(output_path, index=False)
+        telemetry.record_io("write", len(df_merged), os.path.getsize(output_path))
 
         logging.info(f"   [FRED] 下載成功！數據已儲存至: {output_path}")
         # 顯示最新幾筆數據的日期，確認是否為最新的
         last_date = df_merged["DATE"].max()
         logging.info(f"   [FRED] 最新數據日期: {last_date.strftime('%Y-%m-%d')}")
+        return True
 
     except Exception as e:
         logging.error(f"   [Error] FRED 流程中止: {e}")
-        pass
+        return False
+
+
+# =========================================================
+#  ALFRED 版本 (point-in-time)
+# =========================================================
+
+
+def parse_alfred_observations(payload):
+    """
+    FRED API observations (realtime_start ~ 9999-12-31 的全部版本) -> (date, realtime_start, value) 長表；
+    每列為「某觀測期自 realtime_start 起公布的數值」，"." (當時無數值) 為 NaN。
+    """
+    df = pd.DataFrame(payload.get("observations", []), columns=["date", "realtime_start", "value"])
+    df["date"] = pd.to_datetime(df["date"])
+    df["realtime_start"] = pd.to_datetime(df["realtime_start"])
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    return df
+
+
+def fetch_vintages(
+    session,
+    fred_code,
+    api_key,
+    base_url=ALFRED_API_URL,
+    timeout=30,
+    retries=3,
+    backoff=0.5,
+):
+    """
+    下載單一序列的全部版本 (依 ALFRED_PAGE_SIZE 分頁)，重試規則同 fetch_series；失敗回傳 None。
+    """
+    pages = []
+    offset = 0
+    while True:
+        params = {
+            "series_id": fred_code,
+            "api_key": api_key,
+            "file_type": "json",
+            "realtime_start": "1776-07-04",
+            "realtime_end": "9999-12-31",
+            "limit": ALFRED_PAGE_SIZE,
+            "offset": offset,
+        }
+        payload = None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            try:
+                response = session.get(base_url, params=params, timeout=timeout)
+            except requests.RequestException as e:
+                logging.warning(f"  連線失敗 {fred_code} vintages (第 {attempt + 1} 次): {e}")
+                continue
+            if response.status_code in RETRY_STATUS:
+                logging.warning(f"  HTTP {response.status_code}: {fred_code} vintages (第 {attempt + 1} 次)")
+                continue
+            if response.status_code != 200:
+                logging.error(f"  HTTP 錯誤 {response.status_code}: {fred_code} vintages")
+                return None
+            payload = response.json()
+            break
+        if payload is None:
+            logging.error(f"下載失敗 {fred_code} vintages：已重試 {retries} 次")
+            return None
+
+        page = parse_alfred_observations(payload)
+        pages.append(page)
+        offset += len(page)
+        if len(page) < ALFRED_PAGE_SIZE or offset >= int(payload.get("count", offset)):
+            break
+    return pd.concat(pages, ignore_index=True)
+
+
+def update_vintages(
+    series=None,
+    vintage_dir=PathConfig.VINTAGE_DIR,
+    api_key=None,
+    max_workers=4,
+    **fetch_kwargs,
+):
+    """
+    下載 VINTAGE_SERIES 的全部版本，存成 vintage_dir/<欄位名稱>.csv (utils/vintage.py 讀取)。
+    沒有 API key 時不下載，point-in-time 改用 vintage.RELEASE_LAGS 的發布延遲模型。
+    回傳成功更新的欄位名稱。
+    """
+    if RuntimeConfig.OFFLINE:
+        logging.info("   [ALFRED] 離線模式，略過版本下載")
+        return []
+    api_key = api_key or os.getenv("FRED_API_KEY")
+    if not api_key:
+        logging.warning("   [ALFRED] 未設定 FRED_API_KEY，略過版本下載 (改用發布延遲模型)")
+        return []
+
+    series = series if series is not None else VINTAGE_SERIES
+    session = make_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            name: pool.submit(fetch_vintages, session, code, api_key, **fetch_kwargs)
+            for code, name in series.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+    session.close()
+
+    updated = []
+    for name, df in results.items():
+        if df is None or df.empty:
+            continue
+        path = vintage.save_vintages(df, name, vintage_dir)
+        updated.append(name)
+        logging.info(
+            f"   [ALFRED] {name}: {len(df)} 筆版本 ({df['realtime_start'].nunique()} 次發布) -> {path}"
+        )
+    return updated
 
 
 if __name__ == "__main__":
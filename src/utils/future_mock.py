@@ -1,116 +1,214 @@
 import logging
-import os
 
 import numpy as np
 import pandas as pd
-from dateutil.relativedelta import relativedelta
 
+from config.frequency import get_frequency
 from config.path import PathConfig
+from market.market_return_calc import BASE_RETURN, SENSITIVITY, calc_bias
+from utils import storage
 
+MACRO_TARGET = 1.0  # 宏觀係數的回歸目標
+EXPECTED_RETURN_TARGET = 0.05  # 預期回報的回歸目標
+MONTHLY_REVERSION = 0.1  # 每月收斂比例
+MONTHLY_GROWTH = 0.0058  # 長期每月成長
+MONTHLY_VOLATILITY = 0.01  # 每月波動度
 
-def mock_future_data(
-    target_date_str,
-    path_macro=PathConfig.MACRO_FACTOR_CSV,
-    path_market=PathConfig.MARKET_RETURN_CSV,
-):
-    """
-    使用「均值回歸 (Mean Reversion) & 長期成長」邏輯來填補空白。。
-    """
-    target_date: pd.Timestamp = pd.to_datetime(target_date_str)
-    logging.info(
-        f" 啟動均值回歸推算：正在將數據平滑延伸至 {target_date.strftime('%Y-%m')}..."
-    )
-
-    # ---------------------------------------------------------
-    #  補齊 Macro Factors (macro_factor.csv)
-    # ---------------------------------------------------------
-    if os.path.exists(path_macro):
-        df = pd.read_csv(path_macro, parse_dates=["date"])
-
-        last_date = pd.Timestamp(df["date"].max())
-
-        if last_date < target_date:
-            new_rows = []
-            curr_date = last_date
-
-            last_val = float(df.iloc[-1]["macro_factor"])
-
-            # 設定回歸目標
-            target_mean = 1.0
-            decay_rate = 0.1
+PROJECTION_PATHS = 5000  # 蒙地卡羅路徑數
+PATH_CHUNK = 100  # 乖離率每批計算的路徑數 (rolling_sum 的暫存陣列隨路徑數放大)
+PROJECTION_SEED = 42
+PERCENTILES = (5, 25, 50, 75, 95)
 
-            while curr_date < target_date:
-                curr_date += relativedelta(months=1)
-                if curr_date > target_date:
-                    break
 
-                next_val = last_val + (target_mean - last_val) * decay_rate
+# =========================================================
+#  推算引擎
+# =========================================================
 
-                # 加入微小雜訊(暫時拔除 提高準確性)
-                # noise = np.random.normal(0, 0.005)
-                # next_val += noise
 
-                mock_row = df.iloc[-1].copy()
-                mock_row["date"] = curr_date
-                mock_row["macro_factor"] = next_val
+def projection_dates(last_date, target_date, step):
+    """
+    從 last_date 每次推進 step，直到不超過 target_date 的所有日期 (不含 last_date)。
+    """
+    return pd.date_range(pd.Timestamp(last_date), pd.Timestamp(target_date), freq=step)[1:]
 
-                new_rows.append(mock_row)
-                last_val = next_val
 
-            if new_rows:
-                df_mock = pd.DataFrame(new_rows)
-                df = pd.concat([df, df_mock], ignore_index=True)
-                df.to_csv(path_macro, index=False)
-                logging.info("    Macro Factor: 已依照均值回歸邏輯推算 (Target: 1.0)")
+def mean_reversion_path(start, target, rate, steps):
+    """
+    x_k = target + (start - target) * (1 - rate) ** k，k = 1..steps
+    (即逐期 x += (target - x) * rate 的封閉解)。
+    """
+    k = np.arange(1, steps + 1)
+    return target + (start - target) * (1 - rate) ** k
 
-    # ---------------------------------------------------------
-    #  Market Returns (market_return.csv)
-    # ---------------------------------------------------------
-    if os.path.exists(path_market):
-        df = pd.read_csv(path_market, parse_dates=["date"])
 
-        # 強制轉型
-        last_date = pd.Timestamp(df["date"].max())
+def growth_path(start, growth, steps):
+    """
+    無雜訊的長期成長路徑：start * (1 + growth) ** k。
+    """
+    return start * (1 + growth) ** np.arange(1, steps + 1)
 
-        if last_date < target_date:
-            if "Close" not in df.columns:
-                logging.error(" 錯誤: market_return.csv 缺少 Close 欄位")
-            else:
-                long_term_growth = 0.0058
 
-                new_rows = []
-                curr_date = last_date
+def simulate_paths(
+    close_history,
+    steps,
+    n_paths=PROJECTION_PATHS,
+    seed=PROJECTION_SEED,
+    frequency=None,
+    base_return=BASE_RETURN,
+    sensitivity=SENSITIVITY,
+):
+    """
+    以固定種子一次模擬 n_paths 條路徑，回傳 {"Close", "expected_return"} 兩個 (steps, n_paths) 陣列。
+    每期報酬 ~ N(長期成長, 波動度)；預期回報由模擬價格接在歷史收盤價之後，
+    以 market_return_calc 同一組乖離率公式推得。
+    """
+    freq = get_frequency(frequency)
+    scale = 12 / freq.periods_per_year
+    rng = np.random.default_rng(seed)
+
+    # 報酬矩陣原地轉為價格，避免多留一份 (steps, n_paths) 暫存
+    close = rng.normal(MONTHLY_GROWTH * scale, MONTHLY_VOLATILITY * scale**0.5, (steps, n_paths))
+    close += 1
+    np.cumprod(close, axis=0, out=close)
+    close *= float(close_history[-1])
+
+    window = freq.periods(24)
+    history = np.asarray(close_history, dtype=float)[-(window - 1) :]
+    # 各路徑的滾動視窗互不相干，分批計算結果逐位元相同，但峰值記憶體只隨 PATH_CHUNK 成長
+    expected = np.empty_like(close)
+    for start in range(0, n_paths, PATH_CHUNK):
+        block = close[:, start : start + PATH_CHUNK]
+        prices = np.vstack([np.repeat(history[:, None], block.shape[1], axis=1), block])
+        bias = calc_bias(prices, window)[len(history) :]
+        expected[:, start : start + PATH_CHUNK] = np.where(
+            np.isnan(bias), base_return, base_return - bias * sensitivity
+        )
+
+    return {"Close": close, "expected_return": expected}
+
+
+def percentile_bands(paths, dates, percentiles=PERCENTILES):
+    """
+    路徑陣列 -> 每個日期的分位數 (欄位如 Close_p5、expected_return_p50)。
+    paths 的陣列會被原地部分排序 (省下一份整個陣列的複本)，呼叫後不可再使用。
+    """
+    bands = pd.DataFrame({"date": dates})
+    for name, values in paths.items():
+        quantiles = np.percentile(values, percentiles, axis=1, overwrite_input=True)
+        for q, band in zip(percentiles, quantiles):
+            bands[f"{name}_p{q}"] = band
+    return bands
 
-                # 強制轉型為 float
-                last_price = float(df.iloc[-1]["Close"])
-                last_exp_ret = float(df.iloc[-1]["expected_return"])
 
-                target_exp_ret = 0.05
+def read_with_overlay(path, overlay_path, columns=None):
+    """
+    原始數據 + 推算疊加層 (只取原始數據最後日期之後的列)；疊加層不存在時只回傳原始數據。
+    """
+    df = storage.read_frame(path, columns)
+    if overlay_path is None or not storage.exists(overlay_path):
+        return df
 
-                while curr_date < target_date:
-                    curr_date += relativedelta(months=1)
-                    if curr_date > target_date:
-                        break
+    overlay = storage.read_frame(overlay_path, columns)
+    overlay = overlay[overlay["date"] > df["date"].max()]
+    if overlay.empty:
+        return df
+    return pd.concat([df, overlay], ignore_index=True)
 
-                    monthly_change = long_term_growth + np.random.normal(0, 0.01)
-                    new_price = last_price * (1 + monthly_change)
 
-                    new_exp_ret = last_exp_ret + (target_exp_ret - last_exp_ret) * 0.1
+# =========================================================
+#  Pipeline 流程
+# =========================================================
 
-                    mock_row = df.iloc[-1].copy()
-                    mock_row["date"] = curr_date
-                    mock_row["Close"] = new_price
-                    mock_row["expected_return"] = new_exp_ret
 
-                    # 這裡比較簡單，可以直接判斷
-                    mock_row["trend_signal"] = True
+def mock_future_data(
+    target_date_str,
+    path_macro=PathConfig.MACRO_FACTOR_CSV,
+    path_market=PathConfig.MARKET_RETURN_CSV,
+    frequency=None,
+    macro_overlay=PathConfig.MACRO_FACTOR_PROJECTION_CSV,
+    market_overlay=PathConfig.MARKET_RETURN_PROJECTION_CSV,
+    bands_path=PathConfig.PROJECTION_BANDS_CSV,
+    n_paths=PROJECTION_PATHS,
+    seed=PROJECTION_SEED,
+    base_return=BASE_RETURN,
+    sensitivity=SENSITIVITY,
+):
+    """
+    使用「均值回歸 (Mean Reversion) & 長期成長」邏輯推算到 target_date，
+    結果寫入獨立的疊加層 (原始數據不變動，讀取端以 read_with_overlay 合併)。
+    中央路徑為封閉解；n_paths > 0 時另以固定種子模擬價格 / 預期回報的分位數帶。
+    每次推進 frequency.step，回歸速度與成長率依頻率換算 (月頻即原本的每月參數)。
+    """
+    freq = get_frequency(frequency)
+    target_date: pd.Timestamp = pd.to_datetime(target_date_str)
+    reversion = freq.per_period(MONTHLY_REVERSION)
+    logging.info(
+        f" 啟動均值回歸推算：正在將數據平滑延伸至 {target_date.strftime('%Y-%m')}..."
+    )
 
-                    new_rows.append(mock_row)
-                    last_price = new_price
-                    last_exp_ret = new_exp_ret
+    # ---------------------------------------------------------
+    #  Macro Factors 疊加層
+    # ---------------------------------------------------------
+    if storage.exists(path_macro):
+        df = storage.read_frame(path_macro, ["date", "macro_factor"])
+        dates = projection_dates(df["date"].max(), target_date, freq.step)
+
+        overlay = pd.DataFrame(
+            {
+                "date": dates,
+                "macro_factor": mean_reversion_path(
+                    float(df["macro_factor"].iloc[-1]), MACRO_TARGET, reversion, len(dates)
+                ),
+            }
+        )
+        storage.write_frame(overlay, macro_overlay)
+        if len(dates):
+            logging.info(
+                f"    Macro Factor: 已依照均值回歸邏輯推算 {len(dates)} 期 (Target: {MACRO_TARGET})"
+            )
 
-                if new_rows:
-                    df_mock = pd.DataFrame(new_rows)
-                    df = pd.concat([df, df_mock], ignore_index=True)
-                    df.to_csv(path_market, index=False)
-                    logging.info(" Market Price: 已依照長期成長模型推算")
+    # ---------------------------------------------------------
+    #  Market Returns 疊加層與分位數帶
+    # ---------------------------------------------------------
+    if storage.exists(path_market):
+        df = storage.read_frame(path_market)
+        if "Close" not in df.columns:
+            logging.error(" 錯誤: market_return.csv 缺少 Close 欄位")
+            return False
+
+        dates = projection_dates(df["date"].max(), target_date, freq.step)
+        growth = MONTHLY_GROWTH * (12 / freq.periods_per_year)
+
+        overlay = pd.DataFrame(
+            {
+                "date": dates,
+                "Close": growth_path(float(df["Close"].iloc[-1]), growth, len(dates)),
+                "expected_return": mean_reversion_path(
+                    float(df["expected_return"].iloc[-1]),
+                    EXPECTED_RETURN_TARGET,
+                    reversion,
+                    len(dates),
+                ),
+                "trend_signal": True,
+            }
+        )
+        storage.write_frame(overlay, market_overlay)
+
+        bands = pd.DataFrame({"date": dates})
+        if n_paths and len(dates):
+            paths = simulate_paths(
+                df["Close"].to_numpy(float),
+                len(dates),
+                n_paths,
+                seed,
+                freq,
+                base_return,
+                sensitivity,
+            )
+            bands = percentile_bands(paths, dates)
+        storage.write_frame(bands, bands_path)
+
+        if len(dates):
+            logging.info(
+                f" Market Price: 已依照長期成長模型推算 {len(dates)} 期 ({n_paths} 條模擬路徑)"
+            )
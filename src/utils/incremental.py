@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from config.path import PathConfig
+from utils import schema, storage
+
+
+# =========================================================
+#  視窗運算 (尾段重算與整段計算逐位元相同)
+# =========================================================
+
+
+def rolling_sum(values, window, offset=0):
+    """
+    滾動加總 (視窗不足為 NaN)，values 可為一維或二維 (沿第 0 軸滾動)。
+    依「絕對位置」切成長度 window 的區塊，每個視窗 = 前一區塊的後綴和 + 本區塊的前綴和，
+    結果只取決於視窗內的數值與 offset (values[0] 的絕對位置)：只要帶上前 window - 1 列，
+    尾段重算就與整段計算相同 (pandas rolling 的累加誤差隨整段歷史累積，做不到這點)。
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    lead = offset % window
+    blocks = -(-(lead + n) // window)
+    buf = np.full((blocks * window,) + x.shape[1:], np.nan)
+    buf[lead : lead + n] = x
+
+    shaped = buf.reshape((blocks, window) + x.shape[1:])
+    prefix = np.cumsum(shaped, axis=1).reshape(buf.shape)
+    suffix = np.cumsum(shaped[:, ::-1], axis=1)[:, ::-1].reshape(buf.shape)
+
+    out = np.full(buf.shape, np.nan)
+    end = np.arange(window - 1, len(buf))
+    # 視窗終點落在區塊最後一格時，視窗恰為整個區塊
+    whole = (end % window == window - 1).reshape((-1,) + (1,) * (x.ndim - 1))
+    out[window - 1 :] = np.where(
+        whole,
+        prefix[window - 1 :],
+        suffix[: len(buf) - window + 1] + prefix[window - 1 :],
+    )
+    return out[lead : lead + n]
+
+
+def rolling_mean(values, window, offset=0):
+    """
+    滾動平均 (rolling_sum / window)；Series / DataFrame 保留索引與欄位。
+    """
+    mean = rolling_sum(values, window, offset) / window
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(mean, index=values.index, columns=values.columns)
+    if isinstance(values, pd.Series):
+        return pd.Series(mean, index=values.index, name=values.name)
+    return mean
+
+
+# =========================================================
+#  增量更新
+# =========================================================
+
+
+def _state_path(path):
+    return PathConfig.INCREMENTAL_STATE_DIR / f"{storage.resolve(path).stem}.npz"
+
+
+def _load_state(path):
+    state_path = _state_path(path)
+    if not state_path.exists():
+        return None
+    try:
+        with np.load(state_path, allow_pickle=False) as npz:
+            return json.loads(str(npz["meta"])), npz["keys"], npz["hashes"]
+    except Exception as e:
+        logging.warning(f"   [Incremental] 狀態檔損毀，改為整段重算: {e}")
+        return None
+
+
+def _save_state(path, meta, keys, hashes):
+    state_path = _state_path(path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), keys=keys, hashes=hashes)
+    os.replace(tmp_path, state_path)
+
+
+def _last_line(target, size):
+    """
+    檔案最後一列的位元組 (用來確認 CSV 前段沒有被改寫)。
+    """
+    with open(target, "rb") as f:
+        f.seek(max(0, size - 65536))
+        chunk = f.read()
+    return chunk[chunk.rstrip(b"\r\n").rfind(b"\n") + 1 :]
+
+
+def _file_meta(target):
+    size = target.stat().st_size
+    meta = {"size": size}
+    if target.suffix == storage.FORMATS["csv"]:
+        meta["last_line"] = _last_line(target, size).decode("latin-1")
+    return meta
+
+
+def _prefix_intact(target, state_meta):
+    """
+    上次寫出的內容仍原封不動地位於檔案開頭 (之後可能被其他程式附加列)。
+    """
+    if target.stat().st_size < state_meta["size"]:
+        return False
+    line = state_meta["last_line"].encode("latin-1")
+    with open(target, "rb") as f:
+        f.seek(state_meta["size"] - len(line))
+        return f.read(len(line)) == line
+
+
+def _row_end(target, end, rows_back):
+    """
+    從 end (某一列的結尾) 往回數 rows_back 列，回傳該處的位元組位置；只讀檔尾。
+    """
+    size = 4096
+    with open(target, "rb") as f:
+        while True:
+            begin = max(0, end - size)
+            f.seek(begin)
+            chunk = f.read(end - begin)
+            pos = len(chunk) - 1  # 最後一列的換行
+            for _ in range(rows_back):
+                pos = chunk.rfind(b"\n", 0, pos)
+                if pos < 0:
+                    break
+            if pos >= 0:
+                return begin + pos + 1
+            if begin == 0:
+                raise ValueError("CSV 列數少於狀態檔記錄")
+            size *= 4
+
+
+def _update(path, source, compute, state, meta, keys, hashes, lookback, shift_invariant):
+    """
+    依上次的狀態只重算變動的尾段並寫檔，回傳重算列數；無法安全增量時回傳 None。
+    """
+    state_meta, old_keys, old_hashes = state
+    if any(state_meta.get(k) != v for k, v in meta.items()):
+        return None
+
+    target = storage.resolve(path)
+    if not target.exists():
+        return None
+
+    # 開頭被捨棄的列數 (固定長度的滑動區間)
+    drop = 0
+    if len(old_keys) and len(keys) and keys[0] != old_keys[0]:
+        drop = int(np.searchsorted(old_keys, keys[0]))
+        if not shift_invariant or drop >= len(old_keys) or old_keys[drop] != keys[0]:
+            return None
+    old_hashes = old_hashes[drop:]
+
+    # 第一筆輸入變動 (或新增) 的列；之後的列連同 lookback 視窗重算
+    common = min(len(hashes), len(old_hashes))
+    changed = np.flatnonzero(hashes[:common] != old_hashes[:common])
+    first = int(changed[0]) if changed.size else common
+
+    size = target.stat().st_size
+    if drop == 0 and first == len(old_hashes) == len(source) and size == state_meta["size"]:
+        return 0
+    if drop and (first <= lookback or size != state_meta["size"]):
+        return None
+
+    start = max(0, first - lookback)
+    tail = compute(source.iloc[start:], start).iloc[first - start :]
+
+    if drop:
+        # 開頭 lookback 列失去前文需補算，中段沿用既有輸出
+        head = compute(source.iloc[:lookback], 0)
+        kept = storage.read_frame(path).iloc[drop + lookback : drop + first]
+        storage.write_frame(pd.concat([head, kept, tail], ignore_index=True), path)
+        return lookback + len(tail)
+
+    if target.suffix == storage.FORMATS["csv"]:
+        if not _prefix_intact(target, state_meta):
+            return None
+        keep = _row_end(target, state_meta["size"], len(old_hashes) - first)
+        storage.append_rows(tail, path, keep)
+    else:
+        # Parquet 無法附加，讀回前段後整檔重寫 (仍只重算尾段)
+        kept = storage.read_frame(path)
+        if len(kept) < first:
+            return None
+        storage.write_frame(pd.concat([kept.iloc[:first], tail], ignore_index=True), path)
+    return len(tail)
+
+
+def update_frame(
+    path,
+    source,
+    compute,
+    inputs,
+    lookback=0,
+    params=None,
+    key="date",
+    shift_invariant=False,
+    enabled=None,
+):
+    """
+    以 compute(frame, offset) 產生 path 的輸出並寫檔，回傳本次重算的列數。
+    compute 對 frame 的每一列回傳一列輸出 (offset 為 frame 第一列在 source 中的位置)，
+    且第 i 列只能依賴 source 第 i - lookback ~ i 列的 inputs 欄位。
+
+    enabled (預設 RuntimeConfig.INCREMENTAL) 時為增量模式：以狀態檔 (每列輸入的雜湊)
+    比對上次的輸入，只重算第一筆變動 (或新增) 之後的列 (往前帶 lookback 列作為視窗)，
+    CSV 截斷到未變動的前段後附加，不重寫整個檔案；輸出與整段重算相同。
+    首次執行、參數 / 格式改變或檔案被改寫時自動退回整段重算。shift_invariant=True 表示結果與絕對位置無關
+    (例如 pct_change)，開頭的列被捨棄時只需補算開頭 lookback 列。
+    關閉時整段重算，但仍記錄狀態，下次可接著增量。
+    """
+    if enabled is None:
+        from config.runtime import RuntimeConfig
+
+        enabled = RuntimeConfig.INCREMENTAL
+
+    keys = source[key].to_numpy().astype("datetime64[ns]").view("int64")
+    hashes = pd.util.hash_pandas_object(source[list(inputs)], index=False).to_numpy()
+    meta = {
+        "format": PathConfig.STORAGE_FORMAT,
+        "schema": schema.SCHEMA_VERSION,
+        "inputs": list(inputs),
+        "lookback": lookback,
+        "params": json.loads(json.dumps(params)),
+    }
+
+    rows = None
+    state = _load_state(path) if enabled else None
+    if state is not None:
+        rows = _update(path, source, compute, state, meta, keys, hashes, lookback, shift_invariant)
+    if rows is None:
+        storage.write_frame(compute(source, 0), path)
+        rows = len(source)
+    else:
+        logging.info(
+            f"   [Incremental] {storage.resolve(path).name}: 重算 {rows} / {len(source)} 列"
+        )
+
+    _save_state(path, {**meta, **_file_meta(storage.resolve(path))}, keys, hashes)
+    return rows
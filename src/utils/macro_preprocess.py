@@ -1,6 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
 import pandas as pd
 
 from config.path import PathConfig
+from utils import storage
+from utils.vintage import load_vintages
+
+# 宏觀面板的目標日曆 (週期起日)：季頻即 GDP 的發布節奏
+MACRO_CALENDAR = "QS"
+
+# 原始序列 -> 週期內的彙總方式 (first / last / mean)。
+# 標籤為週期起日，取期初值與原本「同一天對齊」的數值一致，也不會用到週期內之後才有的觀測；
+# 日資料 (殖利率) 取週期內第一個交易日，遇到假日不再整列消失。
+ALIGNMENT_RULES = {
+    "m2": "first",  # 月
+    "gdp": "first",  # 季
+    "yield_10y": "first",  # 日
+    "yield_2y": "first",  # 日
+}
+AGGREGATIONS = ("first", "last", "mean")
+
+# 以日期 (一年前的同一個週期) 計算年增率的欄位
+YOY_COLUMNS = ("m2", "gdp")
+
+# 原始序列的預設來源 (欄位 -> 路徑)
+SOURCE_PATHS = {
+    "m2": PathConfig.M2_CSV,
+    "gdp": PathConfig.GDP_CSV,
+    "yield_10y": PathConfig.YIELD_10Y_CSV,
+    "yield_2y": PathConfig.YIELD_2Y_CSV,
+}
+
+
+# =========================================================
+#  單一序列對齊 (含快取)
+# =========================================================
+
+
+def read_series(path, column):
+    """
+    讀取單一原始序列 (只載入 date 與 column)。
+    """
+    df = pd.read_csv(
+        path,
+        usecols=["date", column],
+        index_col="date",
+        parse_dates=["date"],
+        na_values=".",
+        float_precision="round_trip",
+    )
+    return df[column]
+
+
+def align(values, calendar=MACRO_CALENDAR, how="first"):
+    """
+    一次 resample 到目標日曆。values 可為單一序列，或每欄一個 as-of 版本的 DataFrame
+    (VintageStore.matrix，各欄獨立對齊)。
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError(f"不支援的彙總方式: {how} (可用: {list(AGGREGATIONS)})")
+    aligned = values.resample(calendar).agg(how)
+    # 序列中途開始的第一個週期不完整 (期初值其實是之後的觀測)，捨棄
+    if isinstance(values, pd.Series):
+        return aligned[aligned.index >= values.index.min()]
+    valid = values.notna().to_numpy()
+    starts = values.index.to_numpy()[valid.argmax(axis=0)]
+    return aligned.where(aligned.index.to_numpy()[:, None] >= starts[None, :])
+
+
+def align_series(path, column, calendar=MACRO_CALENDAR, how="first"):
+    """
+    讀取單一原始序列並對齊到目標日曆。
+    """
+    return align(read_series(path, column), calendar, how)
+
+
+def _cache_meta(path, calendar, how):
+    # 以內容雜湊判斷原始檔是否變動：重新下載但內容相同 (只更新修改時間) 時仍命中快取
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return {
+        "source": os.path.abspath(path),
+        "sha256": digest.hexdigest(),
+        "calendar": calendar,
+        "how": how,
+    }
+
+
+def load_aligned(path, column, calendar=MACRO_CALENDAR, how="first", cache_dir=None):
+    """
+    align_series 加上磁碟快取：原始檔內容 (SHA-256) 與對齊規則不變時直接讀回對齊後的序列，
+    不再解析原始檔；cache_dir=None 時每次重新對齊。
+    """
+    if cache_dir is None:
+        return align_series(path, column, calendar, how)
+
+    meta = _cache_meta(path, calendar, how)
+    data_path = os.path.join(cache_dir, f"{column}.csv")
+    meta_path = os.path.join(cache_dir, f"{column}.json")
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            if json.load(f) == meta:
+                # 快取由對齊結果寫出，日期已是完整的目標日曆，不再 asfreq (小檔時佔讀取時間的一半)
+                cached = pd.read_csv(
+                    data_path,
+                    index_col="date",
+                    parse_dates=["date"],
+                    date_format="ISO8601",
+                    float_precision="round_trip",
+                )
+                return cached[column]
+
+    series = align_series(path, column, calendar, how)
+    os.makedirs(cache_dir, exist_ok=True)
+    series.to_frame().to_csv(data_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return series
+
+
+# =========================================================
+#  面板
+# =========================================================
+
+
+def calc_yoy(series):
+    """
+    以日期計算年增率：本期 / 一年前同一天的值 - 1 (不依列數位移，任何日曆皆適用)。
+    """
+    prior = series.reindex(series.index - pd.DateOffset(years=1))
+    return series / prior.to_numpy() - 1
+
+
+def build_panel(columns):
+    """
+    {欄位: 對齊後的序列} -> 面板：較低頻的序列在自身的觀測範圍內延續上一個值，
+    並裁切到所有序列皆已開始、且尚未結束的區間 (與原本的 inner merge 涵蓋範圍相同)。
+    """
+    panel = pd.concat(columns, axis=1).ffill(limit_area="inside")
+    start = max(s.first_valid_index() for s in columns.values())
+    end = min(s.last_valid_index() for s in columns.values())
+
+    for column in YOY_COLUMNS:
+        if column in panel.columns:
+            panel[f"{column}_yoy"] = calc_yoy(panel[column])
+    return panel.loc[start:end]
+
+
+def add_spreads(df):
+    df["excess_liquidity"] = df["m2_yoy"] - df["gdp_yoy"]
+    df["yield_spread"] = df["yield_10y"] - df["yield_2y"]
+    return df
 
 
 def load_macro_data(
@@ -8,23 +164,112 @@ def load_macro_data(
     gdp_csv="data/raw/fred/gdp.csv",
     yield_10y_csv="data/raw/fred/yield_10y.csv",
     yield_2y_csv="data/raw/fred/yield_2y.csv",
+    output_path=PathConfig.MACRO_CSV,
+    calendar=MACRO_CALENDAR,
+    rules=None,
+    cache_dir=PathConfig.ALIGNED_CACHE_DIR,
+    as_of=None,
+    vintage_dir=PathConfig.VINTAGE_DIR,
 ):
-    m2 = pd.read_csv(m2_csv)
-    gdp = pd.read_csv(gdp_csv)
-    y10 = pd.read_csv(yield_10y_csv)
-    y2 = pd.read_csv(yield_2y_csv)
+    """
+    月 M2、季 GDP 與日殖利率依 rules (預設 ALIGNMENT_RULES) 對齊到 calendar，
+    以日期計算年增率後輸出超額流動性與利差。
+    as_of 指定日期時只用當天已發布的數值 (utils/vintage.py，不使用對齊快取)；
+    output_path=None 時不寫檔。
+    """
+    rules = {**ALIGNMENT_RULES, **(rules or {})}
+    paths = {"m2": m2_csv, "gdp": gdp_csv, "yield_10y": yield_10y_csv, "yield_2y": yield_2y_csv}
+
+    if as_of is None:
+        columns = {
+            column: load_aligned(path, column, calendar, rules[column], cache_dir)
+            for column, path in paths.items()
+        }
+    else:
+        columns = {
+            column: align(load_vintages(column, path, vintage_dir).snapshot(as_of), calendar, rules[column])
+            for column, path in paths.items()
+        }
+    df = add_spreads(build_panel(columns))
+
+    df = df.rename_axis("date").reset_index()
+    logging.info(
+        f"   [Macro] 對齊到 {calendar}{f' (as of {as_of})' if as_of is not None else ''}: {len(df)} 期 "
+        f"({df['date'].min():%Y-%m-%d} ~ {df['date'].max():%Y-%m-%d})"
+    )
+    if output_path is not None:
+        storage.write_frame(df, output_path)
+    return df
 
-    df = m2.merge(gdp, on="date", how="inner")
-    df = df.merge(y10, on="date", how="inner")
-    df = df.merge(y2, on="date", how="inner")
 
-    df["m2_yoy"] = df["m2"].pct_change(12)
-    df["gdp_yoy"] = df["gdp"].pct_change(4)  # GDP usually quarterly
+# =========================================================
+#  Point-in-time 歷史
+# =========================================================
 
-    df["excess_liquidity"] = df["m2_yoy"] - df["gdp_yoy"]
-    df["yield_spread"] = df["yield_10y"] - df["yield_2y"]
 
-    df.to_csv("data/processed/macro.csv", index=False)
+def _latest_rows(columns, dates):
+    """
+    {欄位: 對齊後的 as-of 矩陣 (週期 x dates)} -> 每個 date 當時面板的最後一列。
+    與 build_panel 相同：延續低頻序列、以日期算年增率、裁切到所有序列皆有值的區間。
+    """
+    index = columns[next(iter(columns))].index
+    for matrix in columns.values():
+        index = index.union(matrix.index)
+    panels = {c: m.reindex(index).ffill(limit_area="inside") for c, m in columns.items()}
+    for column in YOY_COLUMNS:
+        if column in panels:
+            panels[f"{column}_yoy"] = calc_yoy(panels[column])
+
+    # 各 date 的面板區間：所有序列皆已開始 (first) 且尚未結束 (last)
+    n = len(index)
+    first = np.zeros(len(dates), dtype=np.int64)
+    last = np.full(len(dates), n - 1, dtype=np.int64)
+    for column in columns:
+        valid = panels[column].notna().to_numpy()
+        first = np.maximum(first, np.where(valid.any(axis=0), valid.argmax(axis=0), n))
+        last = np.minimum(last, n - 1 - valid[::-1].argmax(axis=0))
+    ok = first <= last
+    pos = last[ok]
+    take = np.flatnonzero(ok)
+
+    rows = pd.DataFrame({"date": dates[ok], "period": index[pos]})
+    for column, panel in panels.items():
+        rows[column] = panel.to_numpy()[pos, take]
+    return rows
+
+
+def point_in_time_panel(
+    dates=None,
+    paths=None,
+    calendar=MACRO_CALENDAR,
+    rules=None,
+    vintage_dir=PathConfig.VINTAGE_DIR,
+    chunk=64,
+):
+    """
+    每個 date 以當天已發布的數值重建宏觀面板，取其最新一期 -> (date, period, 各欄位)；
+    與 load_macro_data(as_of=date) 的最後一列相同。dates 預設為資料起點至今的每月月初。
+    各序列的版本庫只讀一次，as-of 查詢以 chunk 個日期為一批向量化。
+    """
+    rules = {**ALIGNMENT_RULES, **(rules or {})}
+    paths = {**SOURCE_PATHS, **(paths or {})}
+    stores = {column: load_vintages(column, path, vintage_dir) for column, path in paths.items()}
+
+    if dates is None:
+        start = max(store.periods[0] for store in stores.values())
+        dates = pd.date_range(start, pd.Timestamp.today().normalize(), freq="MS")
+    dates = pd.DatetimeIndex(dates).sort_values()
+
+    blocks = []
+    for i in range(0, len(dates), chunk):
+        block = dates[i : i + chunk]
+        columns = {
+            column: align(store.matrix(block, end=block.max()), calendar, rules[column])
+            for column, store in stores.items()
+        }
+        blocks.append(_latest_rows(columns, block))
+    df = add_spreads(pd.concat(blocks, ignore_index=True))
+    logging.info(f"   [Macro] Point-in-time 面板: {len(df)} 個日期 (對齊到 {calendar})")
     return df
 
 
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from config.path import PathConfig
+from config.runtime import RuntimeConfig
+from utils import telemetry
+
+# 同一檔標的同時只允許一個執行緒同步 (market / breadth 可能併發讀取 ^GSPC)
+_LOCKS = defaultdict(threading.Lock)
+
+# 快取在此時間內同步過就不再連網
+REFRESH_MINUTES = 15
+
+# 重疊的已完成 K 棒收盤價差異超過此比例時，視為除權息回溯調整，重抓完整歷史
+ADJUST_TOLERANCE = 1e-6
+
+# 管線 (market / breadth) 使用的日線快取
+PIPELINE_TICKERS = ("^GSPC", "RSP")
+
+# sync_many 每次 yfinance 請求的標的數
+BATCH_SIZE = 100
+
+
+def _cache_paths(ticker, cache_dir):
+    name = ticker.replace("^", "_").replace("/", "_")
+    return (
+        os.path.join(cache_dir, f"{name}_1d.csv"),
+        os.path.join(cache_dir, f"{name}_1d.json"),
+    )
+
+
+def cache_file(ticker, cache_dir=PathConfig.PRICE_CACHE_DIR):
+    """
+    標的的日線快取檔路徑 (管線步驟以此作為輸入，快取有新 K 棒時下游才重算)。
+    """
+    return _cache_paths(ticker, cache_dir)[0]
+
+
+def _download(ticker, **kwargs):
+    """
+    以 yfinance 下載日線，整理成單一 Close 欄位、date 索引。
+    """
+    import yfinance as yf
+
+    raw = yf.download(ticker, interval="1d", progress=False, **kwargs)
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=["Close"], index=pd.DatetimeIndex([], name="date"))
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        raw.columns = raw.columns.get_level_values(0)
+    if "Close" not in raw.columns and "Adj Close" in raw.columns:
+        raw = raw.rename(columns={"Adj Close": "Close"})
+
+    df = raw[["Close"]].dropna()
+    df.index = pd.to_datetime(df.index).tz_localize(None)
+    df.index.name = "date"
+    return df
+
+
+def _download_many(tickers, threads=True, **kwargs):
+    """
+    單一請求下載多檔日線 -> {ticker: Close 欄位、date 索引}；沒有資料的標的不列出。
+    """
+    import yfinance as yf
+
+    raw = yf.download(
+        list(tickers), interval="1d", progress=False, group_by="column", threads=threads, **kwargs
+    )
+    if raw is None or raw.empty:
+        return {}
+
+    field = "Close" if "Close" in raw.columns.get_level_values(0) else "Adj Close"
+    close = raw[field]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+    close.index = pd.to_datetime(close.index).tz_localize(None)
+    close.index.name = "date"
+    return {
+        ticker: close[[ticker]].rename(columns={ticker: "Close"}).dropna()
+        for ticker in close.columns
+        if close[ticker].notna().any()
+    }
+
+
+def _read_cache(data_path, meta_path):
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, {}
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    df = pd.read_csv(
+        data_path, parse_dates=["date"], index_col="date", float_precision="round_trip"
+    )
+    telemetry.record_io("read", len(df), os.path.getsize(data_path))
+    return df, meta
+
+
+def _write_cache(df, data_path, meta_path, write_data=True):
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    if write_data:
+        df.to_csv(data_path)
+        telemetry.record_io("write", len(df), os.path.getsize(data_path))
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": datetime.now().isoformat(timespec="seconds")}, f)
+
+
+def _anchor(cached):
+    """
+    增量下載的起點：最後一根可能是盤中未收盤的 K 棒 (暫定值)，從前一根已完成的 K 棒開始重抓。
+    """
+    return cached.index[-2] if len(cached) > 1 else cached.index[-1]
+
+
+def _merge(cached, new):
+    """
+    快取接上新下載的日線 (重疊的部分以新資料為準，暫定的最後一根一併更新)；
+    已完成的起點那一根被回溯調整時回傳 None (需重抓完整歷史)。
+    """
+    anchor = _anchor(cached)
+    overlap = new["Close"].get(anchor)
+    if overlap is not None and abs(overlap / cached["Close"].loc[anchor] - 1) > ADJUST_TOLERANCE:
+        return None
+    return pd.concat([cached[cached.index < new.index[0]], new])
+
+
+def _is_fresh(meta):
+    if not meta.get("fetched_at"):
+        return False
+    age = datetime.now() - datetime.fromisoformat(meta["fetched_at"])
+    return age < timedelta(minutes=REFRESH_MINUTES)
+
+
+def sync_daily(ticker, offline=None, cache_dir=PathConfig.PRICE_CACHE_DIR):
+    """
+    同步單一標的的日線快取並回傳 (date 索引、Close 欄位)。
+    已有快取時只下載最後一根之後的區間；offline 時完全不連網。
+    """
+    offline = RuntimeConfig.OFFLINE if offline is None else offline
+    data_path, meta_path = _cache_paths(ticker, cache_dir)
+
+    with _LOCKS[ticker]:
+        cached, meta = _read_cache(data_path, meta_path)
+
+        if offline:
+            if cached is None:
+                raise FileNotFoundError(f"離線模式下找不到 {ticker} 的快取: {data_path}")
+            return cached
+
+        if cached is not None and _is_fresh(meta):
+            return cached
+
+        if cached is None or cached.empty:
+            logging.info(f"   [Price] {ticker}: 下載完整日線歷史...")
+            df = _download(ticker, period="max")
+            if df.empty:
+                raise ValueError(f"{ticker} 下載到的資料為空")
+            _write_cache(df, data_path, meta_path)
+            return df
+
+        # 從前一根已完成的 K 棒重抓，可同時確認是否發生回溯調整
+        start = _anchor(cached)
+        logging.info(f"   [Price] {ticker}: 增量同步 {start:%Y-%m-%d} 之後的日線...")
+        new = _download(ticker, start=start.strftime("%Y-%m-%d"))
+        if new.empty:
+            _write_cache(cached, data_path, meta_path, write_data=False)
+            return cached
+
+        df = _merge(cached, new)
+        if df is None:
+            logging.info(f"   [Price] {ticker}: 偵測到回溯調整，重新下載完整歷史")
+            df = _download(ticker, period="max")
+
+        _write_cache(df, data_path, meta_path, write_data=not df.equals(cached))
+        return df
+
+
+def sync_many(
+    tickers,
+    offline=None,
+    cache_dir=PathConfig.PRICE_CACHE_DIR,
+    batch_size=BATCH_SIZE,
+    max_workers=8,
+):
+    """
+    多檔標的 (例如指數成分股) 的 sync_daily：快取以執行緒併發讀寫，需要更新的標的
+    每 batch_size 檔合併成一次 yfinance 請求 (請求內由 yfinance 併發下載)。
+    已有快取的標的依增量起點 (前一根已完成的 K 棒) 分組，同一起點的標的合併請求，
+    停牌 / 下市的標的不會把整批拉回舊日期；沒有快取或偵測到回溯調整的標的整批抓完整歷史。
+    回傳 {ticker: Close 欄位、date 索引}；沒有快取也下載不到的標的記錄後略過。
+    """
+    offline = RuntimeConfig.OFFLINE if offline is None else offline
+    tickers = list(dict.fromkeys(tickers))
+    paths = {ticker: _cache_paths(ticker, cache_dir) for ticker in tickers}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        cached = dict(zip(tickers, pool.map(lambda t: _read_cache(*paths[t]), tickers)))
+
+    result, full, stale = {}, [], []
+    for ticker, (df, meta) in cached.items():
+        if df is not None and not df.empty and (offline or _is_fresh(meta)):
+            result[ticker] = df
+        elif offline:
+            logging.warning(f"   [Price] 離線模式下找不到 {ticker} 的快取，略過")
+        elif df is None or df.empty:
+            full.append(ticker)
+        else:
+            stale.append(ticker)
+
+    # 以 (資料, 是否改寫 CSV) 記錄待寫入的快取，最後併發寫出。
+    # yf.download 把結果放在模組層級的共用狀態，批次之間依序請求，併發交給請求內的 threads
+    writes = {}
+    groups = defaultdict(list)
+    for ticker in stale:
+        groups[_anchor(cached[ticker][0])].append(ticker)
+    batches = [
+        (start, group[i : i + batch_size])
+        for start, group in sorted(groups.items())
+        for i in range(0, len(group), batch_size)
+    ]
+    for start, batch in batches:
+        logging.info(f"   [Price] 增量同步 {len(batch)} 檔 ({start:%Y-%m-%d} 之後)...")
+        new = _download_many(batch, threads=max_workers, start=start.strftime("%Y-%m-%d"))
+        for ticker in batch:
+            old = cached[ticker][0]
+            if ticker not in new:
+                result[ticker] = old
+                writes[ticker] = (old, False)
+                continue
+            df = _merge(old, new[ticker])
+            if df is None:
+                full.append(ticker)
+                continue
+            result[ticker] = df
+            writes[ticker] = (df, not df.equals(old))
+
+    for i in range(0, len(full), batch_size):
+        batch = full[i : i + batch_size]
+        logging.info(f"   [Price] 下載 {len(batch)} 檔的完整日線歷史...")
+        new = _download_many(batch, threads=max_workers, period="max")
+        for ticker in batch:
+            if ticker in new:
+                result[ticker] = new[ticker]
+                writes[ticker] = (new[ticker], True)
+            elif cached[ticker][0] is not None and not cached[ticker][0].empty:
+                result[ticker] = cached[ticker][0]
+            else:
+                logging.warning(f"   [Price] {ticker} 下載到的資料為空，略過")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(
+            pool.map(
+                lambda t: _write_cache(writes[t][0], *paths[t], write_data=writes[t][1]), writes
+            )
+        )
+    return {ticker: result[ticker] for ticker in tickers if ticker in result}
+
+
+def load_prices(
+    ticker, interval="1d", start=None, offline=None, cache_dir=PathConfig.PRICE_CACHE_DIR
+):
+    """
+    依 (標的, 週期) 讀取價格：日線直接取自快取，月線由日線聚合 (月初標記、月底收盤)，
+    不再另外下載月線。start 可為日期或 pd.DateOffset (自今日往前回推，等同 period="5y")。
+    """
+    daily = sync_daily(ticker, offline=offline, cache_dir=cache_dir)
+
+    if interval == "1d":
+        bars = daily
+    elif interval == "1mo":
+        bars = daily.resample("MS").last().dropna()
+    else:
+        raise ValueError(f"不支援的週期: {interval}")
+
+    if isinstance(start, pd.DateOffset):
+        start = pd.Timestamp.now().normalize() - start
+    if start is not None:
+        bars = bars[bars.index >= pd.Timestamp(start)]
+    return bars.copy()
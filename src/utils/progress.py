@@ -0,0 +1,20 @@
+import time
+
+from tqdm import tqdm
+
+from config.runtime import RuntimeConfig
+
+
+def progress(**kwargs):
+    """
+    建立 tqdm 進度條；無頭模式下停用 (不輸出任何內容)。
+    """
+    return tqdm(disable=RuntimeConfig.HEADLESS, **kwargs)
+
+
+def pause(seconds):
+    """
+    展示用的停頓 (讓進度條看得清楚)；無頭模式下直接略過。
+    """
+    if not RuntimeConfig.HEADLESS:
+        time.sleep(seconds)
@@ -0,0 +1,147 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config.runtime import RuntimeConfig
+
+DEFAULT_DPI = 100
+FORMATS = ("png", "svg")
+
+# =========================================================
+#  降採樣 (M4)：每個像素欄只保留首、尾、最小、最大四點，
+#  線條外觀與完整序列相同，點數與資料長度無關
+# =========================================================
+
+
+def _first_hits(values, targets, segment):
+    # 各段第一個等於目標值的位置 (段內 argmin / argmax)
+    hits = np.flatnonzero(values == targets[segment])
+    return hits[np.unique(segment[hits], return_index=True)[1]]
+
+
+def decimate(x, y, width):
+    """
+    依 x 的數值 (日期亦可) 把序列切成 width 個像素欄，每欄保留首、尾、最小、最大值所在的點；
+    x 需遞增。點數不超過 4 * width 時原樣回傳。NaN 不影響極值，全為 NaN 的欄保留首尾。
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    width = int(width)
+    if width <= 0 or n <= 4 * width:
+        return x, y
+
+    if np.issubdtype(x.dtype, np.datetime64):
+        xv = x.view(np.int64)  # 以自身時間單位的整數計算，不換算單位以免溢位
+    else:
+        xv = x.astype(float)
+    span = float(xv[-1] - xv[0]) or 1.0
+    column = np.minimum(((xv - xv[0]).astype(float) * (width / span)).astype(np.int64), width - 1)
+
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    segment = np.repeat(np.arange(len(starts)), ends - starts + 1)
+
+    nan = np.isnan(y)
+    low = np.where(nan, np.inf, y)
+    high = np.where(nan, -np.inf, y)
+    argmin = _first_hits(low, np.minimum.reduceat(low, starts), segment)
+    argmax = _first_hits(high, np.maximum.reduceat(high, starts), segment)
+
+    keep = np.unique(np.concatenate([starts, ends, argmin, argmax]))
+    return x[keep], y[keep]
+
+
+def pixel_width(fig):
+    """
+    圖表的水平像素數 (降採樣的欄數)。
+    """
+    return int(fig.get_figwidth() * fig.dpi)
+
+
+# =========================================================
+#  背景渲染
+# =========================================================
+
+_LOCK = threading.Lock()
+_POOL = None
+_PENDING = []
+
+
+def _render(plot, path, args, figsize, dpi, formats):
+    """
+    子行程入口：不經 pyplot 直接建立 Figure (不需任何 GUI 後端)，依副檔名各存一份。
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    plot(fig, *args)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    for fmt in formats:
+        out = path.with_suffix(f".{fmt}")
+        fig.savefig(out, format=fmt)
+        outputs.append(str(out))
+    return outputs
+
+
+def _pool():
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            # spawn：管線步驟在執行緒中呼叫，fork 多執行緒行程並不安全
+            _POOL = ProcessPoolExecutor(
+                max_workers=RuntimeConfig.RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _POOL
+
+
+def submit(plot, path, *args, figsize=(12, 6), dpi=DEFAULT_DPI, formats=FORMATS):
+    """
+    交給背景行程渲染：plot(fig, *args) 畫在空白 Figure 上，存成 path 的各格式 (預設 PNG + SVG)。
+    plot 須為模組層級函式 (可 pickle)。立即回傳 Future，呼叫端不等待；
+    RuntimeConfig.RENDER_WORKERS = 0 時在目前行程同步渲染。
+    """
+    if RuntimeConfig.RENDER_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(_render(plot, path, args, figsize, dpi, formats))
+        except Exception as e:
+            future.set_exception(e)
+    else:
+        future = _pool().submit(_render, plot, path, args, figsize, dpi, formats)
+    with _LOCK:
+        _PENDING.append((str(path), future))
+    return future
+
+
+def wait():
+    """
+    等待所有已送出的圖表完成並關閉行程池，回傳成功輸出的檔案清單；失敗只記錄錯誤。
+    """
+    global _POOL
+    with _LOCK:
+        pending = _PENDING[:]
+        _PENDING.clear()
+
+    outputs = []
+    for path, future in pending:
+        try:
+            files = future.result()
+        except Exception as e:
+            logging.error(f" 圖表渲染失敗 ({path}): {e}")
+            continue
+        outputs.extend(files)
+        logging.info(f"   [Render] 圖表已儲存至 {', '.join(files)}")
+
+    with _LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown()
+    return outputs
@@ -0,0 +1,225 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+# 欄位型別的版本：定義變動時遞增 (增量狀態記錄此值，不同版本的輸出不會被接續附加)
+SCHEMA_VERSION = 1
+
+MISSING = -1  # 分類欄位缺值的代碼
+DATE_DTYPE = "datetime64[ns]"
+
+
+@dataclass(frozen=True)
+class Category:
+    """
+    固定標籤的分類欄位：記憶體中為 int8 代碼 (標籤在 labels 中的位置，缺值為 MISSING)，
+    比較時只比代碼；寫檔時才轉回標籤文字 (Parquet 存成字典編碼)。
+    """
+
+    name: str
+    labels: tuple
+
+    @cached_property
+    def dtype(self):
+        # 每次讀寫都會比對 dtype，建立 CategoricalDtype 的成本 (小檔時) 不可忽略，只建一次
+        import pandas as pd
+
+        return pd.CategoricalDtype(list(self.labels))
+
+    def code(self, label):
+        """
+        單一標籤 -> 代碼；未知標籤或缺值為 MISSING (非字串標籤亦接受其文字，例如 "True")。
+        """
+        for i, known in enumerate(self.labels):
+            if label == known or label == str(known):
+                return i
+        return MISSING
+
+    def encode(self, values):
+        """
+        標籤陣列 / pandas Categorical / 既有的 int8 代碼 -> int8 代碼陣列 (形狀不變)。
+        """
+        values = getattr(values, "cat", values)
+        if hasattr(values, "categories") and hasattr(values, "codes"):
+            codes = np.asarray(values.codes)
+            if tuple(values.categories) == self.labels:
+                return codes.astype(np.int8, copy=False)
+            table = np.array([self.code(c) for c in values.categories] + [MISSING], dtype=np.int8)
+            return table[codes]
+
+        values = np.asarray(values)
+        if values.dtype == np.int8:
+            return values
+        codes = np.full(values.shape, MISSING, dtype=np.int8)
+        for i, label in enumerate(self.labels):
+            codes[values == label] = i
+            if values.dtype == object and not isinstance(label, str):
+                # CSV 讀回的文字 (含缺值時整欄為 object)
+                codes[values == str(label)] = i
+        return codes
+
+    def decode(self, codes):
+        """
+        代碼 -> 標籤陣列 (object，缺值為 NaN)。
+        """
+        table = np.array([*self.labels, np.nan], dtype=object)
+        return table[np.asarray(codes)]
+
+    def categorical(self, values):
+        """
+        任意表示 (標籤 / 代碼) -> pandas Categorical (一維)。
+        """
+        import pandas as pd
+
+        return pd.Categorical.from_codes(self.encode(values), dtype=self.dtype)
+
+
+# =========================================================
+#  欄位定義 (所有階段共用，依欄位名稱套用)
+# =========================================================
+
+SIGNAL = Category("signal", ("BEAR", "NEUTRAL", "BULL"))
+BREADTH = Category("breadth_signal", ("WEAK", "FRAGILE", "HEALTHY"))
+TREND = Category("trend_signal", (False, True))
+CATEGORIES = {c.name: c for c in (SIGNAL, BREADTH, TREND)}
+
+# 標籤不固定的分類欄位 (多標的面板的代號)
+OPEN_CATEGORIES = ("ticker",)
+
+# 其餘數值欄位維持 float64：價格、報酬與門檻判斷用到的值須與增量重算逐位元相同；
+# 只供顯示、下游不再運算的衍生欄位存成 float32
+FLOAT32_COLUMNS = ("cap_ret_1m", "equal_ret_1m", "final_return", "pct_above_50dma", "pct_above_200dma")
+
+# 各階段輸出 (以檔名為鍵) 的欄位與順序；寫檔時檢查欄位齊全，多出的欄位接在後面
+FRAMES = {
+    "macro": (
+        "date",
+        "m2",
+        "gdp",
+        "yield_10y",
+        "yield_2y",
+        "m2_yoy",
+        "gdp_yoy",
+        "excess_liquidity",
+        "yield_spread",
+    ),
+    "macro_factor": ("date", "macro_factor"),
+    "macro_factor_pit": ("date", "period", "macro_factor"),
+    "macro_factor_projection": ("date", "macro_factor"),
+    "market_return": ("date", "Close", "expected_return", "trend_signal"),
+    "market_return_projection": ("date", "Close", "expected_return", "trend_signal"),
+    "breadth": ("date", "cap_price", "equal_price", "cap_ret_1m", "equal_ret_1m", "breadth_signal"),
+    "constituent_breadth": (
+        "date",
+        "members",
+        "advances",
+        "declines",
+        "ad_line",
+        "pct_above_50dma",
+        "pct_above_200dma",
+        "new_highs",
+        "new_lows",
+    ),
+    "final_signal": (
+        "date",
+        "macro_factor",
+        "Close",
+        "expected_return",
+        "trend_signal",
+        "breadth_signal",
+        "final_return",
+        "signal",
+    ),
+    "signal_panel": (
+        "date",
+        "ticker",
+        "Close",
+        "expected_return",
+        "trend_signal",
+        "macro_factor",
+        "breadth_signal",
+        "final_return",
+        "signal",
+    ),
+    "bootstrap_ci": (
+        "metric",
+        "strategy",
+        "strategy_lo",
+        "strategy_hi",
+        "benchmark",
+        "benchmark_lo",
+        "benchmark_hi",
+        "diff_lo",
+        "diff_hi",
+        "p_strategy_beats",
+    ),
+    # 其後依參數網格與 objective 接上各參數、train_<objective> 與 test_<指標> 欄位
+    "walk_forward": ("train_start", "train_end", "test_start", "test_end"),
+    "walk_forward_equity": (
+        "date",
+        "strategy_return",
+        "default_return",
+        "benchmark_return",
+        "strategy_equity",
+        "default_equity",
+        "benchmark_equity",
+    ),
+    # 其後為各槓桿倍數的持有時間 time_<n>x (依回測出現的槓桿而定)
+    "analytics": (
+        "series",
+        "total_return",
+        "cagr",
+        "volatility",
+        "sharpe",
+        "sortino",
+        "max_drawdown",
+        "calmar",
+        "max_drawdown_periods",
+        "turnover",
+        "changes",
+    ),
+    "drawdown_episodes": ("series", "peak", "trough", "recovery", "depth", "length"),
+    "rolling_metrics": (
+        "date",
+        "strategy_sharpe",
+        "benchmark_sharpe",
+        "strategy_sortino",
+        "benchmark_sortino",
+    ),
+}
+
+
+def enforce(df, frame=None, strict=True):
+    """
+    依欄位定義轉換型別 (date -> DATE_DTYPE、分類欄位 -> int8 Categorical、float32 欄位)，
+    回傳新的 DataFrame。frame 為 FRAMES 的名稱且 strict 時，檢查欄位齊全並依宣告順序排列。
+    """
+    import pandas as pd
+
+    columns = FRAMES.get(frame)
+    if columns is not None and strict:
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"{frame} 缺少欄位: {missing}")
+        order = [*columns, *(c for c in df.columns if c not in columns)]
+        if list(df.columns) != order:
+            df = df[order]
+
+    converted = {}
+    for col in df.columns:
+        values = df[col]
+        if col == "date":
+            if values.dtype != DATE_DTYPE:
+                converted[col] = pd.to_datetime(values).astype(DATE_DTYPE)
+        elif col in CATEGORIES:
+            category = CATEGORIES[col]
+            if values.dtype != category.dtype:
+                converted[col] = category.categorical(values)
+        elif col in OPEN_CATEGORIES:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                converted[col] = values.astype("category")
+        elif col in FLOAT32_COLUMNS:
+            if values.dtype != np.float32:
+                converted[col] = values.astype(np.float32)
+    return df.assign(**converted) if converted else df
@@ -0,0 +1,160 @@
+import csv
+import logging
+from pathlib import Path
+
+from config.path import PathConfig
+from utils import schema, telemetry
+
+# 格式 -> 副檔名；PathConfig 內的路徑常數一律以 .csv 命名，實際檔名依格式替換副檔名
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+# 已警告過退回其他格式的檔案 (每個檔案只警告一次)
+_fallback_warned = set()
+
+
+def resolve(path, fmt=None):
+    """
+    依儲存格式換算實際檔案路徑。
+    """
+    fmt = fmt or PathConfig.STORAGE_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"不支援的儲存格式: {fmt}")
+    return Path(path).with_suffix(FORMATS[fmt])
+
+
+def _locate(path, warn=True):
+    """
+    優先使用設定格式的檔案，不存在時退回其他格式 (切換格式後讀取既有的 CSV，
+    下次寫出時即改為設定格式)。warn=True 時退回會記錄警告，避免格式設定錯誤時默默讀到舊檔。
+    """
+    preferred = resolve(path)
+    if preferred.exists():
+        return preferred
+    for fmt in FORMATS:
+        candidate = resolve(path, fmt)
+        if candidate.exists():
+            if warn and candidate not in _fallback_warned:
+                _fallback_warned.add(candidate)
+                logging.warning(
+                    f"   [Storage] 找不到 {preferred.name} ({PathConfig.STORAGE_FORMAT})，"
+                    f"改讀 {candidate.name}；重新執行產生該檔的步驟即會轉為設定格式"
+                )
+            return candidate
+    return None
+
+
+def exists(path):
+    return _locate(path) is not None
+
+
+def read_frame(path, columns=None):
+    """
+    讀取處理後資料；columns 指定時只載入需要的欄位 (Parquet 以記憶體映射讀取)。
+    欄位型別依 utils/schema.py 轉換 (date 為 datetime、訊號為 int8 分類)。
+    """
+    # pandas 延後到實際讀檔時才載入 (只讀最新幾列的呼叫端用 read_tail，不需 pandas)
+    import pandas as pd
+
+    target = _locate(path)
+    if target is None:
+        raise FileNotFoundError(f"找不到數據檔案: {resolve(path)}")
+
+    if target.suffix == FORMATS["parquet"]:
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(target, columns=columns, memory_map=True).to_pandas()
+    else:
+        df = pd.read_csv(target, usecols=columns, float_precision="round_trip")
+        if "date" in df.columns:
+            # write_frame 寫出的日期皆為 ISO 格式：指定格式並直接轉成 schema 的型別，
+            # 省去 enforce 逐檔推斷格式與再轉一次單位
+            df["date"] = pd.to_datetime(df["date"], format="ISO8601").astype(schema.DATE_DTYPE)
+
+    if columns is not None:
+        df = df[list(columns)]
+    df = schema.enforce(df, Path(path).stem, strict=columns is None)
+    telemetry.record_io("read", len(df), target.stat().st_size)
+    return df
+
+
+def read_tail(path, n=1):
+    """
+    最後 n 列 -> [dict] (值為字串，空值為 "")；CSV 只讀表頭與檔尾，不載入 pandas。
+    """
+    target = _locate(path)
+    if target is None:
+        raise FileNotFoundError(f"找不到數據檔案: {resolve(path)}")
+
+    if target.suffix == FORMATS["parquet"]:
+        df = read_frame(path).tail(n)
+        return [
+            {k: "" if v is None or v != v else str(v) for k, v in row.items()}
+            for row in df.to_dict("records")
+        ]
+
+    with open(target, "rb") as f:
+        header = f.readline()
+        end = f.seek(0, 2)
+        size = 4096
+        while True:
+            begin = max(len(header), end - size)
+            f.seek(begin)
+            # 第一行可能從某列中間開始，多讀一行確保最後 n 列完整
+            lines = f.read(end - begin).splitlines()
+            if len(lines) > n or begin == len(header):
+                break
+            size *= 4
+
+    rows = csv.reader([header.decode("utf-8"), *(line.decode("utf-8") for line in lines[-n:] if line)])
+    columns = next(rows)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def write_frame(df, path, fmt=None):
+    """
+    依設定格式寫出處理後資料 (Parquet 使用 zstd 壓縮並保留欄位型別)，回傳實際路徑。
+    寫出前依 utils/schema.py 檢查欄位並轉換型別。
+    """
+    df = schema.enforce(df, Path(path).stem)
+    target = resolve(path, fmt)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if target.suffix == FORMATS["parquet"]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, target, compression="zstd")
+    else:
+        df.to_csv(target, index=False)
+
+    telemetry.record_io("write", len(df), target.stat().st_size)
+    return target
+
+
+def append_rows(df, path, keep_bytes):
+    """
+    CSV 增量寫入：檔案截斷到 keep_bytes (表頭與要保留的資料列)，再於檔尾附加 df 的資料列。
+    前段不重讀也不重寫；回傳附加的位元組 (呼叫端據此記錄最後一列)。
+    """
+    target = resolve(path, "csv")
+    df = schema.enforce(df, Path(path).stem)
+    data = df.to_csv(index=False, header=False).encode("utf-8")
+    with open(target, "r+b") as f:
+        f.truncate(keep_bytes)
+        f.seek(keep_bytes)
+        f.write(data)
+
+    telemetry.record_io("write", len(df), len(data))
+    return data
+
+
+def export_csv(path, output_path=None):
+    """
+    將任一格式的處理後資料匯出為 CSV (人工檢視 / 外部工具使用)。
+    """
+    df = read_frame(path)
+    output_path = Path(output_path) if output_path else resolve(path, "csv")
+    df.to_csv(output_path, index=False)
+    logging.info(f"   [Storage] 已匯出 CSV: {output_path}")
+    return output_path
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+from config.path import PathConfig
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組，不記錄行程 RSS
+    resource = None
+
+# 目前執行中的步驟 (每個執行緒各自一份)，storage 讀寫時依此歸戶
+_CURRENT = ContextVar("telemetry_stage", default=None)
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    status: str = "ran"
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_memory_bytes: int | None = None  # 未開啟 trace_memory 時為 None (報告中為 null)
+    rows_read: int = 0
+    rows_written: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+
+def record_io(kind, rows, nbytes):
+    """
+    由 storage 呼叫：把讀寫的列數 / 位元組數記到目前步驟；不在量測中則忽略。
+    """
+    metrics = _CURRENT.get()
+    if metrics is None:
+        return
+    if kind == "read":
+        metrics.rows_read += rows
+        metrics.bytes_read += nbytes
+    else:
+        metrics.rows_written += rows
+        metrics.bytes_written += nbytes
+
+
+class Telemetry:
+    """
+    收集每個步驟的 wall time、CPU time、峰值記憶體與讀寫量，輸出 JSON 報告與 Prometheus 指標檔。
+
+    - CPU time 以步驟所在執行緒計 (time.thread_time)，不含步驟內部再開的執行緒 / 行程。
+    - 峰值記憶體以 tracemalloc 量測 (trace_memory=True 時才開啟，會拖慢被量測的步驟；
+      管線由 EMR_TRACE_MEMORY=1 開啟)，未開啟時為 None；
+      步驟併發時共用同一個 heap，數值為該步驟期間的行程峰值 (上界)。
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._active = []
+        self._owns_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def _update_peaks(self):
+        # 把上次重置以來的峰值分給所有執行中的步驟，再重置
+        if not self.trace_memory:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        for metrics in self._active:
+            metrics.peak_memory_bytes = max(metrics.peak_memory_bytes, peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def measure(self, stage):
+        metrics = StageMetrics(stage, peak_memory_bytes=0 if self.trace_memory else None)
+        with self._lock:
+            self._update_peaks()
+            self._active.append(metrics)
+            self.stages.append(metrics)
+
+        token = _CURRENT.set(metrics)
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            yield metrics
+        except BaseException:
+            metrics.status = "failed"
+            raise
+        finally:
+            metrics.wall_seconds = time.perf_counter() - wall0
+            metrics.cpu_seconds = time.thread_time() - cpu0
+            _CURRENT.reset(token)
+            with self._lock:
+                self._update_peaks()
+                self._active.remove(metrics)
+
+    def skip(self, stage, status="skipped"):
+        with self._lock:
+            self.stages.append(StageMetrics(stage, status=status))
+
+    def close(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def report(self):
+        # Linux 的 ru_maxrss 單位為 KB；無 resource 模組 (Windows) 時為 0
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else 0
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": time.perf_counter() - self._t0,
+            "max_rss_bytes": max_rss,
+            # 各步驟的 peak_memory_bytes 只在 EMR_TRACE_MEMORY=1 時量測，否則為 null
+            "trace_memory": self.trace_memory,
+            "stages": [asdict(metrics) for metrics in self.stages],
+        }
+
+    def write_json(self, path=PathConfig.RUN_REPORT_JSON):
+        _atomic_write(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+        logging.info(f"   [Telemetry] 執行報告已儲存至 {path}")
+
+    def write_prometheus(self, path=PathConfig.RUN_METRICS_PROM):
+        """
+        node_exporter textfile collector 格式 (原子寫入，避免被讀到一半)。
+        """
+        _atomic_write(path, to_prometheus(self.report()))
+        logging.info(f"   [Telemetry] Prometheus 指標已儲存至 {path}")
+
+
+# 指標名稱 -> (StageMetrics 欄位, 說明)
+PROMETHEUS_METRICS = {
+    "emr_stage_wall_seconds": ("wall_seconds", "Wall-clock time per pipeline stage."),
+    "emr_stage_cpu_seconds": ("cpu_seconds", "CPU time per pipeline stage."),
+    "emr_stage_peak_memory_bytes": (
+        "peak_memory_bytes",
+        "Peak traced memory during the stage (only with EMR_TRACE_MEMORY=1).",
+    ),
+    "emr_stage_rows_read": ("rows_read", "Rows read through storage."),
+    "emr_stage_rows_written": ("rows_written", "Rows written through storage."),
+    "emr_stage_bytes_read": ("bytes_read", "Bytes read through storage."),
+    "emr_stage_bytes_written": ("bytes_written", "Bytes written through storage."),
+}
+
+
+def to_prometheus(report):
+    started = datetime.fromisoformat(report["started_at"]).timestamp()
+    lines = [
+        "# HELP emr_run_wall_seconds Wall-clock time of the whole pipeline run.",
+        "# TYPE emr_run_wall_seconds gauge",
+        f"emr_run_wall_seconds {report['wall_seconds']:.6f}",
+        "# HELP emr_run_max_rss_bytes Peak resident set size of the process.",
+        "# TYPE emr_run_max_rss_bytes gauge",
+        f"emr_run_max_rss_bytes {report['max_rss_bytes']}",
+        "# HELP emr_run_start_timestamp_seconds Start time of the pipeline run.",
+        "# TYPE emr_run_start_timestamp_seconds gauge",
+        f"emr_run_start_timestamp_seconds {started:.0f}",
+    ]
+    for name, (field, help_text) in PROMETHEUS_METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for stage in report["stages"]:
+            # 未量測的指標 (例如未開啟 tracemalloc 的峰值記憶體) 不輸出樣本
+            if stage[field] is None:
+                continue
+            labels = f'stage="{stage["stage"]}",status="{stage["status"]}"'
+            lines.append(f"{name}{{{labels}}} {stage[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def _atomic_write(path, text):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,159 @@
+import logging
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from config.path import PathConfig
+
+# 沒有 ALFRED 版本檔時的發布延遲模型：觀測期 (期初標籤) 之後多久首次發布。
+# 只能排除「發布時點」的前視，數值仍是最新修正值；有版本檔時以實際發布紀錄為準。
+RELEASE_LAGS = {
+    "m2": pd.DateOffset(months=1, days=28),  # H.6 約於月底後四週發布
+    "gdp": pd.DateOffset(months=3, days=30),  # 季末約 30 天發布初值 (advance estimate)
+    "yield_10y": pd.DateOffset(days=1),  # 日資料，收盤後可得
+    "yield_2y": pd.DateOffset(days=1),
+}
+
+_EPOCH = np.datetime64("1700-01-01", "D")
+_DAY_BITS = 20  # 合成鍵低位元存發布日 (距 1700 年的天數，2^20 天約 2870 年)
+
+
+def _days(dates):
+    # 以「日」為單位的整數 (當天發布的數值視為當天可得)
+    days = np.asarray(dates, dtype="datetime64[D]") - _EPOCH
+    return np.clip(days.astype(np.int64), 0, (1 << _DAY_BITS) - 1)
+
+
+@dataclass(frozen=True)
+class VintageStore:
+    """
+    單一序列的所有版本 (ALFRED)：每列為 (觀測期 period, 發布日 realtime_start, value)，
+    依 (period, realtime_start) 排序。合成鍵 = period 序號 << 20 | 發布日，
+    as-of 查詢只需兩次二分搜尋 (O(log n))，可一次查詢整個陣列。
+    """
+
+    name: str
+    periods: np.ndarray  # 不重複的觀測期 (遞增)
+    keys: np.ndarray  # 每個版本的合成鍵 (遞增)
+    values: np.ndarray
+
+    @classmethod
+    def from_records(cls, name, period, realtime, value):
+        period = np.asarray(period, dtype="datetime64[ns]")
+        realtime = np.asarray(realtime, dtype="datetime64[ns]")
+        value = np.asarray(value, dtype=float)
+        order = np.lexsort((realtime, period))
+        period, realtime, value = period[order], realtime[order], value[order]
+
+        periods, rank = np.unique(period, return_inverse=True)
+        keys = (rank.astype(np.int64) << _DAY_BITS) | _days(realtime)
+        return cls(name, periods, keys, value)
+
+    @classmethod
+    def from_latest(cls, series, lag=None):
+        """
+        只有最新修正值時：假設每期於 period + lag 首次發布 (預設依 RELEASE_LAGS)。
+        """
+        lag = lag if lag is not None else RELEASE_LAGS.get(series.name, pd.DateOffset(0))
+        index = pd.DatetimeIndex(series.index)
+        return cls.from_records(series.name, index, index + lag, series.to_numpy(float))
+
+    def __len__(self):
+        return len(self.values)
+
+    def asof(self, periods, dates):
+        """
+        「觀測期 periods 在 dates 當天已知的數值」(兩者可廣播)；尚未發布為 NaN。
+        """
+        periods = np.asarray(periods, dtype="datetime64[ns]")
+        # 觀測期的序號只依 periods 計算一次，再與 dates 廣播 (矩陣查詢時 periods 為單欄)
+        rank = np.asarray(np.searchsorted(self.periods, periods))
+        found = np.asarray(rank < len(self.periods))
+        found[found] = self.periods[rank[found]] == periods[found]
+        rank, found, days = np.broadcast_arrays(
+            rank.astype(np.int64), found, _days(np.asarray(dates, dtype="datetime64[ns]"))
+        )
+
+        # 同一觀測期內發布日不超過 dates 的最後一個版本
+        query = (rank << _DAY_BITS) | days
+        pos = np.searchsorted(self.keys, query, side="right") - 1
+        found = np.asarray(found & (pos >= 0))
+        found[found] = (self.keys[pos[found]] >> _DAY_BITS) == rank[found]
+
+        out = np.full(query.shape, np.nan)
+        out[found] = self.values[pos[found]]
+        return out
+
+    def snapshot(self, date):
+        """
+        date 當天已知的整條序列 (尚未發布的觀測期不列出)。
+        """
+        values = self.asof(self.periods, pd.Timestamp(date).to_datetime64())
+        known = ~np.isnan(values)
+        return pd.Series(
+            values[known], index=pd.DatetimeIndex(self.periods[known], name="date"), name=self.name
+        )
+
+    def matrix(self, dates, end=None):
+        """
+        觀測期 x dates 的 as-of 矩陣 (DataFrame，欄為 dates)；end 以後的觀測期不列出。
+        """
+        periods = self.periods
+        if end is not None:
+            periods = periods[periods <= pd.Timestamp(end).to_datetime64()]
+        dates = pd.DatetimeIndex(dates)
+        values = self.asof(periods[:, None], dates.to_numpy("datetime64[ns]")[None, :])
+        return pd.DataFrame(values, index=pd.DatetimeIndex(periods, name="date"), columns=dates)
+
+
+# =========================================================
+#  讀寫
+# =========================================================
+
+
+def vintage_path(name, vintage_dir=PathConfig.VINTAGE_DIR):
+    return os.path.join(vintage_dir, f"{name}.csv")
+
+
+def save_vintages(df, name, vintage_dir=PathConfig.VINTAGE_DIR):
+    """
+    (date, realtime_start, value) 長表 -> vintage_dir/<name>.csv。
+    """
+    os.makedirs(vintage_dir, exist_ok=True)
+    path = vintage_path(name, vintage_dir)
+    df.sort_values(["date", "realtime_start"])[["date", "realtime_start", "value"]].to_csv(
+        path, index=False
+    )
+    return path
+
+
+def load_vintages(name, raw_path=None, vintage_dir=PathConfig.VINTAGE_DIR):
+    """
+    讀取序列的版本庫：有 vintage_dir/<name>.csv (ALFRED 下載) 時使用實際發布紀錄，
+    否則讀 raw_path 的最新值並套用 RELEASE_LAGS 的發布延遲。
+    """
+    path = vintage_path(name, vintage_dir) if vintage_dir is not None else None
+    if path is not None and os.path.exists(path):
+        df = pd.read_csv(
+            path,
+            parse_dates=["date", "realtime_start"],
+            na_values=".",
+            float_precision="round_trip",
+        )
+        return VintageStore.from_records(name, df["date"], df["realtime_start"], df["value"])
+
+    if raw_path is None:
+        raise FileNotFoundError(f"找不到 {name} 的版本檔或原始數據")
+    if name not in RELEASE_LAGS:
+        logging.warning(f"   [Vintage] {name} 沒有版本檔也沒有發布延遲設定，視為觀測當天發布")
+    series = pd.read_csv(
+        raw_path,
+        usecols=["date", name],
+        index_col="date",
+        parse_dates=["date"],
+        na_values=".",
+        float_precision="round_trip",
+    )[name]
+    return VintageStore.from_latest(series.dropna())